@@ -0,0 +1,205 @@
+"""Admission control: bounded concurrency per priority class.
+
+Every request is put into a priority class from its method and path:
+
+    orders     guest order writes (POST /api/orders/)
+    guest      everything else a guest's phone calls (menu, search, table join)
+    admin      staff pages and APIs (order board, prep stations, profiling)
+    analytics  dashboards, closed-order history, the event feed, the simulator
+
+Each class has its own concurrency limit, a bounded FIFO queue and a maximum
+queue wait. A request that finds its queue full, or waits longer than the
+class allows, gets an immediate ``503`` with ``Retry-After`` instead of
+piling onto the database pool. The lower classes have small limits and short
+waits, and ``admin``/``analytics`` are also shed outright while the
+connection pool is exhausted, so under overload the slots go to checkouts.
+
+Limits are per worker process and can be overridden with
+``ADMISSION_LIMITS="orders=16/128/10,analytics=2/4/0.5"`` (concurrency,
+queue length, max wait in seconds). ``ADMISSION_ENABLED=false`` turns the
+middleware into a pass-through. Health checks, ``/metrics`` and the live
+status streams are exempt.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+
+from starlette.responses import JSONResponse
+
+from app import metrics
+from app.database import MAX_OVERFLOW, POOL_SIZE, get_engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("ADMISSION_ENABLED", "true").lower() != "false"
+
+EXEMPT_PATHS = {"/", "/metrics"}
+# Long-lived streams would hold a slot for their whole life; app.live caps them
+EXEMPT_PREFIXES = ("/api/live",)
+
+
+class _Gate:
+    """Counting semaphore with a FIFO wait queue that hands slots over directly."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def enter(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter
+            return True
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived together with the timeout or disconnect
+                self.leave()
+            else:
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+            if isinstance(exc, TimeoutError):
+                return False
+            raise
+
+    def leave(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the next waiter; active stays the same
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+@dataclass
+class PriorityClass:
+    name: str
+    concurrency: int
+    queue: int
+    max_wait: float
+    retry_after: int
+    shed_when_pool_full: bool = False
+    gate: _Gate = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.gate = _Gate(self.concurrency)
+
+
+# Highest priority first
+CLASSES = {
+    cls.name: cls
+    for cls in (
+        PriorityClass("orders", concurrency=16, queue=128, max_wait=10.0, retry_after=1),
+        PriorityClass("guest", concurrency=8, queue=64, max_wait=5.0, retry_after=2),
+        PriorityClass("admin", concurrency=4, queue=16, max_wait=2.0, retry_after=5, shed_when_pool_full=True),
+        PriorityClass("analytics", concurrency=2, queue=4, max_wait=0.5, retry_after=15, shed_when_pool_full=True),
+    )
+}
+
+# First matching (method, path prefix) wins; None matches any method
+ROUTES = (
+    ("POST", "/api/orders", "orders"),
+    (None, "/api/orders", "admin"),
+    (None, "/api/dashboard", "analytics"),
+    (None, "/api/events", "analytics"),
+    (None, "/api/simulator", "analytics"),
+    (None, "/admin/orders/closed", "analytics"),
+    (None, "/api/prep", "admin"),
+    (None, "/api/profiling", "admin"),
+    (None, "/api/jobs", "admin"),
+    (None, "/api/venues", "admin"),
+    (None, "/admin", "admin"),
+    (None, "/api", "guest"),
+)
+
+
+def _apply_overrides(spec: str) -> None:
+    for part in filter(None, (chunk.strip() for chunk in spec.split(","))):
+        name, _, values = part.partition("=")
+        cls = CLASSES.get(name.strip())
+        try:
+            concurrency, queue, max_wait = values.split("/")
+            if cls is None:
+                raise ValueError(f"unknown class {name!r}")
+            cls.concurrency, cls.queue, cls.max_wait = int(concurrency), int(queue), float(max_wait)
+            cls.gate = _Gate(cls.concurrency)
+        except ValueError as exc:
+            logger.warning("Ignoring ADMISSION_LIMITS entry %r: %s", part, exc)
+
+
+_apply_overrides(os.environ.get("ADMISSION_LIMITS", ""))
+
+
+def classify(method: str, path: str) -> PriorityClass | None:
+    if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    for route_method, prefix, name in ROUTES:
+        if (route_method is None or route_method == method) and path.startswith(prefix):
+            return CLASSES[name]
+    return None
+
+
+def pool_exhausted() -> bool:
+    pool = get_engine().pool
+    checkedout = getattr(pool, "checkedout", None)
+    return checkedout is not None and checkedout() >= POOL_SIZE + MAX_OVERFLOW
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, enabled: bool = ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cls = classify(scope["method"], scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        if cls.shed_when_pool_full and pool_exhausted():
+            await self._shed(cls, "pool_exhausted", scope, receive, send)
+            return
+        gate = cls.gate
+        if gate.active >= gate.limit and gate.waiting >= cls.queue:
+            await self._shed(cls, "queue_full", scope, receive, send)
+            return
+        started = time.perf_counter()
+        if not await gate.enter(cls.max_wait):
+            await self._shed(cls, "wait_timeout", scope, receive, send)
+            return
+
+        metrics.ADMISSION_WAIT.labels(cls.name).observe(time.perf_counter() - started)
+        active = metrics.ADMISSION_ACTIVE.labels(cls.name)
+        active.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            active.dec()
+            gate.leave()
+
+    async def _shed(self, cls: PriorityClass, reason: str, scope, receive, send) -> None:
+        metrics.ADMISSION_SHED.labels(cls.name, reason).inc()
+        response = JSONResponse(
+            {"detail": "Server busy, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": str(cls.retry_after)},
+        )
+        await response(scope, receive, send)
@@ -1,5 +1,6 @@
 """AI utilities package.
 
-Contains lightweight, dependency-free NLP helpers for search.
+Contains lightweight, dependency-free NLP helpers for search and the
+co-occurrence recommender.
 """
 
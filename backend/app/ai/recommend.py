@@ -0,0 +1,264 @@
+"""Frequently-bought-together recommendations from product co-occurrence.
+
+Each venue has a ``CooccurrenceModel``: how many orders contained each
+product and each pair of products. Every product also keeps a precomputed
+list of its ``TOP_K`` closest products, scored by cosine similarity
+``pair / sqrt(count_a * count_b)`` so that best sellers do not crowd out
+everything else. A cart is answered from those lists alone. The best-seller
+list fills in when the cart has no history yet.
+
+Models are kept current two ways:
+
+* incrementally: the ``order.created`` notification that ``app.live`` fans
+  out to every worker carries the order's product ids. Applying it bumps the
+  counts and recomputes the lists of the products in that order;
+* in bulk: ``rebuild`` aggregates the venue's whole order history, archive
+  included, with one query on the read database. A worker builds a venue's
+  model in the background on first use and again after
+  ``RECOMMEND_REFRESH_SECONDS`` (default 3600). This corrects the lists of
+  products outside recent orders and any update a worker missed.
+
+With ``LIVE_ENABLED=false`` there are no notifications, so orders reach a
+model only through rebuilds; workers then log a warning at startup and
+rebuild every ``RECOMMEND_OFFLINE_REFRESH_SECONDS`` (default 300) at most.
+
+Until the first build of a venue finishes, ``recommend`` returns no
+suggestions. Rebuild by hand with ``python -m app.ai.recommend --venue 1``.
+"""
+
+import argparse
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from operator import itemgetter
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.database import get_read_engine
+
+logger = logging.getLogger(__name__)
+
+# Neighbours precomputed per product; carts rarely need more
+TOP_K = 20
+POPULAR_SIZE = 20
+REFRESH_SECONDS = float(os.environ.get("RECOMMEND_REFRESH_SECONDS", "3600"))
+OFFLINE_REFRESH_SECONDS = float(os.environ.get("RECOMMEND_OFFLINE_REFRESH_SECONDS", "300"))
+
+
+class CooccurrenceModel:
+    """Order and pair counts for one venue with per-product top-k lists."""
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self.orders = 0
+        self.item_counts: dict[int, int] = {}
+        # Symmetric: pair_counts[a][b] == pair_counts[b][a]
+        self.pair_counts: dict[int, dict[int, int]] = {}
+        self.neighbors: dict[int, list[tuple[int, float]]] = {}
+        self.popular: list[int] = []
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_baskets(cls, baskets: Iterable[Iterable[int]], top_k: int = TOP_K) -> "CooccurrenceModel":
+        model = cls(top_k)
+        item_counts = model.item_counts
+        pair_counts = model.pair_counts
+        for basket in baskets:
+            items = set(basket)
+            model.orders += 1
+            for a in items:
+                item_counts[a] = item_counts.get(a, 0) + 1
+                if len(items) > 1:
+                    row = pair_counts.setdefault(a, {})
+                    for b in items:
+                        if b != a:
+                            row[b] = row.get(b, 0) + 1
+        model.refresh_all()
+        return model
+
+    @classmethod
+    def from_counts(
+        cls,
+        orders: int,
+        item_counts: dict[int, int],
+        pairs: Iterable[tuple[int, int, int]],
+        top_k: int = TOP_K,
+    ) -> "CooccurrenceModel":
+        """Build from aggregated counts; each unordered pair appears once."""
+        model = cls(top_k)
+        model.orders = orders
+        model.item_counts = dict(item_counts)
+        for a, b, count in pairs:
+            model.pair_counts.setdefault(a, {})[b] = count
+            model.pair_counts.setdefault(b, {})[a] = count
+        model.refresh_all()
+        return model
+
+    def _top_neighbors(self, product_id: int) -> list[tuple[int, float]]:
+        row = self.pair_counts.get(product_id)
+        if not row:
+            return []
+        counts = self.item_counts
+        base = counts[product_id]
+        scored = ((b, count / math.sqrt(base * counts[b])) for b, count in row.items())
+        return heapq.nlargest(self.top_k, scored, key=itemgetter(1))
+
+    def _refresh_popular(self) -> None:
+        self.popular = [p for p, _ in heapq.nlargest(POPULAR_SIZE, self.item_counts.items(), key=itemgetter(1))]
+
+    def refresh_all(self) -> None:
+        with self._lock:
+            self.neighbors = {product_id: self._top_neighbors(product_id) for product_id in self.pair_counts}
+            self._refresh_popular()
+
+    def add_order(self, product_ids: Iterable[int]) -> None:
+        items = set(product_ids)
+        if not items:
+            return
+        with self._lock:
+            self.orders += 1
+            for a in items:
+                self.item_counts[a] = self.item_counts.get(a, 0) + 1
+            if len(items) > 1:
+                for a in items:
+                    row = self.pair_counts.setdefault(a, {})
+                    for b in items:
+                        if b != a:
+                            row[b] = row.get(b, 0) + 1
+            # Only these rows changed; other lists drift slightly until the next rebuild
+            for a in items:
+                self.neighbors[a] = self._top_neighbors(a)
+            self._refresh_popular()
+
+    def recommend(self, cart: Iterable[int], limit: int = 5) -> list[tuple[int, float]]:
+        """Top products to add to ``cart`` with their summed similarity; 0.0 marks best sellers."""
+        cart = set(cart)
+        scores: dict[int, float] = {}
+        neighbors = self.neighbors
+        for a in cart:
+            for b, score in neighbors.get(a, ()):
+                if b not in cart:
+                    scores[b] = scores.get(b, 0.0) + score
+        ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        if len(ranked) < limit:
+            seen = cart.union(scores)
+            ranked.extend((p, 0.0) for p in self.popular if p not in seen)
+            ranked = ranked[:limit]
+        return ranked
+
+
+# Distinct products per order, so a product on two lines of one order counts
+# once. Joining with >= yields the pairs and, on the diagonal (a = b), each
+# product's order count, in a single pass over the history.
+_COUNTS_SQL = text(
+    """
+    WITH baskets AS (
+        SELECT DISTINCT oi.order_id, oi.product_id
+        FROM order_items_all AS oi
+        JOIN orders_all AS o ON o.id = oi.order_id
+        WHERE o.venue_id = :venue_id
+    )
+    SELECT a.product_id, b.product_id, COUNT(*)
+    FROM baskets AS a
+    JOIN baskets AS b ON b.order_id = a.order_id AND b.product_id >= a.product_id
+    GROUP BY a.product_id, b.product_id
+    """
+)
+
+
+def load_model(engine: Engine, venue_id: int, top_k: int = TOP_K) -> CooccurrenceModel:
+    """Aggregate a venue's order history in Postgres and build its model."""
+    params = {"venue_id": venue_id}
+    with engine.connect() as connection:
+        orders = connection.execute(
+            text("SELECT COUNT(*) FROM orders_all WHERE venue_id = :venue_id"), params
+        ).scalar()
+        rows = connection.execute(_COUNTS_SQL, params).all()
+    item_counts = {a: count for a, b, count in rows if a == b}
+    pairs = [(a, b, count) for a, b, count in rows if a != b]
+    return CooccurrenceModel.from_counts(int(orders or 0), item_counts, pairs, top_k)
+
+
+class Recommender:
+    """Per-venue models in this worker, rebuilt in the background when stale."""
+
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS, engine: Engine | None = None):
+        self.refresh_seconds = refresh_seconds
+        self.engine = engine
+        self._models: dict[int, CooccurrenceModel] = {}
+        self._building: set[int] = set()
+        self._lock = threading.Lock()
+
+    def model(self, venue_id: int) -> CooccurrenceModel | None:
+        model = self._models.get(venue_id)
+        if model is None or time.monotonic() - model.built_at > self.refresh_seconds:
+            self._start_rebuild(venue_id)
+        return model
+
+    def _start_rebuild(self, venue_id: int) -> None:
+        with self._lock:
+            if venue_id in self._building:
+                return
+            self._building.add(venue_id)
+        threading.Thread(target=self.rebuild, args=(venue_id,), name=f"recommend-{venue_id}", daemon=True).start()
+
+    def rebuild(self, venue_id: int) -> CooccurrenceModel | None:
+        started = time.perf_counter()
+        try:
+            model = load_model(self.engine or get_read_engine(), venue_id)
+        except Exception:
+            logger.warning("Rebuilding recommendations for venue %s failed", venue_id, exc_info=True)
+            return None
+        finally:
+            with self._lock:
+                self._building.discard(venue_id)
+        self._models[venue_id] = model
+        logger.info(
+            "Recommendations for venue %s rebuilt from %d orders in %.2fs",
+            venue_id,
+            model.orders,
+            time.perf_counter() - started,
+        )
+        return model
+
+    def without_live_updates(self) -> None:
+        """Rebuild more often when no ``order.created`` notifications will arrive."""
+        self.refresh_seconds = min(self.refresh_seconds, OFFLINE_REFRESH_SECONDS)
+        logger.warning(
+            "Live updates are disabled; recommendations only see new orders when rebuilt, every %.0fs",
+            self.refresh_seconds,
+        )
+
+    def on_message(self, message: dict) -> None:
+        # Live hub listener: every worker sees every committed order
+        if message.get("event") != "order.created":
+            return
+        model = self._models.get(message.get("venue_id"))
+        if model is not None:
+            model.add_order(message.get("product_ids") or ())
+
+    def recommend(self, venue_id: int, cart: Iterable[int], limit: int = 5) -> list[tuple[int, float]]:
+        model = self.model(venue_id)
+        return model.recommend(cart, limit) if model is not None else []
+
+
+RECOMMENDER = Recommender()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Rebuild a venue's co-occurrence model and print samples")
+    parser.add_argument("--venue", type=int, default=1)
+    parser.add_argument("--cart", type=int, nargs="*", default=[], help="Product ids to recommend for")
+    args = parser.parse_args()
+    model = RECOMMENDER.rebuild(args.venue)
+    if model is not None:
+        print(f"{model.orders} orders, {len(model.item_counts)} products, {len(model.pair_counts)} with pairs")
+        for product_id, score in model.recommend(args.cart, 10):
+            print(f"{product_id:5d}  {score:.4f}")
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import math
 import re
+import threading
 import unicodedata
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
 
+from app import metrics
 from app.routers import menu as menu_router
 
 
@@ -267,17 +270,17 @@ class TfidfIndex:
         return scores
 
 
-def _collect_item_docs() -> List[ItemDoc]:
+def _collect_item_docs(categories: List[Dict[str, object]]) -> List[ItemDoc]:
     docs: List[ItemDoc] = []
-    for category in menu_router.CATEGORIES:
+    for category in categories:
         cat_name = category.get("name", "")
         for item in category.get("items", []):
             name = item.get("name", "")
-            desc = DESCRIPTIONS.get(name, "")
+            desc = item.get("description") or DESCRIPTIONS.get(name, "")
             meta = ITEM_METADATA.get(name, {"ingredients": [], "allergens": [], "tags": []})
-            ingredients = [str(x) for x in meta.get("ingredients", [])]
-            allergens = [str(x) for x in meta.get("allergens", [])]
-            tags = [str(x) for x in meta.get("tags", [])]
+            ingredients = [str(x) for x in item.get("ingredients", meta.get("ingredients", []))]
+            allergens = [str(x) for x in item.get("allergens", meta.get("allergens", []))]
+            tags = [str(x) for x in item.get("tags", meta.get("tags", []))]
             # Text = name + description + category + ingredients/allergens/tags
             parts = [name, desc, cat_name]
             if ingredients:
@@ -302,26 +305,65 @@ def _collect_item_docs() -> List[ItemDoc]:
     return docs
 
 
-# Global in-memory index built at import time
-_ITEM_DOCS = _collect_item_docs()
-INDEX = TfidfIndex(_ITEM_DOCS)
+# Guests repeat a small set of queries; results are cached by menu and
+# normalized text in one LRU, so its size does not grow with the venue count
+SEARCH_CACHE_SIZE = 1024
+_search_cache: "OrderedDict[Tuple[object, str, int], List[Dict[str, object]]]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+class MenuSearch:
+    """Search over one menu; ``key`` must change whenever the menu does."""
+
+    def __init__(self, categories: List[Dict[str, object]], key: object = "default"):
+        self.key = key
+        self.docs = _collect_item_docs(categories)
+        self.index = TfidfIndex(self.docs)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, object]]:
+        key = (self.key, _normalize(query), limit)
+        with _search_cache_lock:
+            cached = _search_cache.get(key)
+            if cached is not None:
+                _search_cache.move_to_end(key)
+        if cached is not None:
+            metrics.SEARCH_CACHE.labels("hit").inc()
+            return cached
+
+        metrics.SEARCH_CACHE.labels("miss").inc()
+        results = self._search_uncached(query, limit)
+        with _search_cache_lock:
+            _search_cache[key] = results
+            if len(_search_cache) > SEARCH_CACHE_SIZE:
+                _search_cache.popitem(last=False)
+        return results
+
+    def _search_uncached(self, query: str, limit: int) -> List[Dict[str, object]]:
+        results: List[Dict[str, object]] = []
+        matches = self.index.query(query, top_k=limit)
+        for doc_idx, score in matches:
+            doc = self.docs[doc_idx]
+            results.append(
+                {
+                    "id": doc.id,
+                    "name": doc.name,
+                    "price": doc.price,
+                    "score": round(float(score), 4),
+                    "description": doc.description,
+                    "ingredients": doc.ingredients,
+                    "allergens": doc.allergens,
+                    "tags": doc.tags,
+                }
+            )
+        return results
+
+
+# Index of the default menu, built at import time and shared by every venue
+# that has no menu of its own
+DEFAULT_SEARCH = MenuSearch(menu_router.CATEGORIES)
+_ITEM_DOCS = DEFAULT_SEARCH.docs
+INDEX = DEFAULT_SEARCH.index
 
 
 def search_menu(query: str, limit: int = 5) -> List[Dict[str, object]]:
-    results: List[Dict[str, object]] = []
-    matches = INDEX.query(query, top_k=limit)
-    for doc_idx, score in matches:
-        doc = _ITEM_DOCS[doc_idx]
-        results.append(
-            {
-                "id": doc.id,
-                "name": doc.name,
-                "price": doc.price,
-                "score": round(float(score), 4),
-                "description": doc.description,
-                "ingredients": doc.ingredients,
-                "allergens": doc.allergens,
-                "tags": doc.tags,
-            }
-        )
-    return results
+    return DEFAULT_SEARCH.search(query, limit)
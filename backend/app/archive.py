@@ -0,0 +1,146 @@
+"""Archival of closed order history.
+
+Closed orders older than ``ARCHIVE_AFTER_DAYS`` are moved, in batches, from
+``orders``/``order_items``/``transactions`` into the ``*_archive`` tables.
+All three are partitioned by month of the order's ``created_at``, carried
+on items and transactions as ``order_created_at``. Old history sits in cold
+partitions that range queries prune away, a month can be detached or
+dropped across the three tables at once, and the live tables only hold
+recent and open orders. The ``*_all`` views (see migrations) expose both for
+reporting.
+
+Run manually with ``python -m app.archive --days 90``.
+"""
+
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+
+ORDER_COLUMNS = (
+    "id, created_at, status, total_quantity, total_amount, user_id, table_ref_id, table_code, venue_id, session_id"
+)
+ITEM_COLUMNS = "id, order_id, product_id, name, unit_price, quantity"
+TRANSACTION_COLUMNS = "id, order_id, amount, method, created_at"
+PARTITIONED_TABLES = ("orders_archive", "order_items_archive", "transactions_archive")
+
+
+def _qualified(alias: str, columns: str) -> str:
+    return ", ".join(f"{alias}.{column.strip()}" for column in columns.split(","))
+
+
+def _month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def _next_month(value: date) -> date:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def ensure_partition(connection: Connection, month: date) -> None:
+    start = _month_start(month)
+    end = _next_month(start)
+    for table in PARTITIONED_TABLES:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {table}_{start:%Y_%m} "
+                f"PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+
+
+def _archive_batch(connection: Connection, cutoff: datetime, batch_size: int) -> int:
+    # SKIP LOCKED lets a concurrent run (or a checkout in flight) proceed untouched
+    rows = connection.execute(
+        text(
+            """
+            SELECT id, created_at FROM orders
+            WHERE status = 'closed' AND created_at < :cutoff
+            ORDER BY id
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+            """
+        ),
+        {"cutoff": cutoff, "limit": batch_size},
+    ).all()
+    if not rows:
+        return 0
+
+    ids = [row.id for row in rows]
+    for month in sorted({_month_start(row.created_at.date()) for row in rows}):
+        ensure_partition(connection, month)
+
+    params = {"ids": ids}
+    connection.execute(
+        text(
+            f"INSERT INTO orders_archive ({ORDER_COLUMNS}, archived_at) "
+            f"SELECT {ORDER_COLUMNS}, NOW() FROM orders WHERE id = ANY(:ids)"
+        ),
+        params,
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO order_items_archive ({ITEM_COLUMNS}, order_created_at) "
+            f"SELECT {_qualified('i', ITEM_COLUMNS)}, o.created_at "
+            f"FROM order_items AS i JOIN orders AS o ON o.id = i.order_id WHERE i.order_id = ANY(:ids)"
+        ),
+        params,
+    )
+    connection.execute(
+        text(
+            f"INSERT INTO transactions_archive ({TRANSACTION_COLUMNS}, order_created_at) "
+            f"SELECT {_qualified('t', TRANSACTION_COLUMNS)}, o.created_at "
+            f"FROM transactions AS t JOIN orders AS o ON o.id = t.order_id WHERE t.order_id = ANY(:ids)"
+        ),
+        params,
+    )
+    # Items and transactions follow through ON DELETE CASCADE
+    connection.execute(text("DELETE FROM orders WHERE id = ANY(:ids)"), params)
+    return len(ids)
+
+
+def archive_closed_orders(
+    older_than_days: int | None = None,
+    batch_size: int | None = None,
+    engine: Engine | None = None,
+) -> int:
+    """Move closed orders older than the threshold into the archive tables.
+
+    Each batch is its own transaction. Returns the number of orders moved.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    engine = engine or get_engine()
+
+    moved = 0
+    while True:
+        with engine.begin() as connection:
+            count = _archive_batch(connection, cutoff, size)
+        if not count:
+            break
+        moved += count
+        logger.info("Archived %d closed orders (%d so far)", count, moved)
+        if count < size:
+            break
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed orders older than N days")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    print(f"Archived {archive_closed_orders(args.days, args.batch_size)} orders")
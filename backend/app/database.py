@@ -1,5 +1,7 @@
 import os
+import time
 from functools import lru_cache
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.engine.url import make_url
@@ -44,14 +46,57 @@ def _build_database_url() -> str:
     return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}"
 
 
+def _build_read_database_url() -> str | None:
+    # Optional streaming replica for reporting reads; None routes reads to the primary
+    url = os.environ.get("DATABASE_READ_URL")
+    if url:
+        return url
+    host = os.environ.get("POSTGRES_READ_HOST")
+    if not host:
+        return None
+    port = int(os.environ.get("POSTGRES_READ_PORT", os.environ.get("POSTGRES_PORT", "5432")))
+    # Same credentials and database as the primary, different server
+    return make_url(_build_database_url()).set(host=host, port=port).render_as_string(hide_password=False)
+
+
+# Connections per process; admission control treats a full pool as saturation
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+
+
 @lru_cache()
 def get_engine():
     database_url = _build_database_url()
     # pool_pre_ping helps recycle stale connections across K8s/network blips
-    return create_engine(database_url, future=True, pool_pre_ping=True)
+    return create_engine(
+        database_url,
+        future=True,
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+    )
+
+
+@lru_cache()
+def get_read_engine():
+    read_url = _build_read_database_url()
+    if not read_url:
+        return get_engine()
+    return create_engine(read_url, future=True, pool_pre_ping=True)
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_read_engine())
+
+# Read-your-writes: after a client writes, its reads stay on the primary for
+# this long so replica lag never hides the change it just made
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", "10"))
+PRIMARY_PIN_COOKIE = "db_primary_until"
+_UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def replica_enabled() -> bool:
+    return get_read_engine() is not get_engine()
 
 
 def get_db():
@@ -60,3 +105,44 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """Session for read-only routes: the replica, unless this client wrote recently."""
+    factory = SessionLocal if _pinned_to_primary(request) else ReadSessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client to the primary for a while after each successful write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _UNSAFE_METHODS or not replica_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time()) + READ_YOUR_WRITES_SECONDS
+                cookie = (
+                    f"{PRIMARY_PIN_COOKIE}={until}; Max-Age={READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,300 @@
+"""Transactional outbox for order lifecycle events.
+
+Code that changes an order calls ``record_event`` on the same session, so the
+``outbox_events`` row commits or rolls back together with the change. Events
+then reach consumers two ways:
+
+* ``OutboxDispatcher`` publishes unpublished events in batches to the
+  configured sinks: in-process subscribers (``subscribe``), a webhook
+  (``OUTBOX_WEBHOOK_URL``) and a JSON-lines file (``OUTBOX_FILE_PATH``).
+  Delivery is at-least-once; a failing sink leaves the batch unpublished
+  and it is retried on the next round.
+* ``GET /api/events`` serves each venue's incremental feed with a resumable
+  cursor.
+
+Each row stores the id of the transaction that wrote it. Only events from
+transactions older than every transaction still running are served or
+published, ordered by ``(txid, id)``. Because of that, a transaction that
+commits late can never slip an event in behind a consumer's cursor.
+
+Run a dispatch round or clean up manually with
+``python -m app.events --dispatch`` / ``--purge-days 7``.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app import live, models
+from app.database import get_engine
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_INTERVAL = float(os.environ.get("OUTBOX_DISPATCH_INTERVAL", "1.0"))  # 0 disables
+BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "500"))
+RETENTION_DAYS = int(os.environ.get("OUTBOX_RETENTION_DAYS", "7"))
+WEBHOOK_URL = os.environ.get("OUTBOX_WEBHOOK_URL")
+WEBHOOK_SECRET = os.environ.get("OUTBOX_WEBHOOK_SECRET")
+WEBHOOK_TIMEOUT = float(os.environ.get("OUTBOX_WEBHOOK_TIMEOUT", "5"))
+FILE_PATH = os.environ.get("OUTBOX_FILE_PATH")
+
+# Only one dispatcher publishes at a time across workers and replicas
+DISPATCH_LOCK_KEY = 727_002
+
+# Transaction ids below this are all finished; newer writers may still commit
+_SAFE_TXID = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+EVENT_COLUMNS = "id, txid, event_type, aggregate_type, aggregate_id, payload, created_at"
+
+
+def order_payload(order: models.Order, **extra) -> dict:
+    payload = {
+        "order_id": order.id,
+        "venue_id": order.venue_id,
+        "status": order.status,
+        "table_id": order.table_id,
+        "user_id": order.user_id,
+        "session_id": order.session_id,
+        "total_quantity": order.total_quantity,
+        "total_amount": float(order.total_amount or 0),
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+    }
+    payload.update(extra)
+    return payload
+
+
+def event_row(event_type: str, order: models.Order, **extra) -> dict:
+    """Column values of an ``outbox_events`` row for an order event."""
+    return {
+        "venue_id": order.venue_id,
+        "event_type": event_type,
+        "aggregate_type": "order",
+        "aggregate_id": order.id,
+        "payload": order_payload(order, **extra),
+    }
+
+
+def record_event(db: Session, event_type: str, order: models.Order, **extra) -> None:
+    """Add an order event to ``db``; it commits with the caller's transaction."""
+    db.add(models.OutboxEvent(**event_row(event_type, order, **extra)))
+    # Guest devices at the table hear about it once this transaction commits
+    live.notify(db, event_type, order)
+
+
+def _event_dict(row) -> dict:
+    return {
+        "id": row["id"],
+        "type": row["event_type"],
+        "aggregate_type": row["aggregate_type"],
+        "aggregate_id": row["aggregate_id"],
+        "payload": row["payload"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+
+def encode_cursor(txid: int, event_id: int) -> str:
+    return f"{txid}-{event_id}"
+
+
+def decode_cursor(cursor: str | None) -> tuple[int, int]:
+    if not cursor:
+        return 0, 0
+    txid, _, event_id = cursor.partition("-")
+    return int(txid), int(event_id)
+
+
+def read_feed(
+    connection: Connection,
+    venue_id: int,
+    cursor: str | None,
+    limit: int,
+    event_type: str | None = None,
+) -> dict:
+    """The venue's events after ``cursor`` in commit-safe order, plus the cursor to resume from."""
+    txid, event_id = decode_cursor(cursor)
+    rows = connection.execute(
+        text(
+            f"""
+            SELECT {EVENT_COLUMNS}
+            FROM outbox_events
+            WHERE venue_id = :venue_id
+              AND (txid, id) > (:txid, :event_id)
+              AND txid < {_SAFE_TXID}
+              AND (CAST(:event_type AS VARCHAR) IS NULL OR event_type = :event_type)
+            ORDER BY txid, id
+            LIMIT :limit
+            """
+        ),
+        {"venue_id": venue_id, "txid": txid, "event_id": event_id, "event_type": event_type, "limit": limit},
+    ).mappings().all()
+    if rows:
+        cursor = encode_cursor(rows[-1]["txid"], rows[-1]["id"])
+    return {"events": [_event_dict(row) for row in rows], "cursor": cursor or encode_cursor(txid, event_id)}
+
+
+# Sinks ---------------------------------------------------------------------
+
+_subscribers: list[tuple[Callable[[dict], None], frozenset[str] | None]] = []
+
+
+def subscribe(callback: Callable[[dict], None], event_types=None) -> None:
+    """Call ``callback(event)`` for published events (optionally only some types).
+
+    Subscribers run in whichever worker process dispatches the batch.
+    """
+    _subscribers.append((callback, frozenset(event_types) if event_types else None))
+
+
+class InProcessSink:
+    name = "in-process"
+
+    def publish(self, events: list[dict]) -> None:
+        for event in events:
+            for callback, types in list(_subscribers):
+                if types is not None and event["type"] not in types:
+                    continue
+                try:
+                    callback(event)
+                except Exception:
+                    # A broken local subscriber must not block external delivery
+                    logger.exception("Outbox subscriber %r failed on event %s", callback, event["id"])
+
+
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str, secret: str | None = None, timeout: float = WEBHOOK_TIMEOUT):
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+
+    def publish(self, events: list[dict]) -> None:
+        body = dumps({"events": events})
+        request = urllib.request.Request(self.url, data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if self.secret:
+            digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            request.add_header("X-Outbox-Signature", f"sha256={digest}")
+        # urlopen raises on non-2xx, which leaves the batch for the next round
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class FileSink:
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def publish(self, events: list[dict]) -> None:
+        with open(self.path, "ab") as fh:
+            for event in events:
+                fh.write(dumps(event) + b"\n")
+
+
+def build_sinks() -> list:
+    sinks: list = [InProcessSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink(WEBHOOK_URL, WEBHOOK_SECRET))
+    if FILE_PATH:
+        sinks.append(FileSink(FILE_PATH))
+    return sinks
+
+
+# Dispatch ------------------------------------------------------------------
+
+
+def dispatch_once(sinks: list, engine: Engine | None = None, batch_size: int = BATCH_SIZE) -> int:
+    """Publish one batch of unpublished events; returns how many were published."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        if not connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DISPATCH_LOCK_KEY}).scalar():
+            return 0
+        rows = connection.execute(
+            text(
+                f"""
+                SELECT {EVENT_COLUMNS}
+                FROM outbox_events
+                WHERE published_at IS NULL AND txid < {_SAFE_TXID}
+                ORDER BY txid, id
+                LIMIT :limit
+                """
+            ),
+            {"limit": batch_size},
+        ).mappings().all()
+        if not rows:
+            return 0
+        events = [_event_dict(row) for row in rows]
+        for sink in sinks:
+            sink.publish(events)
+        connection.execute(
+            text("UPDATE outbox_events SET published_at = :now WHERE id = ANY(:ids)"),
+            {"now": datetime.utcnow(), "ids": [row["id"] for row in rows]},
+        )
+    return len(rows)
+
+
+def purge_published(retention_days: int = RETENTION_DAYS, engine: Engine | None = None) -> int:
+    """Delete events published more than ``retention_days`` ago."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        result = connection.execute(
+            text("DELETE FROM outbox_events WHERE published_at < :cutoff"),
+            {"cutoff": datetime.utcnow() - timedelta(days=retention_days)},
+        )
+    return result.rowcount
+
+
+class OutboxDispatcher:
+    """Background thread running ``dispatch_once`` until the queue is drained, then sleeping."""
+
+    def __init__(self, sinks: list | None = None, interval: float = DISPATCH_INTERVAL):
+        self.sinks = sinks if sinks is not None else build_sinks()
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                while dispatch_once(self.sinks) and not self._stop.is_set():
+                    pass
+            except Exception:
+                logger.exception("Outbox dispatch failed; retrying in %.1fs", self.interval)
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish or clean up outbox events")
+    parser.add_argument("--dispatch", action="store_true", help="Publish everything pending, then exit")
+    parser.add_argument("--purge-days", type=int, default=None, help="Delete events published more than N days ago")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.dispatch:
+        sinks = build_sinks()
+        published = 0
+        while count := dispatch_once(sinks):
+            published += count
+        print(f"Published {published} events")
+    if args.purge_days is not None:
+        print(f"Purged {purge_published(args.purge_days)} events")
@@ -0,0 +1,193 @@
+"""Demand forecast per hour, for orders and for every menu item at once.
+
+History is loaded as hourly counts (orders, and pieces per product) for the
+last ``FORECAST_HISTORY_DAYS`` days (default 365), aggregated in Postgres
+into small integer rows. Hours are wall-clock hours in the venue's time zone,
+like the dashboard heatmaps, so Friday 20:00 stays in one column across
+daylight saving changes; the hour in progress is left out until it is over.
+The rows are laid out in one NumPy array of shape ``(series, weeks, 168)``: series 0 is orders and the rest are products, and
+the 168 columns are the hours of a week aligned to the forecast start.
+Column ``k`` therefore always holds the same weekday and hour, and the
+forecast for ``start + k`` is read straight off it.
+
+The fit is a seasonal weekday x hour baseline, computed for all series in
+one pass: a weighted mean over past weeks, with weights halving every
+``FORECAST_HALF_LIFE_WEEKS`` (default 8) so recent weeks count more. The
+weighted standard deviation gives a ``high`` estimate (about the 90th
+percentile) for staffing and stock. Hours before the venue's first order
+are left out of the averages.
+
+Forecasts are cached per venue and horizon for ``FORECAST_CACHE_SECONDS``
+(default 300): the baseline moves slowly, and dashboards poll. The cache
+keeps the ``FORECAST_CACHE_SIZE`` (default 64) most recently used entries and
+drops expired ones as new ones are stored.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+HISTORY_DAYS = int(os.environ.get("FORECAST_HISTORY_DAYS", "365"))
+HALF_LIFE_WEEKS = float(os.environ.get("FORECAST_HALF_LIFE_WEEKS", "8"))
+CACHE_SECONDS = float(os.environ.get("FORECAST_CACHE_SECONDS", "300"))
+CACHE_SIZE = int(os.environ.get("FORECAST_CACHE_SIZE", "64"))
+WEEK_HOURS = 168
+# One-sided z for the 90th percentile of a normal
+HIGH_Z = 1.2816
+
+# Local hour buckets as integer hours since the epoch: cheap to transfer and
+# index. :since and :until are local times, converted once so the range
+# still uses the created_at indexes
+_LOCAL_HOUR = (
+    "(EXTRACT(EPOCH FROM date_trunc('hour', ({column} AT TIME ZONE 'UTC') AT TIME ZONE :tz)) / 3600)::BIGINT"
+)
+_LOCAL_RANGE = (
+    "{column} >= (CAST(:since AS TIMESTAMP) AT TIME ZONE :tz) AT TIME ZONE 'UTC' "
+    "AND {column} < (CAST(:until AS TIMESTAMP) AT TIME ZONE :tz) AT TIME ZONE 'UTC'"
+)
+_ORDERS_SQL = text(
+    f"""
+    SELECT {_LOCAL_HOUR.format(column="created_at")} AS hour, COUNT(*)
+    FROM orders_all
+    WHERE venue_id = :venue_id AND {_LOCAL_RANGE.format(column="created_at")}
+    GROUP BY 1
+    """
+)
+_ITEMS_SQL = text(
+    f"""
+    SELECT {_LOCAL_HOUR.format(column="o.created_at")} AS hour,
+           oi.product_id, SUM(oi.quantity)
+    FROM order_items_all AS oi
+    JOIN orders_all AS o ON o.id = oi.order_id
+    WHERE o.venue_id = :venue_id AND {_LOCAL_RANGE.format(column="o.created_at")}
+    GROUP BY 1, 2
+    """
+)
+
+
+@dataclass
+class History:
+    """Hourly counts as parallel arrays; ``series`` 0 is orders, then ``products``."""
+
+    products: np.ndarray  # product id of series 1..n
+    series: np.ndarray
+    hours: np.ndarray  # local hours since the epoch
+    counts: np.ndarray
+
+    @classmethod
+    def from_rows(cls, order_rows, item_rows) -> "History":
+        orders = np.asarray(order_rows, dtype=np.int64).reshape(-1, 2)
+        items = np.asarray(item_rows, dtype=np.int64).reshape(-1, 3)
+        products, item_series = np.unique(items[:, 1], return_inverse=True)
+        return cls(
+            products=products,
+            series=np.concatenate([np.zeros(len(orders), dtype=np.int64), item_series + 1]),
+            hours=np.concatenate([orders[:, 0], items[:, 0]]),
+            counts=np.concatenate([orders[:, 1], items[:, 2]]).astype(np.float64),
+        )
+
+
+def _hour_index(moment: datetime) -> int:
+    return int((moment - datetime(1970, 1, 1)).total_seconds() // 3600)
+
+
+def load_history(db: Session, venue_id: int, timezone: str, until: datetime, days: int = HISTORY_DAYS) -> History:
+    """Hours before the local time ``until``."""
+    params = {"venue_id": venue_id, "tz": timezone, "since": until - timedelta(days=days), "until": until}
+    return History.from_rows(
+        db.execute(_ORDERS_SQL, params).all(),
+        db.execute(_ITEMS_SQL, params).all(),
+    )
+
+
+def fit(
+    history: History,
+    start_hour: int,
+    weeks: int,
+    half_life: float = HALF_LIFE_WEEKS,
+    end_hour: int | None = None,
+):
+    """Weekly profile of every series aligned to ``start_hour``: (mean, std), each (series, 168).
+
+    Hours from ``end_hour`` (default ``start_hour``) on are not over yet and
+    are left out rather than counted as quiet.
+    """
+    end_hour = start_hour if end_hour is None else end_hour
+    n_series = len(history.products) + 1
+    offset = start_hour - 1 - history.hours  # 0 for the hour just before start
+    keep = (offset >= 0) & (offset < weeks * WEEK_HOURS) & (history.hours < end_hour)
+    week = offset[keep] // WEEK_HOURS
+    column = (history.hours[keep] - start_hour) % WEEK_HOURS
+    flat = (history.series[keep] * weeks + week) * WEEK_HOURS + column
+    size = n_series * weeks * WEEK_HOURS
+    counts = np.bincount(flat, weights=history.counts[keep], minlength=size).reshape(n_series, weeks, WEEK_HOURS)
+
+    # Cells before the first order or from end_hour on carry no information
+    cell_hours = start_hour - (np.arange(weeks)[:, None] + 1) * WEEK_HOURS + np.arange(WEEK_HOURS)[None, :]
+    first = history.hours.min() if len(history.hours) else start_hour
+    observed = ((cell_hours >= first) & (cell_hours < end_hour)).astype(np.float64)  # (weeks, 168)
+
+    weights = 0.5 ** (np.arange(weeks) / half_life)
+    cell_weights = observed * weights[:, None]
+    total = cell_weights.sum(axis=0)  # (168,)
+    safe_total = np.where(total > 0, total, 1.0)
+    mean = np.einsum("swk,wk->sk", counts, cell_weights) / safe_total
+    second = np.einsum("swk,wk->sk", counts * counts, cell_weights) / safe_total
+    std = np.sqrt(np.maximum(second - mean * mean, 0.0))
+    return mean, std
+
+
+def forecast(history: History, now: datetime, hours: int, weeks: int) -> dict:
+    """Forecast from the next full hour after ``now``, a naive local time."""
+    current = now.replace(minute=0, second=0, microsecond=0)
+    start = current + timedelta(hours=1)
+    start_hour = _hour_index(start)
+    mean, std = fit(history, start_hour, weeks, end_hour=_hour_index(current))
+    columns = np.arange(hours) % WEEK_HOURS
+    expected = mean[:, columns]
+    high = expected + HIGH_Z * std[:, columns]
+    return {
+        "start": start,
+        "hours": [start + timedelta(hours=h) for h in range(hours)],
+        "products": history.products.tolist(),
+        "expected": np.round(expected, 2),
+        "high": np.round(high, 2),
+    }
+
+
+# (venue, time zone, hours) -> (expiry, forecast), least recently used first
+_cache: OrderedDict[tuple[int, str, int], tuple[float, dict]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def venue_forecast(db: Session, venue_id: int, timezone: str, hours: int, now: datetime | None = None) -> dict:
+    """Forecast in the venue's local hours; ``now`` is a naive local time."""
+    key = (venue_id, timezone, hours)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    now = now or datetime.now(ZoneInfo(timezone)).replace(tzinfo=None)
+    # Complete hours only: the one in progress would pull its column down
+    history = load_history(db, venue_id, timezone, until=now.replace(minute=0, second=0, microsecond=0))
+    result = forecast(history, now, hours, weeks=max(1, HISTORY_DAYS // 7))
+    result["timezone"] = timezone
+    with _cache_lock:
+        clock = time.monotonic()
+        for stale in [stale for stale, (expires, _) in _cache.items() if expires <= clock]:
+            del _cache[stale]
+        _cache[key] = (clock + CACHE_SECONDS, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,169 @@
+"""Order heatmaps over any date range, in the venue's own time zone.
+
+A heatmap is a grid of equal time slots: with ``period="day"`` each row is a
+local calendar day split into ``bucket_minutes`` columns (15 minutes to 12
+hours), with ``period="week"`` each row is a Monday-to-Sunday week and each
+column one day. Postgres does the work in one statement: ``generate_series``
+lays out every slot of the range in local time, ``date_bin`` assigns each
+order (stored in UTC) to its local slot, and the left join returns one row
+per slot, empty ones included, already in grid order. The rows are read into
+a NumPy array and reshaped; totals and maxima are array reductions.
+
+Local slots are wall-clock time, so every day has the same columns: the hour
+skipped when clocks go forward stays empty, and the hour repeated when they
+go back holds both.
+
+A venue's zone is ``Venue.timezone`` (default UTC); ranges are capped at
+``MAX_DAYS`` days, which keeps a full year at 15 minutes to ~35k cells.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import chain
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PERIODS = ("day", "week")
+# Slot sizes that tile a day exactly
+BUCKET_MINUTES = (15, 30, 60, 120, 180, 240, 360, 720)
+MAX_DAYS = 371
+DAY_MINUTES = 24 * 60
+# Rows shown when no start is given: the last 7 days or the last 8 weeks
+DEFAULT_ROWS = {"day": 7, "week": 8}
+
+_GRID_SQL = text(
+    """
+    WITH slots AS (
+        SELECT generate_series(
+            CAST(:start AS TIMESTAMP),
+            CAST(:end AS TIMESTAMP) - make_interval(mins => :slot),
+            make_interval(mins => :slot)
+        ) AS slot
+    ),
+    binned AS (
+        SELECT date_bin(
+                   make_interval(mins => :slot),
+                   (created_at AT TIME ZONE 'UTC') AT TIME ZONE :tz,
+                   CAST(:start AS TIMESTAMP)
+               ) AS slot,
+               COUNT(*) AS order_count,
+               SUM(total_amount) AS total_amount
+        FROM orders_all
+        WHERE venue_id = :venue_id
+          AND created_at >= (CAST(:start AS TIMESTAMP) AT TIME ZONE :tz) AT TIME ZONE 'UTC'
+          AND created_at < (CAST(:end AS TIMESTAMP) AT TIME ZONE :tz) AT TIME ZONE 'UTC'
+        GROUP BY 1
+    )
+    SELECT COALESCE(b.order_count, 0)::FLOAT8, COALESCE(b.total_amount, 0)::FLOAT8
+    FROM slots AS s
+    LEFT JOIN binned AS b ON b.slot = s.slot
+    ORDER BY s.slot
+    """
+)
+
+
+def valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Layout of a heatmap: ``rows`` x ``columns`` slots of ``slot_minutes`` from ``start``."""
+
+    period: str
+    start: date
+    rows: int
+    columns: int
+    slot_minutes: int
+
+    @property
+    def row_days(self) -> int:
+        return 7 if self.period == "week" else 1
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=self.rows * self.row_days)
+
+    @classmethod
+    def plan(
+        cls,
+        period: str,
+        today: date,
+        start: date | None = None,
+        end: date | None = None,
+        bucket_minutes: int | None = None,
+    ) -> "Grid":
+        """Validate a request; ``end`` is inclusive and defaults to ``today``. Raises ValueError."""
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        end = end or today
+        row_days = 7 if period == "week" else 1
+        start = start or end - timedelta(days=(DEFAULT_ROWS[period] - 1) * row_days)
+        if start > end:
+            raise ValueError("start must not be after end")
+        if (end - start).days + 1 > MAX_DAYS:
+            raise ValueError(f"ranges are limited to {MAX_DAYS} days")
+        if period == "week":
+            # Whole Monday-to-Sunday weeks
+            start -= timedelta(days=start.weekday())
+            weeks = (end - start).days // 7 + 1
+            return cls(period, start, weeks, 7, DAY_MINUTES)
+        slot = bucket_minutes or 60
+        if slot not in BUCKET_MINUTES:
+            raise ValueError(f"bucket_minutes must be one of {', '.join(map(str, BUCKET_MINUTES))}")
+        return cls(period, start, (end - start).days + 1, DAY_MINUTES // slot, slot)
+
+
+def shape(grid: Grid, values: np.ndarray, timezone: str) -> dict:
+    """Lay flat (order_count, total_amount) pairs in slot order out as dense rows."""
+    cells = values.reshape(grid.rows, grid.columns, 2)
+    counts = cells[..., 0].astype(np.int64)
+    amounts = np.round(cells[..., 1], 2)
+    return {
+        "period": grid.period,
+        "timezone": timezone,
+        "slot_minutes": grid.slot_minutes,
+        "rows": [(grid.start + timedelta(days=i * grid.row_days)).isoformat() for i in range(grid.rows)],
+        # Minutes from the start of the row: hours of the day, or days of the week
+        "columns": list(range(0, grid.columns * grid.slot_minutes, grid.slot_minutes)),
+        "order_count": counts.tolist(),
+        "total_amount": amounts.tolist(),
+        "row_totals": {
+            "order_count": counts.sum(axis=1).tolist(),
+            "total_amount": np.round(amounts.sum(axis=1), 2).tolist(),
+        },
+        "column_totals": {
+            "order_count": counts.sum(axis=0).tolist(),
+            "total_amount": np.round(amounts.sum(axis=0), 2).tolist(),
+        },
+        "max": {"order_count": int(counts.max()), "total_amount": float(amounts.max())},
+    }
+
+
+def local_today(timezone: str) -> date:
+    return datetime.now(ZoneInfo(timezone)).date()
+
+
+def to_utc(local: datetime, timezone: str) -> datetime:
+    """Naive local wall-clock time to the naive UTC the order tables store."""
+    return local.replace(tzinfo=ZoneInfo(timezone)).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+
+def grid_params(venue_id: int, timezone: str, grid: Grid) -> dict:
+    start = datetime.combine(grid.start, datetime.min.time())
+    end = datetime.combine(grid.end, datetime.min.time())
+    return {"venue_id": venue_id, "tz": timezone, "start": start, "end": end, "slot": grid.slot_minutes}
+
+
+def heatmap(db: Session, venue_id: int, timezone: str, grid: Grid) -> dict:
+    result = db.execute(_GRID_SQL, grid_params(venue_id, timezone, grid))
+    size = grid.rows * grid.columns
+    values = np.fromiter(chain.from_iterable(result), dtype=np.float64, count=2 * size)
+    return shape(grid, values, timezone)
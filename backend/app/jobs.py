@@ -0,0 +1,84 @@
+"""Maintenance jobs registered on the scheduler (see app.scheduler).
+
+Each job's interval comes from the environment; 0 disables it:
+
+* ``archive.closed_orders``: ``app.archive.archive_closed_orders``, every
+  ``ARCHIVE_INTERVAL_SECONDS`` (default 3600);
+* ``rollups.refresh``: ``app.rollups.refresh``, which refreshes the views
+  that are due, every ``ROLLUP_CHECK_INTERVAL`` (default 60);
+* ``events.purge_published``: ``app.events.purge_published``, every
+  ``OUTBOX_PURGE_INTERVAL_SECONDS`` (default 3600);
+* ``guests.purge``: ``purge_guests`` below, every
+  ``GUEST_PURGE_INTERVAL_SECONDS`` (default 3600);
+* ``ratelimit.purge_idle``: idle shared rate limit buckets, with the Postgres
+  backend only, every ``RATE_LIMIT_PURGE_INTERVAL_SECONDS`` (default 300);
+* ``scheduler.purge_runs``: old ``job_runs`` rows, daily.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app import archive, events, ratelimit, rollups, scheduler
+from app.database import get_engine
+
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "3600"))
+OUTBOX_PURGE_INTERVAL = float(os.environ.get("OUTBOX_PURGE_INTERVAL_SECONDS", "3600"))
+GUEST_PURGE_INTERVAL = float(os.environ.get("GUEST_PURGE_INTERVAL_SECONDS", "3600"))
+RATE_LIMIT_PURGE_INTERVAL = float(os.environ.get("RATE_LIMIT_PURGE_INTERVAL_SECONDS", "300"))
+GUEST_RETENTION_DAYS = int(os.environ.get("GUEST_RETENTION_DAYS", "30"))
+GUEST_PURGE_BATCH_SIZE = 5000
+
+# Anonymous guests only: no contact details, and no order still waiting to be
+# paid. Their closed orders stay, with user_id set to NULL by the foreign key.
+_PURGE_GUESTS_SQL = text(
+    """
+    DELETE FROM users
+    WHERE id IN (
+        SELECT u.id FROM users AS u
+        WHERE u.created_at < :cutoff
+          AND u.email IS NULL AND u.phone IS NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM orders AS o WHERE o.user_id = u.id AND o.status <> 'closed'
+          )
+        ORDER BY u.id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    """
+)
+
+
+def purge_guests(
+    retention_days: int = GUEST_RETENTION_DAYS,
+    batch_size: int = GUEST_PURGE_BATCH_SIZE,
+    engine: Engine | None = None,
+) -> int:
+    """Delete anonymous guest users older than ``retention_days``, a batch per transaction."""
+    engine = engine or get_engine()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        with engine.begin() as connection:
+            count = connection.execute(_PURGE_GUESTS_SQL, {"cutoff": cutoff, "limit": batch_size}).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def purge_rate_limit_buckets(engine: Engine | None = None) -> None:
+    # Requests purge as they go; this catches quiet periods with no requests
+    with (engine or get_engine()).begin() as connection:
+        ratelimit.PostgresBackend.purge_idle(connection)
+
+
+def register_jobs(target: scheduler.Scheduler) -> None:
+    target.register("archive.closed_orders", archive.archive_closed_orders, ARCHIVE_INTERVAL)
+    target.register("rollups.refresh", rollups.refresh, rollups.CHECK_INTERVAL)
+    target.register("events.purge_published", events.purge_published, OUTBOX_PURGE_INTERVAL)
+    target.register("guests.purge", purge_guests, GUEST_PURGE_INTERVAL)
+    if ratelimit.BACKEND_NAME == "postgres":
+        target.register("ratelimit.purge_idle", purge_rate_limit_buckets, RATE_LIMIT_PURGE_INTERVAL)
+    target.register("scheduler.purge_runs", scheduler.purge_runs, 86400)
@@ -0,0 +1,283 @@
+"""Live order status for guest devices, one channel per table.
+
+A guest's phone opens ``GET /api/live/tables/{code}`` as a server-sent event
+stream. It first gets a ``snapshot`` of the table's open orders, then a
+``status`` event whenever one of them is placed, processed, checked out or
+deleted. Messages for every order, with or without a table, also reach
+in-process listeners registered with ``LiveHub.add_listener``.
+
+Order changes are published with ``pg_notify`` inside the transaction that
+records the order event (see ``app.events.record_event``), so a notification
+goes out only if the change commits. Every worker keeps one dedicated
+connection outside the pool that ``LISTEN``s on the channel. Its socket is
+registered with the event loop, so notifications from any worker or replica
+are read without a thread or a polling timer and fanned out to the local
+subscribers of that venue and table.
+
+An idle subscriber costs a small bounded queue and one suspended coroutine,
+and holds no database connection after its snapshot. A worker accepts up to
+``LIVE_MAX_CONNECTIONS`` streams (default 10000). Streams send a comment every
+``LIVE_HEARTBEAT_SECONDS`` (default 25) so proxies keep them open. If the
+listener connection drops, every stream is closed and browsers reconnect to
+a fresh snapshot, so no change is missed silently. ``LIVE_ENABLED=false``
+turns the listener and the endpoint off.
+
+The listener uses the psycopg2 driver of the main engine.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app import metrics, models
+from app.database import get_engine
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("LIVE_ENABLED", "true").lower() != "false"
+MAX_CONNECTIONS = int(os.environ.get("LIVE_MAX_CONNECTIONS", "10000"))
+HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", "25"))
+RECONNECT_SECONDS = 5.0
+# Status messages buffered per stream; a stalled client loses the oldest
+QUEUE_SIZE = 16
+CHANNEL = "order_status"
+
+# Outbox event type -> status pushed to the table; None keeps the order's own
+NOTIFY_EVENTS = {
+    "order.created": None,
+    "order.status_changed": None,
+    "order.checked_out": None,
+    "order.deleted": "deleted",
+}
+
+
+def _message(event_type: str, order: models.Order) -> dict:
+    payload = {
+        "venue_id": order.venue_id,
+        "table_id": order.table_id,
+        "order_id": order.id,
+        "session_id": order.session_id,
+        "status": NOTIFY_EVENTS[event_type] or order.status,
+        "event": event_type,
+    }
+    if event_type == "order.created":
+        # For in-process listeners such as the recommender
+        payload["product_ids"] = sorted({item.product_id for item in order.items})
+    return payload
+
+
+def notify(db: Session, event_type: str, order: models.Order) -> None:
+    """Queue a status message for the order; Postgres sends it on commit."""
+    notify_many(db, [(event_type, order)])
+
+
+def notify_many(db: Session | Connection, changes: list[tuple[str, models.Order]]) -> None:
+    """``notify`` for several ``(event_type, order)`` pairs in one statement."""
+    if not ENABLED:
+        return
+    payloads = [
+        dumps(_message(event_type, order)).decode()
+        for event_type, order in changes
+        if event_type in NOTIFY_EVENTS
+    ]
+    if payloads:
+        db.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS TEXT[])) AS payload"),
+            {"channel": CHANNEL, "payloads": payloads},
+        )
+
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+HEARTBEAT = b": keepalive\n\n"
+
+
+class LiveHub:
+    """Per-worker registry of table streams, fed by one LISTEN connection.
+
+    Not thread-safe: subscribe and unsubscribe from the event loop only.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.connections = 0
+        self._channels: dict[tuple[int, str], set[asyncio.Queue]] = {}
+        self._listeners: list[Callable[[dict], None]] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listener = None
+        self._retry: asyncio.TimerHandle | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._listener is not None
+
+    def subscribe(self, venue_id: int, table_code: str) -> asyncio.Queue | None:
+        if self.connections >= self.max_connections:
+            return None
+        queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self._channels.setdefault((venue_id, table_code), set()).add(queue)
+        self.connections += 1
+        metrics.LIVE_CONNECTIONS.inc()
+        return queue
+
+    def unsubscribe(self, venue_id: int, table_code: str, queue: asyncio.Queue) -> None:
+        key = (venue_id, table_code)
+        queues = self._channels.get(key)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._channels[key]
+        self.connections -= 1
+        metrics.LIVE_CONNECTIONS.dec()
+
+    def add_listener(self, callback: Callable[[dict], None]) -> None:
+        """Call ``callback`` in the event loop with every message, table or not."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def dispatch(self, message: dict) -> None:
+        for callback in self._listeners:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Live listener %r failed", callback)
+        queues = self._channels.get((message.get("venue_id"), message.get("table_id")))
+        if not queues:
+            return
+        for queue in queues:
+            self._put(queue, message)
+        metrics.LIVE_MESSAGES.inc(len(queues))
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, message) -> None:
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    def close_streams(self) -> None:
+        # None ends a stream; browsers reconnect and start from a new snapshot
+        for queues in self._channels.values():
+            for queue in queues:
+                self._put(queue, None)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._connect()
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        self._disconnect()
+        self.close_streams()
+
+    def _connect(self) -> None:
+        self._retry = None
+        engine = get_engine()
+        if engine.dialect.driver != "psycopg2":
+            logger.warning("Live updates need the psycopg2 driver, not %s; disabled", engine.dialect.driver)
+            return
+        try:
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            cparams.setdefault("connect_timeout", 5)
+            # Outside the pool: the connection stays checked out for the worker's lifetime
+            connection = engine.dialect.connect(*cargs, **cparams)
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        except Exception:
+            logger.warning("Could not LISTEN for live updates; retrying", exc_info=True)
+            self._schedule_reconnect()
+            return
+        self._listener = connection
+        self._loop.add_reader(connection.fileno(), self._on_readable)
+        # Anything sent while the listener was down is lost; resync every stream
+        self.close_streams()
+
+    def _disconnect(self) -> None:
+        connection, self._listener = self._listener, None
+        if connection is None:
+            return
+        try:
+            self._loop.remove_reader(connection.fileno())
+            connection.close()
+        except Exception:
+            logger.debug("Closing the live listener failed", exc_info=True)
+
+    def _schedule_reconnect(self) -> None:
+        if not self._stopping and self._retry is None:
+            self._retry = self._loop.call_later(RECONNECT_SECONDS, self._connect)
+
+    def _on_readable(self) -> None:
+        connection = self._listener
+        try:
+            connection.poll()
+        except Exception:
+            logger.warning("Live listener connection lost; reconnecting", exc_info=True)
+            self._disconnect()
+            self.close_streams()
+            self._schedule_reconnect()
+            return
+        while connection.notifies:
+            notification = connection.notifies.pop(0)
+            try:
+                message = json.loads(notification.payload)
+            except ValueError:
+                logger.warning("Ignoring malformed live payload %r", notification.payload)
+                continue
+            self.dispatch(message)
+
+
+HUB = LiveHub()
+
+
+def table_snapshot(db: Session, venue_id: int, table_code: str) -> dict:
+    # Served by the partial open-orders index
+    rows = (
+        db.query(models.Order.id, models.Order.status, models.Order.session_id, models.Order.created_at)
+        .filter(
+            models.Order.venue_id == venue_id,
+            models.Order.status != "closed",
+            models.Order.table_code == table_code,
+        )
+        .order_by(models.Order.created_at.asc())
+        .all()
+    )
+    return {
+        "table_id": table_code,
+        "orders": [
+            {"order_id": row.id, "status": row.status, "session_id": row.session_id, "created_at": row.created_at}
+            for row in rows
+        ],
+    }
+
+
+async def stream(hub: LiveHub, venue_id: int, table_code: str, queue: asyncio.Queue, snapshot: dict):
+    """Server-sent events for one subscriber; unsubscribes however it ends."""
+    try:
+        # retry: how long the browser waits before reconnecting
+        yield b"retry: 3000\n" + format_event("snapshot", snapshot)
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except TimeoutError:
+                yield HEARTBEAT
+                continue
+            if message is None:
+                return
+            yield format_event("status", message)
+    finally:
+        hub.unsubscribe(venue_id, table_code, queue)
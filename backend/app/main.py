@@ -1,22 +1,84 @@
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from app.routers import menu, orders, simulator, tables, users
+from app.routers import events as events_router, live as live_router, menu, orders, prep, simulator, tables, users
+from app.routers import jobs as jobs_router, profiling as profiling_router, venues as venues_router
 from app.routers import ai
-from app.database import Base, get_db, get_engine
+from app.database import get_db, get_engine, get_read_db, get_read_engine, replica_enabled
+from app.database import ReadYourWritesMiddleware
+from app.migrations import run_migrations
 from sqlalchemy import text
-from app import models, security
+from app.profiling import instrument_engine
+from app.serialization import ORJSONResponse
+from app.compression import CompressionMiddleware
+from app.admission import AdmissionMiddleware
+from app.ai.recommend import RECOMMENDER
+from fastapi.datastructures import Default
+from app import events, forecast, heatmaps, jobs, live, metrics, models, profiling, scheduler, security, tabs, venues
 import os
 import socket
 import qrcode
 import base64
 import io
+from functools import lru_cache
 
-app = FastAPI()
+# True once startup tasks ran in this process, or in the gunicorn master
+# that preloaded the app before forking this worker (see gunicorn.conf.py)
+_startup_done = False
+
+
+def run_startup_tasks() -> None:
+    global _startup_done
+    if _startup_done:
+        return
+    # Applies pending migrations once; a no-op SELECT on an up-to-date schema
+    run_migrations()
+    _bootstrap_admin()
+    _startup_done = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    run_startup_tasks()
+    # Per worker: settings changed since the master preloaded the app
+    with get_engine().connect() as connection:
+        profiling.load_settings(connection)
+    dispatcher = None
+    if events.DISPATCH_INTERVAL > 0:
+        # Every worker runs one; an advisory lock lets a single one publish at a time
+        dispatcher = events.OutboxDispatcher()
+        dispatcher.start()
+    if scheduler.ENABLED:
+        # Every worker runs the scheduler; advisory locks let one run each job
+        jobs.register_jobs(scheduler.SCHEDULER)
+        scheduler.SCHEDULER.start()
+    if live.ENABLED:
+        # One LISTEN connection per worker fans status changes out to its
+        # streams, new orders to this worker's recommendation models and
+        # profiling changes to its settings
+        live.HUB.add_listener(RECOMMENDER.on_message)
+        live.HUB.add_listener(profiling.on_message)
+        live.HUB.start()
+    else:
+        RECOMMENDER.without_live_updates()
+    yield
+    # Ends open streams so graceful shutdown does not wait on idle phones
+    live.HUB.stop()
+    if dispatcher is not None:
+        dispatcher.stop()
+    await scheduler.SCHEDULER.stop()
+    # Close pooled connections so Postgres sees a clean disconnect on shutdown
+    get_engine().dispose()
+
+
+# Wrapped in Default() so routes with a response_model keep FastAPI's own
+# Pydantic dump_json path; orjson renders everything returned as plain data
+app = FastAPI(lifespan=lifespan, default_response_class=Default(ORJSONResponse))
 templates = Jinja2Templates(directory="app/templates")
 
 frontend_host = os.environ.get("FRONTEND_HOST", "localhost")
@@ -38,7 +100,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+# Only these peers (IPs or CIDRs, comma-separated) may set X-Forwarded-For;
+# anyone else could pick their own client IP and dodge the rate limits
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+# Inside metrics so shed requests still show up in the request counters
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+instrument_engine(get_engine())
+if replica_enabled():
+    instrument_engine(get_read_engine())
 
 app.include_router(menu.router, prefix="/api/menu", tags=["Menu"])
 app.include_router(tables.router, prefix="/api/tables", tags=["Tables"])
@@ -46,6 +118,12 @@ app.include_router(orders.router, prefix="/api/orders", tags=["Orders"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(simulator.router, prefix="/api/simulator", tags=["Simulator"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI"])
+app.include_router(prep.router, prefix="/api/prep", tags=["Preparation"])
+app.include_router(events_router.router, prefix="/api/events", tags=["Events"])
+app.include_router(profiling_router.router, prefix="/api/profiling", tags=["Profiling"])
+app.include_router(venues_router.router, prefix="/api/venues", tags=["Venues"])
+app.include_router(live_router.router, prefix="/api/live", tags=["Live"])
+app.include_router(jobs_router.router, prefix="/api/jobs", tags=["Jobs"])
 
 PAYMENT_METHODS = [
     "cash",
@@ -55,128 +133,17 @@ PAYMENT_METHODS = [
 ]
 
 
-def _column_exists(connection, table: str, column: str) -> bool:
-    result = connection.execute(
-        text(
-            "SELECT 1 FROM information_schema.columns "
-            "WHERE table_name = :table AND column_name = :column"
-        ),
-        {"table": table, "column": column},
-    )
-    return result.first() is not None
-
-
-def _ensure_schema() -> None:
-    # Create or migrate schema as needed
-    engine = get_engine()
-    # Ensure all ORM tables exist before running ALTERs against them
-    Base.metadata.create_all(bind=engine)
-    with engine.begin() as connection:
-        connection.execute(
-            text(
-                """
-                CREATE TABLE IF NOT EXISTS tables (
-                    id SERIAL PRIMARY KEY,
-                    code VARCHAR(80) UNIQUE NOT NULL,
-                    name VARCHAR(120),
-                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-                );
-                """
-            )
-        )
-        # Migrate existing schema if needed
-        connection.execute(
-            text("ALTER TABLE users ADD COLUMN IF NOT EXISTS table_code VARCHAR(80);")
-        )
-        connection.execute(
-            text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS table_code VARCHAR(80);")
-        )
-        connection.execute(
-            text("ALTER TABLE users ADD COLUMN IF NOT EXISTS phone VARCHAR(30);")
-        )
-        connection.execute(
-            text("ALTER TABLE users ADD COLUMN IF NOT EXISTS age INTEGER;")
-        )
-        if _column_exists(connection, "users", "table_id"):
-            connection.execute(
-                text(
-                    "UPDATE users SET table_code = table_id "
-                    "WHERE table_code IS NULL AND table_id IS NOT NULL;"
-                )
-            )
-        if _column_exists(connection, "orders", "table_id"):
-            connection.execute(
-                text(
-                    "UPDATE orders SET table_code = table_id "
-                    "WHERE table_code IS NULL AND table_id IS NOT NULL;"
-                )
-            )
-        connection.execute(text("ALTER TABLE users DROP COLUMN IF EXISTS table_id;"))
-        connection.execute(text("ALTER TABLE orders DROP COLUMN IF EXISTS table_id;"))
-        connection.execute(
-            text(
-                "ALTER TABLE users ADD COLUMN IF NOT EXISTS table_ref_id INTEGER;"
-            )
-        )
-        connection.execute(
-            text(
-                "ALTER TABLE orders ADD COLUMN IF NOT EXISTS table_ref_id INTEGER;"
-            )
-        )
-
-        codes = set()
-        result = connection.execute(
-            text("SELECT DISTINCT table_code FROM orders WHERE table_code IS NOT NULL")
-        )
-        codes.update(row[0] for row in result if row[0])
-        result = connection.execute(
-            text("SELECT DISTINCT table_code FROM users WHERE table_code IS NOT NULL")
-        )
-        codes.update(row[0] for row in result if row[0])
-
-        for code in codes:
-            res = connection.execute(
-                text(
-                    "INSERT INTO tables (code, created_at) VALUES (:code, CURRENT_TIMESTAMP) "
-                    "ON CONFLICT (code) DO NOTHING RETURNING id"
-                ),
-                {"code": code},
-            )
-            table_id = res.scalar()
-            if table_id is None:
-                table_id = connection.execute(
-                    text("SELECT id FROM tables WHERE code = :code"), {"code": code}
-                ).scalar()
-
-            if table_id is not None:
-                connection.execute(
-                    text(
-                        "UPDATE orders SET table_ref_id = :tid WHERE table_code = :code AND (table_ref_id IS NULL OR table_ref_id <> :tid)"
-                    ),
-                    {"tid": table_id, "code": code},
-                )
-                connection.execute(
-                    text(
-                        "UPDATE users SET table_ref_id = :tid WHERE table_code = :code AND (table_ref_id IS NULL OR table_ref_id <> :tid)"
-                    ),
-                    {"tid": table_id, "code": code},
-                )
-
-    # Run again is harmless; kept for idempotency
-    Base.metadata.create_all(bind=engine)
-    _bootstrap_admin()
-
-
-@app.on_event("startup")
-def on_startup() -> None:
-    _ensure_schema()
-
-
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Bar API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 def get_host_ip():
     """Returns the IP/hostname reachable by clients scanning the QR code."""
 
@@ -228,17 +195,37 @@ def _build_public_base_url(request: Request) -> str:
     return f"{scheme}://{ip}:{port}"
 
 
+@lru_cache(maxsize=512)
+def _render_qr_base64(url: str) -> str:
+    # PNG of the QR code for `url`, base64-encoded for an inline <img>; the
+    # same table URL always renders the same image, so keep it
+    buf = io.BytesIO()
+    qrcode.make(url).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
 @app.get("/qrcode", response_class=HTMLResponse)
-def generate_qrcodes(request: Request, db: Session = Depends(get_db)):
+def generate_qrcodes(
+    request: Request,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
 
     # Determine the base URL for the QR codes
     base_url = _build_public_base_url(request)
+    # Venues without their own hostname are told apart by the QR URL
+    venue_query = "" if venue.is_default or venue.hostname else f"?venue={venue.slug}"
 
     # Ensure at least 10 tables exist
-    tables = db.query(models.Table).order_by(models.Table.code.asc()).all()
+    tables = (
+        db.query(models.Table)
+        .filter(models.Table.venue_id == venue.id)
+        .order_by(models.Table.code.asc())
+        .all()
+    )
 
     if not tables:
-        default_tables = [models.Table(code=f"table{i}") for i in range(1, 11)]
+        default_tables = [models.Table(venue_id=venue.id, code=f"table{i}") for i in range(1, 11)]
         db.add_all(default_tables)
         db.commit()
         tables = default_tables
@@ -247,10 +234,8 @@ def generate_qrcodes(request: Request, db: Session = Depends(get_db)):
     qrs: list[tuple[str, str, str, str]] = []
 
     for table in tables:
-        table_url = f"{base_url}/table/{table.code}"
-        buf = io.BytesIO()
-        qrcode.make(table_url).save(buf, format="PNG")
-        encoded = base64.b64encode(buf.getvalue()).decode("ascii")
+        table_url = f"{base_url}/table/{table.code}{venue_query}"
+        encoded = _render_qr_base64(table_url)
         qrs.append((table.code, table.name or table.code, table_url, encoded))
 
     # Create simple HTML content to display the QR codes
@@ -367,16 +352,19 @@ def logout(request: Request):
 def list_orders_admin(request: Request, db: Session = Depends(get_db)):
     
     # Session cookie check
-    if not security.get_admin_from_request(request, db):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
         return RedirectResponse(url="/admin/login", status_code=303)
     
-    # List of non-closed orders
+    # List of the venue's non-closed orders
     orders = (
         db.query(models.Order)
-        .filter(models.Order.status != "closed")
+        .filter(models.Order.venue_id == admin.venue_id, models.Order.status != "closed")
         .order_by(models.Order.created_at.desc())
         .all()
     )
+    # Open tabs carry their own running totals; nothing is re-summed here
+    sessions = tabs.open_sessions(db, admin.venue_id)
 
     # Renders orders.html template
     return templates.TemplateResponse(
@@ -384,6 +372,7 @@ def list_orders_admin(request: Request, db: Session = Depends(get_db)):
         {
             "request": request,
             "orders": orders,
+            "sessions": sessions,
             "payment_methods": PAYMENT_METHODS,
         },
     )
@@ -398,21 +387,32 @@ def admin_dashboard(request: Request, db: Session = Depends(get_db)):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 
+def _venue_order(db: Session, admin: models.StaffUser, order_id: int) -> models.Order | None:
+    return (
+        db.query(models.Order)
+        .filter(models.Order.id == order_id, models.Order.venue_id == admin.venue_id)
+        .first()
+    )
+
+
 @app.post("/admin/orders/{order_id}/delete")
 def delete_order_admin(
     order_id: int,
     request: Request,
     db: Session = Depends(get_db),
 ):
-    if not security.get_admin_from_request(request, db):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
         return RedirectResponse(url="/admin/login", status_code=303)
     
-    # Checks whether the order exists
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Checks whether the order exists in the staff member's venue
+    order = _venue_order(db, admin, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    # Deletes from DB
+    # Deletes from DB, with its event and tab update in the same transaction
+    events.record_event(db, "order.deleted", order)
+    tabs.remove_order(db, order)
     db.delete(order)
     db.commit()
 
@@ -426,16 +426,19 @@ def mark_order_processed(
     request: Request,
     db: Session = Depends(get_db),
 ):
-    if not security.get_admin_from_request(request, db):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
         return RedirectResponse(url="/admin/login", status_code=303)
     
-    # Search for the order
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Search for the order in the staff member's venue
+    order = _venue_order(db, admin, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
 
     # Change status, commit and refresh
+    previous_status = order.status
     order.status = "processed"
+    events.record_event(db, "order.status_changed", order, previous_status=previous_status)
     db.commit()
 
     return RedirectResponse(url="/admin/orders", status_code=303)
@@ -448,11 +451,12 @@ def mark_order_checkout(
     payment_method: str = Form(...),
     db: Session = Depends(get_db),
 ):
-    if not security.get_admin_from_request(request, db):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
         return RedirectResponse(url="/admin/login", status_code=303)
     
-    # Search for the order
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Search for the order in the staff member's venue
+    order = _venue_order(db, admin, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -461,159 +465,89 @@ def mark_order_checkout(
     if method not in PAYMENT_METHODS:
         raise HTTPException(status_code=400, detail="Unsupported payment method")
 
-    # Mark order as closed and create transaction record on the DB
-    order.status = "closed"
-    if order.transaction:
-        order.transaction.method = method
-        order.transaction.amount = order.total_amount
-        order.transaction.created_at = datetime.utcnow()
-    else:
-        transaction = models.Transaction(
-            order=order,
-            method=method,
-            amount=order.total_amount,
-        )
-        db.add(transaction)
+    # Mark order as closed, create the transaction and count it on the tab
+    tabs.checkout_order(db, order, method)
     db.commit()
 
     return RedirectResponse(url="/admin/orders", status_code=303)
 
 
+@app.post("/admin/sessions/{session_id}/checkout")
+def checkout_table_session(
+    session_id: int,
+    request: Request,
+    payment_method: str = Form(...),
+    db: Session = Depends(get_db),
+):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
+        return RedirectResponse(url="/admin/login", status_code=303)
+
+    # Validate payment method
+    method = payment_method.strip().lower()
+    if method not in PAYMENT_METHODS:
+        raise HTTPException(status_code=400, detail="Unsupported payment method")
+
+    # Pays every open order of the tab and closes it in one transaction
+    if tabs.checkout_session(db, admin.venue_id, session_id, method) is None:
+        raise HTTPException(status_code=404, detail="Open tab not found")
+    db.commit()
+
+    return RedirectResponse(url="/admin/orders", status_code=303)
+
+
+# Module-level so benchmarks/explain_check.py checks the plans of these exact statements
+DASHBOARD_TOTALS_SQL = text(
+    "SELECT COALESCE(SUM(total_amount), 0), COUNT(*) "
+    "FROM orders_all WHERE venue_id = :venue_id AND status = 'closed'"
+)
+DASHBOARD_ITEMS_SQL = text(
+    """
+    SELECT oi.name, SUM(oi.quantity * oi.unit_price) AS total
+    FROM order_items_all AS oi
+    JOIN orders_all AS o ON oi.order_id = o.id
+    WHERE o.venue_id = :venue_id AND o.status = 'closed'
+    GROUP BY oi.name
+    ORDER BY total DESC
+    """
+)
+DASHBOARD_PAYMENTS_SQL = text(
+    """
+    SELECT t.method, COUNT(*) AS count
+    FROM transactions_all AS t
+    JOIN orders_all AS o ON t.order_id = o.id
+    WHERE o.venue_id = :venue_id
+    GROUP BY t.method
+    ORDER BY count DESC
+    """
+)
+
+
 @app.get("/api/dashboard/summary")
 def dashboard_summary(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: models.StaffUser = Depends(security.require_admin_api),
 ):
-    total_amount = (
-        db.query(models.Order)
-        .filter(models.Order.status == "closed")
-        .with_entities(text("COALESCE(SUM(total_amount), 0)"))
-        .scalar()
-    )
-    closed_count = (
-        db.query(models.Order)
-        .filter(models.Order.status == "closed")
-        .count()
-    )
-
-    item_rows = (
-        db.query(
-            models.OrderItem.name,
-            text("SUM(order_items.quantity * order_items.unit_price) AS total"),
-        )
-        .join(models.Order, models.OrderItem.order_id == models.Order.id)
-        .filter(models.Order.status == "closed")
-        .group_by(models.OrderItem.name)
-        .order_by(text("total DESC"))
-        .all()
-    )
+    # The *_all views cover live and archived orders alike; every query is
+    # scoped to the staff member's venue, which leads the orders indexes
+    venue = {"venue_id": admin.venue_id}
+    total_amount, closed_count = db.execute(DASHBOARD_TOTALS_SQL, venue).one()
     items = [
         {"name": name, "total": float(total)}
-        for name, total in item_rows
+        for name, total in db.execute(DASHBOARD_ITEMS_SQL, venue).all()
     ]
-
-    payment_rows = (
-        db.query(
-            models.Transaction.method,
-            text("COUNT(*) AS count"),
-        )
-        .join(models.Order, models.Transaction.order_id == models.Order.id)
-        .group_by(models.Transaction.method)
-        .order_by(text("count DESC"))
-        .all()
-    )
+    payment_rows = db.execute(DASHBOARD_PAYMENTS_SQL, venue).all()
     payments = [
         {"method": method.capitalize(), "count": count}
         for method, count in payment_rows
     ]
 
-    now = datetime.utcnow()
-
-    hourly_rows = db.execute(
-        text(
-            """
-            SELECT DATE(created_at) AS day,
-                   EXTRACT(HOUR FROM created_at)::INT AS hour,
-                   COUNT(*) AS order_count,
-                   COALESCE(SUM(total_amount), 0) AS total_amount
-            FROM orders
-            WHERE created_at >= NOW() - INTERVAL '7 days'
-            GROUP BY day, hour
-            ORDER BY day, hour
-            """
-        )
-    ).mappings().all()
-
-    hourly_dates = [
-        (now - timedelta(days=offset)).date()
-        for offset in reversed(range(7))
-    ]
-    hourly_values: dict[str, dict[str, float | int]] = {}
-    for row in hourly_rows:
-        day = row["day"]
-        hour = int(row["hour"])
-        key = f"{day.isoformat()}|{hour}"
-        hourly_values[key] = {
-            "order_count": int(row["order_count"]),
-            "total_amount": float(row["total_amount"] or 0),
-        }
-
-    current_week_start = (now - timedelta(days=now.weekday())).date()
-    week_windows = [
-        current_week_start - timedelta(weeks=offset)
-        for offset in reversed(range(8))
-    ]
-
-    dow_rows = db.execute(
-        text(
-            """
-            SELECT DATE_TRUNC('week', created_at)::date AS week_start,
-                   EXTRACT(DOW FROM created_at)::INT AS dow,
-                   COUNT(*) AS order_count,
-                   COALESCE(SUM(total_amount), 0) AS total_amount
-            FROM orders
-            WHERE created_at >= NOW() - INTERVAL '8 weeks'
-            GROUP BY week_start, dow
-            ORDER BY week_start, dow
-            """
-        )
-    ).mappings().all()
-
-    dow_labels = {
-        0: "Dom",
-        1: "Lun",
-        2: "Mar",
-        3: "Mer",
-        4: "Gio",
-        5: "Ven",
-        6: "Sab",
-    }
-    dow_order = [1, 2, 3, 4, 5, 6, 0]
-    dow_days = [
-        {"index": idx, "label": dow_labels[idx]}
-        for idx in dow_order
-    ]
-    dow_values: dict[str, dict[str, float | int]] = {}
-    for row in dow_rows:
-        week_start = row["week_start"]
-        dow = int(row["dow"])
-        key = f"{week_start.isoformat()}|{dow}"
-        dow_values[key] = {
-            "order_count": int(row["order_count"]),
-            "total_amount": float(row["total_amount"] or 0),
-        }
-
-    heatmaps = {
-        "hourly": {
-            "dates": [day.isoformat() for day in hourly_dates],
-            "hours": list(range(24)),
-            "values": hourly_values,
-        },
-        "day_of_week": {
-            "weeks": [week.isoformat() for week in week_windows],
-            "days": dow_days,
-            "values": dow_values,
-        },
+    # Last 7 days by hour and last 8 weeks by day, in the venue's time zone
+    timezone = venues.staff_venue(db, admin).timezone
+    today = heatmaps.local_today(timezone)
+    grids = {"hourly": heatmaps.Grid.plan("day", today), "day_of_week": heatmaps.Grid.plan("week", today)}
+    heatmap_data = {
+        name: heatmaps.heatmap(db, admin.venue_id, timezone, grid) for name, grid in grids.items()
     }
 
     return {
@@ -621,7 +555,64 @@ def dashboard_summary(
         "closed_count": closed_count,
         "items": items,
         "payments": payments,
-        "heatmaps": heatmaps,
+        "heatmaps": heatmap_data,
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+
+
+@app.get("/api/dashboard/heatmap")
+def dashboard_heatmap(
+    period: str = Query("day", description="day: days x slots of bucket_minutes; week: weeks x days"),
+    start: date | None = Query(default=None, description="First local day; defaults to 7 days or 8 weeks before end"),
+    end: date | None = Query(default=None, description="Last local day, inclusive; defaults to today"),
+    bucket_minutes: int | None = Query(default=None, description="Slot size for period=day, 15 to 720; default 60"),
+    tz: str | None = Query(default=None, description="IANA time zone; defaults to the venue's"),
+    db: Session = Depends(get_read_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    timezone = tz or venues.staff_venue(db, admin).timezone
+    if not heatmaps.valid_timezone(timezone):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
+    try:
+        grid = heatmaps.Grid.plan(period, heatmaps.local_today(timezone), start, end, bucket_minutes)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return heatmaps.heatmap(db, admin.venue_id, timezone, grid)
+
+
+@app.get("/api/dashboard/forecast")
+def dashboard_forecast(
+    hours: int = Query(168, ge=1, le=336, description="Hours ahead, starting with the venue's next full local hour"),
+    top: int | None = Query(default=None, ge=1, description="Only the N items with the highest expected demand"),
+    db: Session = Depends(get_read_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    venue = venues.staff_venue(db, admin)
+    result = forecast.venue_forecast(db, venue.id, venue.timezone, hours)
+    catalog = venues.catalog_for(db, venue)
+    expected, high = result["expected"], result["high"]
+    items = []
+    # Row 0 is orders; products no longer on the menu are left out
+    for row, product_id in enumerate(result["products"], start=1):
+        doc = catalog.docs_by_id.get(product_id)
+        if doc is None:
+            continue
+        items.append(
+            {
+                "id": product_id,
+                "name": doc.name,
+                "total": round(float(expected[row].sum()), 1),
+                "expected": expected[row].tolist(),
+                "high": high[row].tolist(),
+            }
+        )
+    items.sort(key=lambda item: item["total"], reverse=True)
+    return {
+        "timezone": result["timezone"],
+        "start": result["start"].isoformat(),
+        "hours": [hour.isoformat() for hour in result["hours"]],
+        "orders": {"expected": expected[0].tolist(), "high": high[0].tolist()},
+        "items": items[:top] if top else items,
         "generated_at": datetime.utcnow().isoformat(),
     }
 
@@ -631,17 +622,21 @@ def list_closed_orders(
     request: Request,
     day: str | None = Query(default=None, description="Date in YYYY-MM-DD format"),
     hour: int | None = Query(default=None, ge=0, le=23, description="Optional hour filter 0-23"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    if not security.get_admin_from_request(request, db):
+    admin = security.get_admin_from_request(request, db)
+    if not admin:
         return RedirectResponse(url="/admin/login", status_code=303)
 
+    # Day and hour are the venue's local time, as on the dashboard heatmaps
+    timezone = venues.staff_venue(db, admin).timezone
+
     # Date parsing or default today
     try:
         if day:
             target_date = datetime.strptime(day, "%Y-%m-%d")
         else:
-            target_date = datetime.utcnow()
+            target_date = datetime.combine(heatmaps.local_today(timezone), datetime.min.time())
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
@@ -653,19 +648,35 @@ def list_closed_orders(
     else:
         start = start_of_day
         end = start + timedelta(days=1)
+    utc_start, utc_end = heatmaps.to_utc(start, timezone), heatmaps.to_utc(end, timezone)
 
     # Query closed orders created between start and end
     orders = (
         db.query(models.Order)
         .filter(
+            models.Order.venue_id == admin.venue_id,
             models.Order.status == "closed",
-            models.Order.created_at >= start,
-            models.Order.created_at < end,
+            models.Order.created_at >= utc_start,
+            models.Order.created_at < utc_end,
         )
         .order_by(models.Order.created_at.desc())
         .all()
     )
 
+    # Older days live in the archive; the created_at range prunes it to one partition
+    archived = (
+        db.query(models.ArchivedOrder)
+        .filter(
+            models.ArchivedOrder.venue_id == admin.venue_id,
+            models.ArchivedOrder.created_at >= utc_start,
+            models.ArchivedOrder.created_at < utc_end,
+        )
+        .order_by(models.ArchivedOrder.created_at.desc())
+        .all()
+    )
+    if archived:
+        orders = sorted(orders + archived, key=lambda o: o.created_at, reverse=True)
+
     selected_day = start.strftime("%Y-%m-%d")
 
     # Renders orders_closed.html template
@@ -0,0 +1,173 @@
+"""Prometheus metrics.
+
+``MetricsMiddleware`` records per-route request counts, latency histograms
+and in-flight requests, plus how many SQL statements each request ran and
+how long they took (timed by ``app.profiling``).
+``render_metrics`` backs the ``/metrics`` endpoint; with several worker
+processes set ``PROMETHEUS_MULTIPROC_DIR`` so every worker's samples are
+aggregated on scrape.
+"""
+
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app import profiling
+from app.profiling import route_template
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template, method and status code",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum",
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_query_duration_seconds_per_request",
+    "Total time spent in SQL statements per request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL = Gauge(
+    "db_pool_connections",
+    "SQLAlchemy pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+SEARCH_CACHE = Counter(
+    "search_cache_requests_total",
+    "Menu search lookups by cache result",
+    ["result"],
+)
+ORDERS_CREATED = Counter(
+    "orders_created_total",
+    "Orders created through the API",
+)
+RATE_LIMITED = Counter(
+    "rate_limited_total",
+    "Guest requests rejected with 429, by exhausted bucket",
+    ["limit"],
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Requests rejected with 503 by admission control",
+    ["priority_class", "reason"],
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time admitted requests spent queued for a slot",
+    ["priority_class"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ADMISSION_ACTIVE = Gauge(
+    "admission_active_requests",
+    "Requests holding an admission slot",
+    ["priority_class"],
+    multiprocess_mode="livesum",
+)
+LIVE_CONNECTIONS = Gauge(
+    "live_connections",
+    "Open guest live-status streams",
+    multiprocess_mode="livesum",
+)
+LIVE_MESSAGES = Counter(
+    "live_messages_total",
+    "Order status messages delivered to live streams",
+)
+JOB_RUNS = Counter(
+    "scheduled_job_runs_total",
+    "Scheduled maintenance job runs by outcome",
+    ["job", "status"],
+)
+JOB_DURATION = Histogram(
+    "scheduled_job_duration_seconds",
+    "Duration of scheduled maintenance job runs",
+    ["job"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+
+def _update_pool_gauges() -> None:
+    from app.database import get_engine
+
+    pool = get_engine().pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL.labels("checked_out").set(pool.checkedout())
+        DB_POOL.labels("idle").set(pool.checkedin())
+        DB_POOL.labels("overflow").set(max(0, pool.overflow()))
+        DB_POOL.labels("size").set(pool.size())
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats, token = profiling.start_request(scope)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profiling.SETTINGS.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", profiling.server_timing_header(stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            profiling.end_request(token)
+            route = route_template(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
+            _update_pool_gauges()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,862 @@
+"""Versioned schema migrations.
+
+Each migration runs once per database and is recorded in ``schema_version``.
+A Postgres advisory lock serialises concurrent runners, so when several
+replicas boot together exactly one applies pending migrations while the
+others wait for it and then see an up-to-date schema. Once the database is
+current, startup costs a single ``SELECT``.
+
+Run manually (e.g. as a pre-deploy job) with ``python -m app.migrations``.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every replica; identifies the migration lock
+MIGRATION_LOCK_KEY = 727_001
+# Rows per UPDATE batch in data migrations; each batch commits on its own
+BACKFILL_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", "50000"))
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _column_exists(connection: Connection, table: str, column: str) -> bool:
+    result = connection.execute(
+        text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    )
+    return result.first() is not None
+
+
+# The schema of the first release, frozen: later model changes belong in new
+# migrations, so a fresh database at version 1 matches an upgraded one
+BASELINE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS tables (
+        id SERIAL PRIMARY KEY,
+        code VARCHAR(80) UNIQUE NOT NULL,
+        name VARCHAR(120),
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS staff_users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(120) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(50) NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(120) NOT NULL,
+        email VARCHAR(200),
+        phone VARCHAR(30),
+        age INTEGER,
+        created_at TIMESTAMP NOT NULL,
+        table_ref_id INTEGER REFERENCES tables (id) ON DELETE SET NULL,
+        table_code VARCHAR(80)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        id SERIAL PRIMARY KEY,
+        status VARCHAR(50) NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_amount NUMERIC(10, 2) NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        user_id INTEGER REFERENCES users (id) ON DELETE SET NULL,
+        table_ref_id INTEGER REFERENCES tables (id) ON DELETE SET NULL,
+        table_code VARCHAR(80)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_items (
+        id SERIAL PRIMARY KEY,
+        order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+        product_id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        unit_price NUMERIC(10, 2) NOT NULL,
+        quantity INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id SERIAL PRIMARY KEY,
+        order_id INTEGER UNIQUE NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+        amount NUMERIC(10, 2) NOT NULL,
+        method VARCHAR(50) NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    )
+    """,
+    # The first release declared index=True on these primary keys
+    "CREATE INDEX IF NOT EXISTS ix_tables_id ON tables (id)",
+    "CREATE INDEX IF NOT EXISTS ix_staff_users_id ON staff_users (id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)",
+    "CREATE INDEX IF NOT EXISTS ix_transactions_id ON transactions (id)",
+]
+
+
+def _m0001_baseline(connection: Connection) -> None:
+    # Create the first release's tables, then bring databases created by older
+    # releases in line
+    for statement in BASELINE_TABLES:
+        connection.execute(text(statement))
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN IF NOT EXISTS table_code VARCHAR(80);")
+    )
+    connection.execute(
+        text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS table_code VARCHAR(80);")
+    )
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN IF NOT EXISTS phone VARCHAR(30);")
+    )
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN IF NOT EXISTS age INTEGER;")
+    )
+    if _column_exists(connection, "users", "table_id"):
+        connection.execute(
+            text(
+                "UPDATE users SET table_code = table_id "
+                "WHERE table_code IS NULL AND table_id IS NOT NULL;"
+            )
+        )
+    if _column_exists(connection, "orders", "table_id"):
+        connection.execute(
+            text(
+                "UPDATE orders SET table_code = table_id "
+                "WHERE table_code IS NULL AND table_id IS NOT NULL;"
+            )
+        )
+    connection.execute(text("ALTER TABLE users DROP COLUMN IF EXISTS table_id;"))
+    connection.execute(text("ALTER TABLE orders DROP COLUMN IF EXISTS table_id;"))
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN IF NOT EXISTS table_ref_id INTEGER;")
+    )
+    connection.execute(
+        text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS table_ref_id INTEGER;")
+    )
+
+
+def _backfill_table_ref(connection: Connection, table: str) -> None:
+    # Walk the primary key in fixed ranges so each UPDATE touches a bounded
+    # number of rows and the work is committed incrementally
+    bounds = connection.execute(
+        text(f"SELECT MIN(id), MAX(id) FROM {table} WHERE table_code IS NOT NULL")
+    ).first()
+    if bounds is None or bounds[0] is None:
+        return
+    low, high = int(bounds[0]), int(bounds[1])
+    total = high - low + 1
+    updated = 0
+    for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        stop = start + BACKFILL_BATCH_SIZE
+        result = connection.execute(
+            text(
+                f"""
+                UPDATE {table} AS target
+                SET table_ref_id = t.id
+                FROM tables AS t
+                WHERE target.table_code = t.code
+                  AND target.id >= :start AND target.id < :stop
+                  AND target.table_ref_id IS DISTINCT FROM t.id
+                """
+            ),
+            {"start": start, "stop": stop},
+        )
+        connection.commit()
+        updated += result.rowcount or 0
+        done = min(stop, high + 1) - low
+        logger.info(
+            "Backfill %s.table_ref_id: %d/%d ids scanned (%.0f%%), %d rows updated",
+            table, done, total, 100.0 * done / total, updated,
+        )
+
+
+def _m0002_backfill_table_refs(connection: Connection) -> None:
+    # One statement creates every missing table row, whatever the number of codes
+    connection.execute(
+        text(
+            """
+            INSERT INTO tables (code, created_at)
+            SELECT DISTINCT code, CURRENT_TIMESTAMP
+            FROM (
+                SELECT table_code AS code FROM orders
+                WHERE table_code IS NOT NULL AND table_code <> ''
+                UNION
+                SELECT table_code AS code FROM users
+                WHERE table_code IS NOT NULL AND table_code <> ''
+            ) AS codes
+            ON CONFLICT DO NOTHING
+            """
+        )
+    )
+    connection.commit()
+    for table in ("orders", "users"):
+        _backfill_table_ref(connection, table)
+
+
+# Index names match those SQLAlchemy derives from app/models.py
+HOT_PATH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_orders_open_created_at ON orders (created_at) WHERE status <> 'closed'",
+    "CREATE INDEX IF NOT EXISTS ix_orders_status_created_at ON orders (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_table_ref_id ON orders (table_ref_id)",
+    "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_table_ref_id ON users (table_ref_id)",
+]
+
+
+def _m0003_hot_path_indexes(connection: Connection) -> None:
+    # transactions.order_id is already covered by its UNIQUE constraint
+    for statement in HOT_PATH_INDEXES:
+        connection.execute(text(statement))
+    for table in ("orders", "order_items", "users"):
+        connection.execute(text(f"ANALYZE {table}"))
+
+
+def _execute_all(connection: Connection, statements: list[str]) -> None:
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+# Every table below is spelled out as it shipped, like BASELINE_TABLES, and
+# changed afterwards only by later migrations, so the schema a revision
+# produces never depends on the current models
+
+# Primary keys are copied from the live rows, hence no sequences. The items
+# and transactions of an order are looked up by order id, not by month
+ARCHIVE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS orders_archive (
+        id INTEGER NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_amount NUMERIC(10, 2) NOT NULL,
+        user_id INTEGER,
+        table_ref_id INTEGER,
+        table_code VARCHAR(80),
+        archived_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_items_archive (
+        id INTEGER PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        unit_price NUMERIC(10, 2) NOT NULL,
+        quantity INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_order_items_archive_order_id ON order_items_archive (order_id)",
+    """
+    CREATE TABLE IF NOT EXISTS transactions_archive (
+        id INTEGER PRIMARY KEY,
+        order_id INTEGER UNIQUE NOT NULL,
+        amount NUMERIC(10, 2) NOT NULL,
+        method VARCHAR(50) NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    )
+    """,
+]
+
+
+def _m0004_order_archive(connection: Connection) -> None:
+    _execute_all(connection, ARCHIVE_TABLES)
+    # Reporting reads live and archived history through these views
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW orders_all AS
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code
+            FROM orders
+            UNION ALL
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code
+            FROM orders_archive
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW order_items_all AS
+            SELECT id, order_id, product_id, name, unit_price, quantity FROM order_items
+            UNION ALL
+            SELECT id, order_id, product_id, name, unit_price, quantity FROM order_items_archive
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW transactions_all AS
+            SELECT id, order_id, amount, method, created_at FROM transactions
+            UNION ALL
+            SELECT id, order_id, amount, method, created_at FROM transactions_archive
+            """
+        )
+    )
+
+
+PREP_TASKS_TABLE = [
+    """
+    CREATE TABLE IF NOT EXISTS prep_tasks (
+        id SERIAL PRIMARY KEY,
+        order_id INTEGER NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+        order_item_id INTEGER NOT NULL REFERENCES order_items (id) ON DELETE CASCADE,
+        station VARCHAR(20) NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        quantity INTEGER NOT NULL,
+        prep_seconds INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        due_at TIMESTAMP NOT NULL,
+        claimed_by VARCHAR(120),
+        claimed_at TIMESTAMP,
+        completed_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_prep_tasks_order_id ON prep_tasks (order_id)",
+    "CREATE INDEX IF NOT EXISTS ix_prep_tasks_queued_station_due ON prep_tasks (station, due_at) "
+    "WHERE status = 'queued'",
+]
+
+
+def _m0005_prep_queue(connection: Connection) -> None:
+    _execute_all(connection, PREP_TASKS_TABLE)
+
+
+OUTBOX_TABLE = [
+    """
+    CREATE TABLE IF NOT EXISTS outbox_events (
+        id BIGSERIAL PRIMARY KEY,
+        txid BIGINT NOT NULL DEFAULT (pg_current_xact_id()::text::bigint),
+        event_type VARCHAR(60) NOT NULL,
+        aggregate_type VARCHAR(40) NOT NULL,
+        aggregate_id INTEGER NOT NULL,
+        payload JSONB NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        published_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_outbox_events_txid_id ON outbox_events (txid, id)",
+    "CREATE INDEX IF NOT EXISTS ix_outbox_events_pending ON outbox_events (txid, id) WHERE published_at IS NULL",
+]
+
+
+def _m0006_outbox(connection: Connection) -> None:
+    _execute_all(connection, OUTBOX_TABLE)
+
+
+# Unlogged: buckets are cheap to lose on a crash and written on every request
+RATE_LIMIT_TABLE = [
+    """
+    CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+        key VARCHAR(200) PRIMARY KEY,
+        tokens FLOAT NOT NULL,
+        updated_at FLOAT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_updated_at ON rate_limit_buckets (updated_at)",
+]
+
+
+def _m0007_rate_limit_buckets(connection: Connection) -> None:
+    _execute_all(connection, RATE_LIMIT_TABLE)
+
+
+VENUE_COLUMN_TABLES = ("tables", "staff_users", "users", "orders", "prep_tasks")
+
+VENUE_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_tables_venue_code ON tables (venue_id, code)",
+    "CREATE INDEX IF NOT EXISTS ix_staff_users_venue_id ON staff_users (venue_id)",
+    "CREATE INDEX IF NOT EXISTS ix_users_venue_created_at ON users (venue_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_venue_open_created_at ON orders (venue_id, created_at) "
+    "WHERE status <> 'closed'",
+    "CREATE INDEX IF NOT EXISTS ix_orders_venue_status_created_at ON orders (venue_id, status, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_venue_created_at ON orders (venue_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_prep_tasks_queued_venue_station_due ON prep_tasks (venue_id, station, due_at) "
+    "WHERE status = 'queued'",
+    "CREATE INDEX IF NOT EXISTS ix_orders_archive_venue_created_at ON orders_archive (venue_id, created_at)",
+]
+
+
+VENUES_TABLE = [
+    """
+    CREATE TABLE IF NOT EXISTS venues (
+        id SERIAL PRIMARY KEY,
+        slug VARCHAR(60) UNIQUE NOT NULL,
+        name VARCHAR(120) NOT NULL,
+        hostname VARCHAR(255) UNIQUE,
+        menu JSONB,
+        created_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    )
+    """,
+]
+
+
+def _m0008_venues(connection: Connection) -> None:
+    from app.models import DEFAULT_VENUE_ID
+
+    _execute_all(connection, VENUES_TABLE)
+    # Existing rows all belong to the one bar that ran before venues existed
+    connection.execute(
+        text(
+            "INSERT INTO venues (id, slug, name, created_at, updated_at) "
+            "VALUES (:id, 'default', 'Default venue', NOW(), NOW()) ON CONFLICT DO NOTHING"
+        ),
+        {"id": DEFAULT_VENUE_ID},
+    )
+    connection.execute(
+        text("SELECT setval(pg_get_serial_sequence('venues', 'id'), (SELECT MAX(id) FROM venues))")
+    )
+    # A constant default makes ADD COLUMN a catalog-only change, however big the table
+    for table in VENUE_COLUMN_TABLES:
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS venue_id INTEGER "
+                f"NOT NULL DEFAULT {DEFAULT_VENUE_ID} REFERENCES venues (id)"
+            )
+        )
+    connection.execute(
+        text(
+            f"ALTER TABLE orders_archive ADD COLUMN IF NOT EXISTS venue_id INTEGER "
+            f"NOT NULL DEFAULT {DEFAULT_VENUE_ID}"
+        )
+    )
+    # Table codes become unique per venue; the venue-leading indexes replace global ones
+    connection.execute(text("ALTER TABLE tables DROP CONSTRAINT IF EXISTS tables_code_key"))
+    for statement in VENUE_INDEXES:
+        connection.execute(text(statement))
+    connection.execute(text("DROP INDEX IF EXISTS ix_orders_open_created_at"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_prep_tasks_queued_station_due"))
+    # New view columns can only be appended
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW orders_all AS
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code, venue_id
+            FROM orders
+            UNION ALL
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code, venue_id
+            FROM orders_archive
+            """
+        )
+    )
+    for table in ("tables", "users", "orders"):
+        connection.execute(text(f"ANALYZE {table}"))
+
+
+# venue_id defaults to the default venue, id 1, like the columns m0008 added
+TABLE_SESSIONS_TABLE = [
+    """
+    CREATE TABLE IF NOT EXISTS table_sessions (
+        id SERIAL PRIMARY KEY,
+        venue_id INTEGER NOT NULL DEFAULT 1 REFERENCES venues (id),
+        table_ref_id INTEGER NOT NULL REFERENCES tables (id) ON DELETE CASCADE,
+        table_code VARCHAR(80) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        order_count INTEGER NOT NULL,
+        total_quantity INTEGER NOT NULL,
+        total_amount NUMERIC(10, 2) NOT NULL,
+        paid_amount NUMERIC(10, 2) NOT NULL,
+        opened_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        closed_at TIMESTAMP,
+        payment_method VARCHAR(50)
+    )
+    """,
+    # At most one open tab per table; orders upsert into it
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_table_sessions_open_table ON table_sessions (table_ref_id) "
+    "WHERE status = 'open'",
+    "CREATE INDEX IF NOT EXISTS ix_table_sessions_venue_status_opened_at "
+    "ON table_sessions (venue_id, status, opened_at)",
+]
+
+
+def _m0009_table_sessions(connection: Connection) -> None:
+    _execute_all(connection, TABLE_SESSIONS_TABLE)
+    # Nullable with no default: catalog-only on a large orders table
+    connection.execute(
+        text(
+            "ALTER TABLE orders ADD COLUMN IF NOT EXISTS session_id INTEGER "
+            "REFERENCES table_sessions (id) ON DELETE SET NULL"
+        )
+    )
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_orders_session_id ON orders (session_id)"))
+    # Tables with unpaid orders already have a tab running; open it with the
+    # one-off sums, after which totals are only ever adjusted incrementally
+    connection.execute(
+        text(
+            """
+            INSERT INTO table_sessions (
+                venue_id, table_ref_id, table_code, status, order_count,
+                total_quantity, total_amount, paid_amount, opened_at, updated_at
+            )
+            SELECT o.venue_id, o.table_ref_id, t.code, 'open', COUNT(*),
+                   SUM(o.total_quantity), SUM(o.total_amount),
+                   COALESCE(SUM(tx.amount), 0), MIN(o.created_at), NOW()
+            FROM orders AS o
+            JOIN tables AS t ON t.id = o.table_ref_id
+            LEFT JOIN transactions AS tx ON tx.order_id = o.id
+            WHERE o.status <> 'closed' AND o.session_id IS NULL
+            GROUP BY o.venue_id, o.table_ref_id, t.code
+            ON CONFLICT DO NOTHING
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            UPDATE orders AS o SET session_id = s.id
+            FROM table_sessions AS s
+            WHERE s.table_ref_id = o.table_ref_id AND s.status = 'open'
+              AND o.status <> 'closed' AND o.session_id IS NULL
+            """
+        )
+    )
+    connection.execute(text("ANALYZE table_sessions"))
+
+
+def _m0010_venue_timezone(connection: Connection) -> None:
+    # Existing dashboards were in UTC; keep them there until a venue sets its own
+    connection.execute(
+        text("ALTER TABLE venues ADD COLUMN IF NOT EXISTS timezone VARCHAR(64) NOT NULL DEFAULT 'UTC'")
+    )
+
+
+def _m0011_analytics_rollups(connection: Connection) -> None:
+    from app import rollups
+
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS rollup_refreshes (
+                name VARCHAR(80) PRIMARY KEY,
+                refreshed_at TIMESTAMP NOT NULL,
+                outbox_id BIGINT NOT NULL,
+                duration_ms INTEGER NOT NULL
+            )
+            """
+        )
+    )
+    # Populated here, once; from then on they are only refreshed concurrently
+    rollups.create_views(connection)
+
+
+def _m0012_job_runs(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS job_runs (
+                id BIGSERIAL PRIMARY KEY,
+                job VARCHAR(80) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                finished_at TIMESTAMP,
+                duration_ms INTEGER,
+                worker VARCHAR(120) NOT NULL,
+                result VARCHAR(200),
+                error VARCHAR(1000)
+            )
+            """
+        )
+    )
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_job_runs_job_started_at ON job_runs (job, started_at)"))
+
+
+def _m0013_runtime_settings(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS runtime_settings (
+                name VARCHAR(60) PRIMARY KEY,
+                value JSONB NOT NULL,
+                updated_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
+
+
+def _m0014_outbox_venue(connection: Connection) -> None:
+    from app.models import DEFAULT_VENUE_ID
+
+    connection.execute(
+        text(
+            f"ALTER TABLE outbox_events ADD COLUMN IF NOT EXISTS venue_id INTEGER "
+            f"NOT NULL DEFAULT {DEFAULT_VENUE_ID} REFERENCES venues (id)"
+        )
+    )
+    # Events written since venues existed carry theirs; older ones were the default's.
+    # Published events are purged after a few days, so this touches few rows
+    connection.execute(
+        text(
+            "UPDATE outbox_events SET venue_id = (payload->>'venue_id')::int "
+            "WHERE payload ? 'venue_id' AND (payload->>'venue_id')::int <> venue_id"
+        )
+    )
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_outbox_events_venue_txid_id ON outbox_events (venue_id, txid, id)")
+    )
+
+
+# Partitioned like orders_archive, on the order's created_at, which items and
+# transactions carry along; unique keys must include the partition key
+PARTITIONED_ARCHIVE_TABLES = [
+    """
+    CREATE TABLE order_items_archive (
+        id INTEGER NOT NULL,
+        order_created_at TIMESTAMP NOT NULL,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        unit_price NUMERIC(10, 2) NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (id, order_created_at)
+    ) PARTITION BY RANGE (order_created_at)
+    """,
+    "CREATE INDEX ix_order_items_archive_order_id ON order_items_archive (order_id)",
+    """
+    CREATE TABLE transactions_archive (
+        id INTEGER NOT NULL,
+        order_created_at TIMESTAMP NOT NULL,
+        order_id INTEGER NOT NULL,
+        amount NUMERIC(10, 2) NOT NULL,
+        method VARCHAR(50) NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (id, order_created_at),
+        UNIQUE (order_id, order_created_at)
+    ) PARTITION BY RANGE (order_created_at)
+    """,
+]
+
+
+def _m0015_archive_sessions_and_partitions(connection: Connection) -> None:
+    # Archived orders keep their tab; catalog-only on the partitions
+    connection.execute(text("ALTER TABLE orders_archive ADD COLUMN IF NOT EXISTS session_id INTEGER"))
+    connection.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_orders_archive_session_id ON orders_archive (session_id)")
+    )
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW orders_all AS
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code, venue_id, session_id
+            FROM orders
+            UNION ALL
+            SELECT id, status, total_quantity, total_amount, created_at,
+                   user_id, table_ref_id, table_code, venue_id, session_id
+            FROM orders_archive
+            """
+        )
+    )
+
+    # A table cannot be turned into a partitioned one in place: set the plain
+    # archives aside without their keys, whose names the new tables reuse,
+    # copy them over and drop them
+    for table in ("order_items_archive", "transactions_archive"):
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {table}_heap"))
+        connection.execute(text(f"ALTER TABLE {table}_heap DROP CONSTRAINT {table}_pkey"))
+    connection.execute(text("ALTER TABLE transactions_archive_heap DROP CONSTRAINT transactions_archive_order_id_key"))
+    connection.execute(text("DROP INDEX ix_order_items_archive_order_id"))
+    _execute_all(connection, PARTITIONED_ARCHIVE_TABLES)
+    # Same monthly bounds and names as the orders_archive partitions
+    months = connection.execute(
+        text("SELECT DISTINCT date_trunc('month', created_at)::date FROM orders_archive ORDER BY 1")
+    ).scalars()
+    for start in months:
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        for table in ("order_items_archive", "transactions_archive"):
+            connection.execute(
+                text(
+                    f"CREATE TABLE {table}_{start:%Y_%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+            )
+    # Archival moves an order with its items and transaction, so every row has its order
+    connection.execute(
+        text(
+            """
+            INSERT INTO order_items_archive (id, order_created_at, order_id, product_id, name, unit_price, quantity)
+            SELECT i.id, o.created_at, i.order_id, i.product_id, i.name, i.unit_price, i.quantity
+            FROM order_items_archive_heap AS i
+            JOIN orders_archive AS o ON o.id = i.order_id
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            INSERT INTO transactions_archive (id, order_created_at, order_id, amount, method, created_at)
+            SELECT t.id, o.created_at, t.order_id, t.amount, t.method, t.created_at
+            FROM transactions_archive_heap AS t
+            JOIN orders_archive AS o ON o.id = t.order_id
+            """
+        )
+    )
+    # The views still point at the old tables; same columns, so they can be replaced
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW order_items_all AS
+            SELECT id, order_id, product_id, name, unit_price, quantity FROM order_items
+            UNION ALL
+            SELECT id, order_id, product_id, name, unit_price, quantity FROM order_items_archive
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE OR REPLACE VIEW transactions_all AS
+            SELECT id, order_id, amount, method, created_at FROM transactions
+            UNION ALL
+            SELECT id, order_id, amount, method, created_at FROM transactions_archive
+            """
+        )
+    )
+    connection.execute(text("DROP TABLE order_items_archive_heap, transactions_archive_heap"))
+    for table in ("orders_archive", "order_items_archive", "transactions_archive"):
+        connection.execute(text(f"ANALYZE {table}"))
+
+
+# Append-only: never edit or reorder a migration that has shipped
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline schema and legacy table_code columns", _m0001_baseline),
+    Migration(2, "set-based backfill of table_ref_id", _m0002_backfill_table_refs),
+    Migration(3, "indexes for hot order and user queries", _m0003_hot_path_indexes),
+    Migration(4, "archive tables for closed orders and *_all views", _m0004_order_archive),
+    Migration(5, "preparation queue tasks", _m0005_prep_queue),
+    Migration(6, "transactional outbox for order events", _m0006_outbox),
+    Migration(7, "shared rate limit buckets", _m0007_rate_limit_buckets),
+    Migration(8, "venues and venue-scoped indexes", _m0008_venues),
+    Migration(9, "table sessions with running totals", _m0009_table_sessions),
+    Migration(10, "venue time zones", _m0010_venue_timezone),
+    Migration(11, "materialized analytics rollups", _m0011_analytics_rollups),
+    Migration(12, "scheduled job runs", _m0012_job_runs),
+    Migration(13, "runtime settings shared by workers", _m0013_runtime_settings),
+    Migration(14, "venue-scoped outbox feed", _m0014_outbox_venue),
+    Migration(15, "tab links and monthly partitions for archived items", _m0015_archive_sessions_and_partitions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _ensure_version_table(connection: Connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                duration_ms INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+    )
+
+
+def current_version(connection: Connection) -> int:
+    # to_regclass avoids an error (and an aborted transaction) on a fresh database
+    exists = connection.execute(text("SELECT to_regclass('schema_version')")).scalar()
+    if exists is None:
+        return 0
+    version = connection.execute(
+        text("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    ).scalar()
+    return int(version or 0)
+
+
+def run_migrations(engine: Engine | None = None) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    engine = engine or get_engine()
+    with engine.connect() as connection:
+        # Fast path: nothing to do, no lock taken
+        version = current_version(connection)
+        connection.commit()
+        if version >= LATEST_VERSION:
+            return version
+
+        # Blocks until any other runner finishes, then re-reads the version
+        connection.execute(
+            text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+        )
+        connection.commit()
+        try:
+            _ensure_version_table(connection)
+            connection.commit()
+            version = current_version(connection)
+            connection.commit()
+
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                logger.info(
+                    "Applying migration %s: %s", migration.version, migration.description
+                )
+                started = time.perf_counter()
+                migration.apply(connection)
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                connection.execute(
+                    text(
+                        "INSERT INTO schema_version (version, description, duration_ms) "
+                        "VALUES (:version, :description, :duration_ms)"
+                    ),
+                    {
+                        "version": migration.version,
+                        "description": migration.description,
+                        "duration_ms": duration_ms,
+                    },
+                )
+                # Each migration and its version row commit together
+                connection.commit()
+                logger.info("Migration %s applied in %d ms", migration.version, duration_ms)
+                version = migration.version
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY}
+            )
+            connection.commit()
+    return version
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    print(f"Schema at version {run_migrations()}")
@@ -1,16 +1,68 @@
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from .database import Base
 
 
+# Rows created before venues existed, and callers that do not pick one, belong here
+DEFAULT_VENUE_ID = 1
+
+
+def _venue_column(**kwargs) -> Column:
+    return Column(
+        Integer,
+        ForeignKey("venues.id"),
+        nullable=False,
+        default=DEFAULT_VENUE_ID,
+        server_default=text(str(DEFAULT_VENUE_ID)),
+        **kwargs,
+    )
+
+
+class Venue(Base):
+    """A bar served by this deployment; see app.venues for resolution and caches."""
+
+    __tablename__ = "venues"
+
+    id = Column(Integer, primary_key=True)
+    slug = Column(String(60), unique=True, nullable=False)
+    name = Column(String(120), nullable=False)
+    # Requests for this host resolve to the venue without a ?venue= parameter
+    hostname = Column(String(255), unique=True, nullable=True)
+    # Categories in the layout of app.routers.menu.CATEGORIES; NULL serves that default
+    menu = Column(JSONB, nullable=True)
+    # IANA name; dashboards bucket orders by the venue's local time
+    timezone = Column(String(64), nullable=False, default="UTC", server_default="UTC")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped on every change; per-venue caches are keyed by it
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class Table(Base):
     __tablename__ = "tables"
+    __table_args__ = (
+        # Codes such as "table1" repeat across venues
+        Index("uq_tables_venue_code", "venue_id", "code", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    code = Column(String(80), unique=True, nullable=False)
+    venue_id = _venue_column()
+    code = Column(String(80), nullable=False)
     name = Column(String(120), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -22,6 +74,8 @@ class StaffUser(Base):
     __tablename__ = "staff_users"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Staff see and manage only their own venue
+    venue_id = _venue_column(index=True)
     username = Column(String(120), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     role = Column(String(50), nullable=False, default="admin")
@@ -30,14 +84,18 @@ class StaffUser(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_venue_created_at", "venue_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    venue_id = _venue_column()
     name = Column(String(120), nullable=False)
     email = Column(String(200), nullable=True)
     phone = Column(String(30), nullable=True)
     age = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    table_ref_id = Column(Integer, ForeignKey("tables.id", ondelete="SET NULL"), nullable=True)
+    table_ref_id = Column(Integer, ForeignKey("tables.id", ondelete="SET NULL"), nullable=True, index=True)
     table_code = Column(String(80), nullable=True)
 
     orders = relationship("Order", back_populates="user")
@@ -50,18 +108,36 @@ class User(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Open orders are a small, hot subset: /admin/orders lists a venue's newest first
+        Index(
+            "ix_orders_venue_open_created_at",
+            "venue_id",
+            "created_at",
+            postgresql_where=text("status <> 'closed'"),
+        ),
+        # Venue dashboards: closed totals by status and time, heatmaps by time
+        Index("ix_orders_venue_status_created_at", "venue_id", "status", "created_at"),
+        Index("ix_orders_venue_created_at", "venue_id", "created_at"),
+        # Archival scans closed orders across all venues
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    venue_id = _venue_column()
     status = Column(String(50), default="pending", nullable=False)
     total_quantity = Column(Integer, default=0, nullable=False)
     total_amount = Column(Numeric(10, 2), default=Decimal("0"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    table_ref_id = Column(Integer, ForeignKey("tables.id", ondelete="SET NULL"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    table_ref_id = Column(Integer, ForeignKey("tables.id", ondelete="SET NULL"), nullable=True, index=True)
     table_code = Column(String(80), nullable=True)
+    # The table's open tab when the order was placed; see app.tabs
+    session_id = Column(Integer, ForeignKey("table_sessions.id", ondelete="SET NULL"), nullable=True, index=True)
     user = relationship("User", back_populates="orders")
     table = relationship("Table", back_populates="orders", foreign_keys=[table_ref_id])
+    session = relationship("TableSession", back_populates="orders")
     items = relationship(
         "OrderItem",
         back_populates="order",
@@ -82,11 +158,53 @@ class Order(Base):
         return self.table_code
 
 
+class TableSession(Base):
+    """A table's tab from seating to payment, with running totals (see app.tabs)."""
+
+    __tablename__ = "table_sessions"
+    __table_args__ = (
+        # At most one open tab per table; orders upsert into it
+        Index(
+            "uq_table_sessions_open_table",
+            "table_ref_id",
+            unique=True,
+            postgresql_where=text("status = 'open'"),
+        ),
+        Index("ix_table_sessions_venue_status_opened_at", "venue_id", "status", "opened_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    venue_id = _venue_column()
+    table_ref_id = Column(Integer, ForeignKey("tables.id", ondelete="CASCADE"), nullable=False)
+    table_code = Column(String(80), nullable=False)
+    status = Column(String(20), default="open", nullable=False)
+    # Maintained incrementally as orders are placed, deleted and paid
+    order_count = Column(Integer, default=0, nullable=False)
+    total_quantity = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Numeric(10, 2), default=Decimal("0"), nullable=False)
+    paid_amount = Column(Numeric(10, 2), default=Decimal("0"), nullable=False)
+    opened_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    closed_at = Column(DateTime, nullable=True)
+    payment_method = Column(String(50), nullable=True)
+
+    table = relationship("Table")
+    orders = relationship("Order", back_populates="session", order_by="Order.created_at")
+
+    @property
+    def table_id(self) -> str:
+        return self.table_code
+
+    @property
+    def outstanding_amount(self) -> Decimal:
+        return (self.total_amount or Decimal("0")) - (self.paid_amount or Decimal("0"))
+
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
     product_id = Column(Integer, nullable=False)
     name = Column(String(200), nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=False)
@@ -105,3 +223,213 @@ class Transaction(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     order = relationship("Order", back_populates="transaction")
+
+
+class PrepTask(Base):
+    """One order line waiting at a preparation station (see app.prep)."""
+
+    __tablename__ = "prep_tasks"
+    __table_args__ = (
+        # Claims scan a venue station's queued tasks in due order
+        Index(
+            "ix_prep_tasks_queued_venue_station_due",
+            "venue_id",
+            "station",
+            "due_at",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    venue_id = _venue_column()
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    order_item_id = Column(Integer, ForeignKey("order_items.id", ondelete="CASCADE"), nullable=False)
+    station = Column(String(20), nullable=False)
+    name = Column(String(200), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    prep_seconds = Column(Integer, nullable=False)
+    status = Column(String(20), default="queued", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Scheduling key: created_at + prep_seconds, so quick items overtake long
+    # ones placed at the same time while older work still comes first
+    due_at = Column(DateTime, nullable=False)
+    claimed_by = Column(String(120), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    order = relationship("Order")
+    item = relationship("OrderItem")
+
+    @property
+    def table_id(self) -> str | None:
+        return self.order.table_id if self.order else None
+
+
+class OutboxEvent(Base):
+    """Order lifecycle event written in the same transaction as the change (see app.events)."""
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Feed order, per venue for /api/events; the partial index keeps the
+        # dispatcher's scan to pending rows
+        Index("ix_outbox_events_txid_id", "txid", "id"),
+        Index("ix_outbox_events_venue_txid_id", "venue_id", "txid", "id"),
+        Index(
+            "ix_outbox_events_pending",
+            "txid",
+            "id",
+            postgresql_where=text("published_at IS NULL"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    # Id of the writing transaction; consumers are only served rows below the
+    # oldest running transaction, so late commits cannot land behind a cursor
+    txid = Column(BigInteger, nullable=False, server_default=text("(pg_current_xact_id()::text::bigint)"))
+    venue_id = _venue_column()
+    event_type = Column(String(60), nullable=False)
+    aggregate_type = Column(String(40), nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    published_at = Column(DateTime, nullable=True)
+
+
+class RateLimitBucket(Base):
+    """Shared token bucket state for app.ratelimit's Postgres backend."""
+
+    __tablename__ = "rate_limit_buckets"
+    # Losing buckets on a crash only resets limits, so skip the WAL
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(200), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Epoch seconds from the database clock, shared by every replica
+    updated_at = Column(Float, nullable=False, index=True)
+
+
+class RollupRefresh(Base):
+    """Last refresh of each analytics materialized view (see app.rollups)."""
+
+    __tablename__ = "rollup_refreshes"
+
+    name = Column(String(80), primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False)
+    # Newest outbox event id at refresh time; the gap to the current one is the backlog
+    outbox_id = Column(BigInteger, nullable=False, default=0)
+    duration_ms = Column(Integer, nullable=False, default=0)
+
+
+class JobRun(Base):
+    """One run of a scheduled maintenance job (see app.scheduler)."""
+
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        # Latest run per job, for the due check and the status endpoint
+        Index("ix_job_runs_job_started_at", "job", "started_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    job = Column(String(80), nullable=False)
+    # running, ok, failed, or abandoned when its worker died mid-run
+    status = Column(String(20), nullable=False, default="running")
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    # Hostname and pid of the worker that ran it
+    worker = Column(String(120), nullable=False)
+    result = Column(String(200), nullable=True)
+    error = Column(String(1000), nullable=True)
+
+
+class RuntimeSetting(Base):
+    """Settings admins change at runtime, shared by every worker (see app.profiling)."""
+
+    __tablename__ = "runtime_settings"
+
+    name = Column(String(60), primary_key=True)
+    value = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Cold storage for closed orders moved out of the live tables by app.archive.
+# All three tables are range-partitioned by month on the order's created_at,
+# with matching partitions created on demand by the archival job, so a
+# month of history can be detached or dropped as a whole. No foreign keys,
+# so archived rows never slow down writes or cascades on the live tables.
+
+
+class ArchivedOrder(Base):
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_venue_created_at", "venue_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True)
+    venue_id = Column(Integer, nullable=False, server_default=text(str(DEFAULT_VENUE_ID)))
+    status = Column(String(50), nullable=False)
+    total_quantity = Column(Integer, nullable=False)
+    total_amount = Column(Numeric(10, 2), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    table_ref_id = Column(Integer, nullable=True)
+    table_code = Column(String(80), nullable=True)
+    session_id = Column(Integer, nullable=True, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    table = relationship(
+        "Table",
+        primaryjoin="foreign(ArchivedOrder.table_ref_id) == Table.id",
+        viewonly=True,
+    )
+    items = relationship(
+        "ArchivedOrderItem",
+        # The partition key too, so the lookup touches the order's month only
+        primaryjoin="and_(ArchivedOrder.id == foreign(ArchivedOrderItem.order_id), "
+        "ArchivedOrder.created_at == foreign(ArchivedOrderItem.order_created_at))",
+        viewonly=True,
+    )
+    transaction = relationship(
+        "ArchivedTransaction",
+        primaryjoin="and_(ArchivedOrder.id == foreign(ArchivedTransaction.order_id), "
+        "ArchivedOrder.created_at == foreign(ArchivedTransaction.order_created_at))",
+        viewonly=True,
+        uselist=False,
+    )
+
+    @property
+    def table_id(self) -> str | None:
+        if self.table and self.table.code:
+            return self.table.code
+        return self.table_code
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "order_items_archive"
+    __table_args__ = ({"postgresql_partition_by": "RANGE (order_created_at)"},)
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    # The order's created_at: the partition key, shared with orders_archive
+    order_created_at = Column(DateTime, primary_key=True)
+    order_id = Column(Integer, nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    name = Column(String(200), nullable=False)
+    unit_price = Column(Numeric(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+
+class ArchivedTransaction(Base):
+    __tablename__ = "transactions_archive"
+    __table_args__ = (
+        # Unique constraints on a partitioned table must include the partition key
+        UniqueConstraint("order_id", "order_created_at"),
+        {"postgresql_partition_by": "RANGE (order_created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_created_at = Column(DateTime, primary_key=True)
+    order_id = Column(Integer, nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+    method = Column(String(50), nullable=False)
+    created_at = Column(DateTime, nullable=False)
@@ -0,0 +1,249 @@
+"""Preparation queue: order lines routed to the station that makes them.
+
+Every order line becomes a ``PrepTask`` for one station (coffee machine,
+bar, beer tap) of its venue, derived from the menu category of the product. Tasks are
+served earliest ``due_at`` first, where ``due_at = created_at +
+prep_seconds``: older work comes first, and among items ordered at about the
+same time the quick ones go out before long ones.
+
+``PrepScheduler`` keeps a min-heap of queued task ids per venue station in memory,
+so queue views and claims do not sort the table on every poll. Postgres
+stays the source of truth: claims lock rows with ``FOR UPDATE SKIP LOCKED``,
+so several bartenders (and API workers) can pull from the same station
+without ever getting the same task, and the heap is reloaded from the
+database periodically to pick up tasks created by other workers.
+
+When an order is checked out or deleted, its tasks still in the queue are
+cancelled in the same transaction, so the bar never claims work for an
+order that is gone. Tasks already claimed are left to finish.
+"""
+
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import events, models
+from app.routers.menu import CATEGORIES
+
+STATIONS = ("coffee", "bar", "tap")
+# Tasks in these states are out of the queue for good
+FINISHED_STATUSES = ("done", "cancelled")
+
+STATION_BY_CATEGORY = {
+    "Coffee": "coffee",
+    "Beer & Wine": "tap",
+}
+DEFAULT_STATION = "bar"
+
+# Seconds to prepare one unit; each extra unit of the same line adds half
+PREP_SECONDS_BY_CATEGORY = {
+    "Coffee": 60,
+    "Drinks": 30,
+    "Beer & Wine": 45,
+    "Aperitivi": 120,
+    "Cocktails": 180,
+}
+DEFAULT_PREP_SECONDS = 90
+
+REFRESH_SECONDS = float(os.environ.get("PREP_QUEUE_REFRESH_SECONDS", "5"))
+# Heap entries offered per requested claim; extras absorb rows other workers took
+CLAIM_CANDIDATES_FACTOR = 4
+
+_CATEGORY_BY_PRODUCT = {
+    item["id"]: category["name"] for category in CATEGORIES for item in category["items"]
+}
+
+
+def station_for(product_id: int, category_by_product: dict[int, str] = _CATEGORY_BY_PRODUCT) -> str:
+    return STATION_BY_CATEGORY.get(category_by_product.get(product_id), DEFAULT_STATION)
+
+
+def prep_seconds_for(
+    product_id: int,
+    quantity: int,
+    category_by_product: dict[int, str] = _CATEGORY_BY_PRODUCT,
+) -> int:
+    unit = PREP_SECONDS_BY_CATEGORY.get(category_by_product.get(product_id), DEFAULT_PREP_SECONDS)
+    return unit + unit * (quantity - 1) // 2
+
+
+def build_tasks(
+    order: models.Order,
+    items: list[models.OrderItem],
+    now: datetime,
+    category_by_product: dict[int, str] = _CATEGORY_BY_PRODUCT,
+) -> list[models.PrepTask]:
+    """Tasks for ``items``; pass the venue's product categories for its own menu."""
+    tasks = []
+    for item in items:
+        seconds = prep_seconds_for(item.product_id, item.quantity, category_by_product)
+        tasks.append(
+            models.PrepTask(
+                order=order,
+                item=item,
+                venue_id=order.venue_id,
+                station=station_for(item.product_id, category_by_product),
+                name=item.name,
+                quantity=item.quantity,
+                prep_seconds=seconds,
+                created_at=now,
+                due_at=now + timedelta(seconds=seconds),
+            )
+        )
+    return tasks
+
+
+HeapKey = tuple[int, str]  # (venue_id, station)
+
+
+class PrepScheduler:
+    """Per venue station min-heaps of queued task ids ordered by ``(due_at, id)``."""
+
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._heaps: dict[HeapKey, list[tuple[datetime, int]]] = {}
+        # Lazy deletion: ids claimed or gone are skipped when they reach the top
+        self._removed: set[int] = set()
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+
+    def reload(self, db: Session) -> None:
+        rows = (
+            db.query(
+                models.PrepTask.venue_id,
+                models.PrepTask.station,
+                models.PrepTask.due_at,
+                models.PrepTask.id,
+            )
+            .filter(models.PrepTask.status == "queued")
+            .all()
+        )
+        heaps: dict[HeapKey, list[tuple[datetime, int]]] = {}
+        for venue_id, station, due_at, task_id in rows:
+            heaps.setdefault((venue_id, station), []).append((due_at, task_id))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        with self._lock:
+            self._heaps = heaps
+            self._removed.clear()
+            self._loaded_at = time.monotonic()
+
+    def refresh_if_stale(self, db: Session) -> None:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.reload(db)
+
+    def push(self, venue_id: int, station: str, due_at: datetime, task_id: int) -> None:
+        with self._lock:
+            # A released task comes back under an id that was discarded on claim
+            self._removed.discard(task_id)
+            heapq.heappush(self._heaps.setdefault((venue_id, station), []), (due_at, task_id))
+
+    def discard(self, task_ids) -> None:
+        with self._lock:
+            self._removed.update(task_ids)
+
+    def peek(self, venue_id: int, station: str, count: int) -> list[int]:
+        """Ids of up to ``count`` queued tasks in service order, without removing them."""
+        with self._lock:
+            heap = self._heaps.get((venue_id, station), [])
+            while heap and heap[0][1] in self._removed:
+                self._removed.discard(heapq.heappop(heap)[1])
+            ahead = heapq.nsmallest(count + len(self._removed), heap)
+            return [task_id for _, task_id in ahead if task_id not in self._removed][:count]
+
+
+SCHEDULER = PrepScheduler()
+
+
+def _lock_queued(
+    db: Session,
+    venue_id: int,
+    station: str,
+    limit: int,
+    among: list[int] | None = None,
+    exclude=(),
+):
+    query = db.query(models.PrepTask).filter(
+        models.PrepTask.venue_id == venue_id,
+        models.PrepTask.station == station,
+        models.PrepTask.status == "queued",
+    )
+    if among is not None:
+        query = query.filter(models.PrepTask.id.in_(among))
+    if exclude:
+        query = query.filter(models.PrepTask.id.notin_(exclude))
+    return (
+        query.order_by(models.PrepTask.due_at, models.PrepTask.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def claim(db: Session, venue_id: int, station: str, staff: str, limit: int = 1) -> list[models.PrepTask]:
+    """Hand the next ``limit`` queued tasks of the venue's ``station`` to ``staff``."""
+    SCHEDULER.refresh_if_stale(db)
+    candidates = SCHEDULER.peek(venue_id, station, limit * CLAIM_CANDIDATES_FACTOR)
+    tasks = _lock_queued(db, venue_id, station, limit, among=candidates) if candidates else []
+    if len(tasks) < limit:
+        # Tasks from other workers are not in this heap yet; the partial index has them
+        tasks += _lock_queued(
+            db, venue_id, station, limit - len(tasks), exclude=[task.id for task in tasks]
+        )
+
+    now = datetime.utcnow()
+    for task in tasks:
+        task.status = "in_progress"
+        task.claimed_by = staff
+        task.claimed_at = now
+    db.commit()
+    SCHEDULER.discard(task.id for task in tasks)
+    return tasks
+
+
+def release(db: Session, task: models.PrepTask) -> None:
+    """Put a claimed task back at its original place in the queue."""
+    task.status = "queued"
+    task.claimed_by = None
+    task.claimed_at = None
+    db.commit()
+    SCHEDULER.push(task.venue_id, task.station, task.due_at, task.id)
+
+
+def cancel_tasks(db: Session, order_id: int) -> None:
+    """Cancel the order's queued tasks as it is checked out or deleted; the caller commits."""
+    # Waits for a concurrent claim of the same rows, then skips what it took
+    task_ids = db.execute(
+        update(models.PrepTask)
+        .where(models.PrepTask.order_id == order_id, models.PrepTask.status == "queued")
+        .values(status="cancelled", completed_at=datetime.utcnow())
+        .returning(models.PrepTask.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    # Dropped now even if the caller rolls back; the next reload restores them
+    SCHEDULER.discard(task_ids)
+
+
+def complete(db: Session, task: models.PrepTask) -> bool:
+    """Mark ``task`` done; returns True when it was the order's last open task."""
+    # Lock the order so concurrent completions of its last tasks serialise here
+    order = db.query(models.Order).filter(models.Order.id == task.order_id).with_for_update().first()
+    task.status = "done"
+    task.completed_at = datetime.utcnow()
+    db.flush()
+    remaining = (
+        db.query(models.PrepTask.id)
+        .filter(models.PrepTask.order_id == task.order_id, models.PrepTask.status.notin_(FINISHED_STATUSES))
+        .count()
+    )
+    finished = remaining == 0
+    if finished and order is not None and order.status == "pending":
+        order.status = "processed"
+        events.record_event(db, "order.status_changed", order, previous_status="pending", source="prep")
+    db.commit()
+    return finished
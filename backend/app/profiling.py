@@ -0,0 +1,167 @@
+"""Per-request SQL profiling and the slow-query log.
+
+``instrument_engine`` times every statement through SQLAlchemy's cursor
+events and charges it to the request that issued it (the metrics middleware
+opens a ``QueryStats`` per request). Statements slower than the threshold
+are logged with the route that ran them, and with Server-Timing enabled
+each response reports its SQL count and time, which browser devtools show
+in the network timing panel:
+
+    Server-Timing: db;dur=41.7;desc="12 queries"
+
+Both settings start from ``SLOW_QUERY_MS`` / ``SERVER_TIMING`` and admins can
+change them at runtime through ``/api/profiling``. Changes are stored in
+``runtime_settings``, so workers started later load them too, and broadcast
+on the live channel (see app.live) in the same transaction, so every worker
+of every replica applies them once they commit. With ``LIVE_ENABLED=false``
+other workers only pick changes up when they restart or serve a GET.
+"""
+
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text written to the slow-query log
+STATEMENT_LOG_CHARS = 2000
+
+
+@dataclass
+class ProfilingSettings:
+    slow_query_ms: float = float(os.environ.get("SLOW_QUERY_MS", "200"))  # 0 disables the log
+    server_timing: bool = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
+
+SETTINGS = ProfilingSettings()
+# Row in runtime_settings, and live message type carrying a change
+SETTINGS_NAME = "profiling"
+SETTINGS_EVENT = "profiling.settings"
+
+
+def apply_settings(values: dict) -> None:
+    for setting in fields(ProfilingSettings):
+        if values.get(setting.name) is not None:
+            setattr(SETTINGS, setting.name, values[setting.name])
+
+
+def load_settings(connection: Connection) -> None:
+    """Apply the values admins stored over the environment's defaults."""
+    stored = connection.execute(
+        text("SELECT value FROM runtime_settings WHERE name = :name"), {"name": SETTINGS_NAME}
+    ).scalar()
+    apply_settings(stored or {})
+
+
+def save_settings(db: Session, changes: dict) -> dict:
+    """Store ``changes`` and tell every worker once ``db`` commits; returns the stored settings.
+
+    Nothing is applied here: the caller applies the result after the commit
+    succeeds, so a failed commit leaves no worker on unsaved values.
+    """
+    from app import live  # live imports metrics, which imports this module
+
+    stored = db.execute(
+        text(
+            """
+            INSERT INTO runtime_settings (name, value, updated_at)
+            VALUES (:name, CAST(:changes AS JSONB), :now)
+            ON CONFLICT (name) DO UPDATE SET
+                value = runtime_settings.value || EXCLUDED.value,
+                updated_at = EXCLUDED.updated_at
+            RETURNING value
+            """
+        ),
+        {"name": SETTINGS_NAME, "changes": dumps(changes).decode(), "now": datetime.utcnow()},
+    ).scalar_one()
+    message = {"event": SETTINGS_EVENT, "settings": stored}
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": live.CHANNEL, "payload": dumps(message).decode()})
+    return stored
+
+
+def on_message(message: dict) -> None:
+    # Live hub listener: a change saved by any worker
+    if message.get("event") == SETTINGS_EVENT:
+        apply_settings(message.get("settings") or {})
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    slow: int = 0
+    scope: dict | None = field(default=None, repr=False)
+
+
+# Set per request by the middleware; threadpool-run endpoints share the object
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def start_request(scope) -> tuple[QueryStats, object]:
+    stats = QueryStats(scope=scope)
+    return stats, _query_stats.set(stats)
+
+
+def end_request(token) -> None:
+    _query_stats.reset(token)
+
+
+def route_template(scope) -> str:
+    """Matched route template, e.g. ``/api/orders/{order_id}/status``.
+
+    Templates keep metric label cardinality bounded (no raw ids in paths).
+    """
+    # Newer FastAPI keeps included routers nested; the prefixed path lives here
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+def _log_slow_query(statement: str, elapsed: float, stats: QueryStats | None) -> None:
+    if stats is not None and stats.scope is not None:
+        origin = f"{stats.scope['method']} {route_template(stats.scope)}"
+    else:
+        # Startup, migrations and background jobs run outside a request
+        origin = "no request"
+    text = re.sub(r"\s+", " ", statement).strip()
+    if len(text) > STATEMENT_LOG_CHARS:
+        text = text[:STATEMENT_LOG_CHARS] + "..."
+    logger.warning("Slow query %.1f ms [%s]: %s", elapsed * 1000, origin, text)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach cursor listeners that time each statement and attribute it to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        threshold = SETTINGS.slow_query_ms
+        if threshold > 0 and elapsed * 1000 >= threshold:
+            if stats is not None:
+                stats.slow += 1
+            _log_slow_query(statement, elapsed, stats)
+
+
+def server_timing_header(stats: QueryStats) -> bytes:
+    value = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+    if stats.slow:
+        value += f', db-slow;desc="{stats.slow} over {SETTINGS.slow_query_ms:g} ms"'
+    return value.encode("latin-1")
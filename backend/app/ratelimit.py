@@ -0,0 +1,206 @@
+"""Token-bucket rate limiting for the unauthenticated guest endpoints.
+
+Joining a table, placing an order, menu search, recommendations and opening
+a live status stream each check one bucket per
+client IP and, where the request names a table, one per table code. The
+client IP is ``request.client``, which ``ProxyHeadersMiddleware`` has
+already rewritten from ``X-Forwarded-For`` when the peer is one of the
+``FORWARDED_ALLOW_IPS`` proxies. A bucket holds up to ``burst``
+tokens and refills at ``per_minute``; a request takes one token or is
+answered ``429`` with ``Retry-After``.
+
+Buckets are stored in a backend chosen with ``RATE_LIMIT_BACKEND``:
+
+* ``memory`` (default): a bounded LRU dict in this process. Each check is an
+  O(1) dict lookup under a lock. Limits apply per worker, so the effective
+  limit scales with the number of workers and replicas.
+* ``postgres``: one atomic upsert per check on the UNLOGGED
+  ``rate_limit_buckets`` table, using the database clock, so every replica
+  shares the same buckets. If the database errors, the check fails open.
+
+``MemoryBackend`` takes a ``clock`` so tests can drive it with a fake clock
+in place of the shared backend (``set_backend``). Limits can be overridden
+with ``RATE_LIMITS="order.ip=10/5,search.ip=120/30"`` (per minute / burst),
+and ``RATE_LIMIT_ENABLED=false`` turns every check off.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() != "false"
+BACKEND_NAME = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+# Oldest buckets are evicted past this; an evicted bucket simply starts full
+MAX_MEMORY_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+# Shared buckets idle this long are full again and can be deleted
+IDLE_BUCKET_SECONDS = 3600
+PURGE_EVERY = 1000
+
+
+@dataclass
+class Limit:
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+
+# A table of friends joins and orders in bursts, so table limits are looser
+LIMITS = {
+    "join.ip": Limit(per_minute=20, burst=10),
+    "join.table": Limit(per_minute=60, burst=30),
+    "order.ip": Limit(per_minute=10, burst=5),
+    "order.table": Limit(per_minute=30, burst=15),
+    "search.ip": Limit(per_minute=120, burst=30),
+    "recommend.ip": Limit(per_minute=120, burst=30),
+    # Live streams reconnect on their own after drops and deploys
+    "live.ip": Limit(per_minute=30, burst=10),
+}
+
+
+def _apply_overrides(spec: str) -> None:
+    for part in filter(None, (chunk.strip() for chunk in spec.split(","))):
+        name, _, values = part.partition("=")
+        try:
+            per_minute, burst = values.split("/")
+            LIMITS[name.strip()] = Limit(per_minute=float(per_minute), burst=int(burst))
+        except ValueError as exc:
+            logger.warning("Ignoring RATE_LIMITS entry %r: %s", part, exc)
+
+
+_apply_overrides(os.environ.get("RATE_LIMITS", ""))
+
+
+class MemoryBackend:
+    """Buckets in this process, least recently used evicted first."""
+
+    def __init__(self, max_keys: int = MAX_MEMORY_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit) -> float:
+        """Take a token; returns 0 when allowed, else seconds until one is available."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(limit.burst)
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+        return (1 - tokens) / limit.rate
+
+
+# The conflict branch only updates when a token is available, so a denied
+# request returns no row. EXCLUDED.updated_at is this statement's "now".
+_TAKE_SQL = text(
+    """
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (:key, :burst - 1, extract(epoch FROM clock_timestamp()))
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(:burst, b.tokens + (EXCLUDED.updated_at - b.updated_at) * :rate) - 1,
+        updated_at = EXCLUDED.updated_at
+    WHERE LEAST(:burst, b.tokens + (EXCLUDED.updated_at - b.updated_at) * :rate) >= 1
+    RETURNING tokens
+    """
+)
+
+
+class PostgresBackend:
+    """Buckets in ``rate_limit_buckets``, shared by every worker and replica."""
+
+    def __init__(self, engine: Engine | None = None):
+        self.engine = engine
+        self._calls = 0
+
+    def take(self, key: str, limit: Limit) -> float:
+        engine = self.engine or get_engine()
+        try:
+            with engine.begin() as connection:
+                row = connection.execute(
+                    _TAKE_SQL, {"key": key, "burst": limit.burst, "rate": limit.rate}
+                ).first()
+                self._calls += 1
+                if self._calls % PURGE_EVERY == 0:
+                    self.purge_idle(connection)
+        except Exception:
+            logger.warning("Rate limit check for %s failed; allowing the request", key, exc_info=True)
+            return 0.0
+        # Denied rows are left untouched, so one token's refill time is an upper bound
+        return 0.0 if row is not None else 1 / limit.rate
+
+    @staticmethod
+    def purge_idle(connection) -> None:
+        connection.execute(
+            text(
+                "DELETE FROM rate_limit_buckets "
+                "WHERE updated_at < extract(epoch FROM clock_timestamp()) - :idle"
+            ),
+            {"idle": IDLE_BUCKET_SECONDS},
+        )
+
+
+def _build_backend():
+    if BACKEND_NAME == "postgres":
+        return PostgresBackend()
+    if BACKEND_NAME != "memory":
+        logger.warning("Unknown RATE_LIMIT_BACKEND %r; using memory", BACKEND_NAME)
+    return MemoryBackend()
+
+
+_backend = _build_backend()
+
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def enforce(request: Request, action: str, table_code: str | None = None, venue_id: int | None = None) -> None:
+    """Raise 429 when the client or its table is over the limits for ``action``."""
+    if not ENABLED:
+        return
+    keys = [(f"{action}.ip", client_ip(request))]
+    if table_code:
+        # Table codes repeat across venues
+        keys.append((f"{action}.table", f"{venue_id}:{table_code}"))
+    for name, value in keys:
+        limit = LIMITS.get(name)
+        if limit is None:
+            continue
+        wait = _backend.take(f"{name}:{value}", limit)
+        if wait:
+            metrics.RATE_LIMITED.labels(name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
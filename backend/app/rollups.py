@@ -0,0 +1,211 @@
+"""Materialized analytics views for Metabase and other reporting tools.
+
+Reporting questions read these rollups in the ``analytics`` schema instead of
+scanning ``orders``, ``order_items`` and ``transactions`` next to guest
+traffic. There is one row per venue and local day, in the venue's time zone:
+
+* ``daily_revenue``: orders, closed orders, pieces, revenue, average ticket;
+* ``item_sales``: pieces and revenue per product, closed orders only;
+* ``payment_mix``: payments and amount per method;
+* ``table_turnover``: tabs closed per table, their orders and revenue, and
+  how long guests stayed seated.
+
+Each view has a unique index, so ``REFRESH MATERIALIZED VIEW CONCURRENTLY``
+rebuilds it without blocking readers. The scheduler's ``rollups.refresh`` job
+calls ``refresh`` every ``ROLLUP_CHECK_INTERVAL`` seconds (default 60, 0
+disables); it refreshes all views once they are ``ROLLUP_REFRESH_SECONDS`` old
+(default 900) or once ``ROLLUP_REFRESH_EVENTS`` outbox events (default 1000)
+were recorded since the last refresh, whichever comes first. An advisory lock
+lets one refresh run at a time, manual ones included. ``rollup_refreshes``
+records when each view was refreshed and how long it took.
+
+Views are created by migrations. Changing one means a new migration that
+drops and recreates it with ``create_views``.
+
+Refresh by hand with ``python -m app.rollups --refresh [--force]``.
+"""
+
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "analytics"
+CHECK_INTERVAL = float(os.environ.get("ROLLUP_CHECK_INTERVAL", "60"))  # 0 disables
+REFRESH_SECONDS = float(os.environ.get("ROLLUP_REFRESH_SECONDS", "900"))
+REFRESH_EVENTS = int(os.environ.get("ROLLUP_REFRESH_EVENTS", "1000"))
+
+# Only one worker refreshes at a time across workers and replicas
+REFRESH_LOCK_KEY = 727_003
+
+# Local calendar day of a UTC timestamp column in the venue's zone
+_LOCAL_DAY = "(({column} AT TIME ZONE 'UTC') AT TIME ZONE v.timezone)::date"
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    query: str
+    # Unique key; REFRESH ... CONCURRENTLY requires a unique index
+    key: tuple[str, ...]
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{SCHEMA}.{self.name}"
+
+
+ROLLUPS = [
+    Rollup(
+        "daily_revenue",
+        f"""
+        SELECT o.venue_id,
+               {_LOCAL_DAY.format(column="o.created_at")} AS day,
+               COUNT(*) AS orders,
+               COUNT(*) FILTER (WHERE o.status = 'closed') AS closed_orders,
+               SUM(o.total_quantity) AS items,
+               COALESCE(SUM(o.total_amount) FILTER (WHERE o.status = 'closed'), 0) AS revenue,
+               ROUND(AVG(o.total_amount) FILTER (WHERE o.status = 'closed'), 2) AS avg_ticket
+        FROM orders_all AS o
+        JOIN venues AS v ON v.id = o.venue_id
+        GROUP BY 1, 2
+        """,
+        ("venue_id", "day"),
+    ),
+    Rollup(
+        "item_sales",
+        f"""
+        SELECT o.venue_id,
+               {_LOCAL_DAY.format(column="o.created_at")} AS day,
+               oi.product_id,
+               MAX(oi.name) AS name,
+               SUM(oi.quantity) AS quantity,
+               SUM(oi.quantity * oi.unit_price) AS revenue
+        FROM order_items_all AS oi
+        JOIN orders_all AS o ON o.id = oi.order_id
+        JOIN venues AS v ON v.id = o.venue_id
+        WHERE o.status = 'closed'
+        GROUP BY 1, 2, 3
+        """,
+        ("venue_id", "day", "product_id"),
+    ),
+    Rollup(
+        "payment_mix",
+        f"""
+        SELECT o.venue_id,
+               {_LOCAL_DAY.format(column="t.created_at")} AS day,
+               t.method,
+               COUNT(*) AS payments,
+               SUM(t.amount) AS amount
+        FROM transactions_all AS t
+        JOIN orders_all AS o ON o.id = t.order_id
+        JOIN venues AS v ON v.id = o.venue_id
+        GROUP BY 1, 2, 3
+        """,
+        ("venue_id", "day", "method"),
+    ),
+    Rollup(
+        "table_turnover",
+        f"""
+        SELECT s.venue_id,
+               {_LOCAL_DAY.format(column="s.closed_at")} AS day,
+               s.table_code,
+               COUNT(*) AS tabs,
+               SUM(s.order_count) AS orders,
+               SUM(s.total_amount) AS revenue,
+               ROUND(AVG(EXTRACT(EPOCH FROM s.closed_at - s.opened_at) / 60)::numeric, 1) AS avg_minutes_seated
+        FROM table_sessions AS s
+        JOIN venues AS v ON v.id = s.venue_id
+        WHERE s.status = 'closed'
+        GROUP BY 1, 2, 3
+        """,
+        ("venue_id", "day", "table_code"),
+    ),
+]
+
+
+def create_views(connection: Connection, rollups: list[Rollup] = ROLLUPS) -> None:
+    """Create the schema and any missing views, populated, with their unique indexes."""
+    connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+    for rollup in rollups:
+        connection.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {rollup.qualified_name} AS {rollup.query}"))
+        connection.execute(
+            text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{rollup.name}_key "
+                f"ON {rollup.qualified_name} ({', '.join(rollup.key)})"
+            )
+        )
+
+
+def _due(last, outbox_id: int, now: datetime) -> bool:
+    if last is None:
+        return True
+    return now - last.refreshed_at >= timedelta(seconds=REFRESH_SECONDS) or outbox_id - last.outbox_id >= REFRESH_EVENTS
+
+
+def refresh(engine: Engine | None = None, force: bool = False) -> list[str]:
+    """Refresh the views that are due (all of them with ``force``); returns their names."""
+    engine = engine or get_engine()
+    refreshed = []
+    with engine.connect() as connection:
+        # Session-level lock: each view refreshes in its own transaction below
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": REFRESH_LOCK_KEY}).scalar()
+        connection.commit()
+        if not locked:
+            return refreshed
+        try:
+            state = {
+                row.name: row
+                for row in connection.execute(text("SELECT name, refreshed_at, outbox_id FROM rollup_refreshes"))
+            }
+            # Ids only grow, so the gap approximates events recorded since
+            outbox_id = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM outbox_events")).scalar()
+            connection.commit()
+            for rollup in ROLLUPS:
+                if not force and not _due(state.get(rollup.name), outbox_id, datetime.utcnow()):
+                    continue
+                started = time.perf_counter()
+                connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {rollup.qualified_name}"))
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                connection.execute(
+                    text(
+                        """
+                        INSERT INTO rollup_refreshes (name, refreshed_at, outbox_id, duration_ms)
+                        VALUES (:name, :now, :outbox_id, :duration_ms)
+                        ON CONFLICT (name) DO UPDATE SET
+                            refreshed_at = EXCLUDED.refreshed_at,
+                            outbox_id = EXCLUDED.outbox_id,
+                            duration_ms = EXCLUDED.duration_ms
+                        """
+                    ),
+                    {"name": rollup.name, "now": datetime.utcnow(), "outbox_id": outbox_id, "duration_ms": duration_ms},
+                )
+                connection.commit()
+                logger.info("Refreshed %s in %d ms", rollup.qualified_name, duration_ms)
+                refreshed.append(rollup.name)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REFRESH_LOCK_KEY})
+            connection.commit()
+    return refreshed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the analytics materialized views")
+    parser.add_argument("--refresh", action="store_true", help="Refresh the views that are due")
+    parser.add_argument("--force", action="store_true", help="With --refresh, refresh every view")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.refresh:
+        names = refresh(force=args.force)
+        print(f"Refreshed {', '.join(names) if names else 'nothing'}")
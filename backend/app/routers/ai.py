@@ -1,36 +1,62 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
 
-from app.ai.search import search_menu
-from app.ai.search import _ITEM_DOCS  # reuse in-memory docs to surface tags/metadata
+from app import ratelimit, venues
+from app.ai.recommend import RECOMMENDER
+from app.database import get_db
 
 
 router = APIRouter()
 
 
 @router.get("/search")
-def search(q: str = Query(..., min_length=2, description="Search query"), limit: int = Query(5, ge=1, le=20)):
+def search(
+    request: Request,
+    q: str = Query(..., min_length=2, description="Search query"),
+    limit: int = Query(5, ge=1, le=20),
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    ratelimit.enforce(request, "search")
     q = q.strip()
     if not q:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
-    results = search_menu(q, limit=limit)
+    results = venues.catalog_for(db, venue).search.search(q, limit=limit)
     return {"query": q, "results": results}
 
 
 @router.get("/tags")
-def tags():
+def tags(
+    request: Request,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
     """Return item metadata (tags, allergens, ingredients, description) by id.
 
     This helps the frontend filter full menu items without embedding NLP client-side.
     """
-    items = [
-        {
-            "id": doc.id,
-            "name": doc.name,
-            "description": doc.description,
-            "ingredients": doc.ingredients,
-            "allergens": doc.allergens,
-            "tags": doc.tags,
-        }
-        for doc in _ITEM_DOCS
-    ]
-    return {"items": items}
+    return venues.catalog_for(db, venue).tags_payload().response(request)
+
+
+@router.get("/recommend")
+def recommend(
+    request: Request,
+    items: list[int] = Query(default=[], description="Product ids already in the cart"),
+    limit: int = Query(5, ge=1, le=20),
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    """Products often ordered together with the cart, best sellers for an empty one."""
+    ratelimit.enforce(request, "recommend")
+    catalog = venues.catalog_for(db, venue)
+    # Ask for extra: products no longer on the menu are dropped below
+    ranked = RECOMMENDER.recommend(venue.id, items, limit + 5)
+    results = []
+    for product_id, score in ranked:
+        doc = catalog.docs_by_id.get(product_id)
+        if doc is None:
+            continue
+        results.append({"id": doc.id, "name": doc.name, "price": doc.price, "score": round(score, 4)})
+        if len(results) == limit:
+            break
+    return {"items": items, "results": results}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app import events, models, security
+from app.database import get_db
+
+router = APIRouter()
+
+
+@router.get("")
+def event_feed(
+    cursor: str | None = Query(default=None, pattern=r"^\d+-\d+$", description="Resume after this cursor"),
+    limit: int = Query(default=500, ge=1, le=5000),
+    type: str | None = Query(default=None, description="Only this event type, e.g. order.created"),
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    """The venue's order events in commit order; pass the returned cursor to get the next page."""
+    return events.read_feed(db.connection(), admin.venue_id, cursor, limit, type)
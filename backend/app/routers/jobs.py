@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app import models, security
+from app.database import get_db
+from app.scheduler import SCHEDULER
+
+router = APIRouter()
+
+
+@router.get("/")
+def job_status(
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    """Scheduled jobs with their latest run, next due time and the last day's counts."""
+    return {"jobs": SCHEDULER.status(db.connection())}
+
+
+@router.get("/{name}/runs")
+def job_runs(
+    name: str,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    if name not in SCHEDULER.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": name, "runs": SCHEDULER.recent_runs(db.connection(), name, limit)}
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app import live, ratelimit, venues
+from app.database import get_db
+
+router = APIRouter()
+
+
+@router.get("/tables/{table_code}")
+async def table_status_stream(
+    table_code: str,
+    request: Request,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    """Server-sent events with the status of the table's orders."""
+    ratelimit.enforce(request, "live")
+    if not live.ENABLED or not live.HUB.running:
+        raise HTTPException(status_code=503, detail="Live updates unavailable", headers={"Retry-After": "10"})
+    # Subscribe before the snapshot so a change in between is not lost. The hub
+    # is only touched from the event loop, which also dispatches to it
+    queue = live.HUB.subscribe(venue.id, table_code)
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "30"})
+    try:
+        snapshot = await run_in_threadpool(live.table_snapshot, db, venue.id, table_code)
+    except Exception:
+        live.HUB.unsubscribe(venue.id, table_code, queue)
+        raise
+    # Give the connection back now rather than when the stream ends
+    db.close()
+    return StreamingResponse(
+        live.stream(live.HUB, venue.id, table_code, queue, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
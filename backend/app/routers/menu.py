@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 
-from app import models
+from app import models, venues
 from app.database import get_db
 
 
@@ -55,7 +55,9 @@ router = APIRouter()
 
 @router.get("")
 async def get_menu(
+    request: Request,
     table_id: str | None = Query(default=None),
+    venue: venues.VenueRef = Depends(venues.get_venue),
     db: Session = Depends(get_db),
 ):
     """Returns the menu items available for a given table."""
@@ -66,15 +68,12 @@ async def get_menu(
     if table_id:
         table = (
             db.query(models.Table)
-            .filter(models.Table.code == table_id)
+            .filter(models.Table.venue_id == venue.id, models.Table.code == table_id)
             .first()
         )
         if table is None:
-            table = models.Table(code=table_id)
+            table = models.Table(venue_id=venue.id, code=table_id)
             db.add(table)
             db.commit()
-    return {
-        "table_id": table_code,
-        "table_name": table.name if table else None,
-        "categories": CATEGORIES,
-    }
+    catalog = venues.catalog_for(db, venue)
+    return catalog.menu_payload(table_code, table.name if table else None).response(request)
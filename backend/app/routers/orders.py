@@ -1,24 +1,69 @@
+from datetime import datetime
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
-from app.database import get_db
+from app import events, metrics, models, prep, ratelimit, schemas, tabs, venues
+from app.database import get_db, get_read_db
+from app.serialization import json_response
 
 router = APIRouter()
 
 
+def _build_items(
+    items: list[schemas.OrderItemCreate],
+) -> tuple[list[models.OrderItem], int, Decimal]:
+    # Returns the order lines plus total quantity and amount
+    total_quantity = 0
+    total_amount = Decimal("0")
+    order_items = []
+
+    for item in items:
+        item_price = Decimal(str(item.unit_price))
+        total_quantity += item.quantity
+        total_amount += item_price * item.quantity
+
+        order_items.append(
+            models.OrderItem(
+                product_id=item.product_id,
+                name=item.name,
+                unit_price=item_price,
+                quantity=item.quantity,
+            )
+        )
+
+    return order_items, total_quantity, total_amount
+
+
+def _venue_order(db: Session, venue: venues.VenueRef, order_id: int) -> models.Order | None:
+    return (
+        db.query(models.Order)
+        .filter(models.Order.id == order_id, models.Order.venue_id == venue.id)
+        .first()
+    )
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.OrderRead)
-async def create_order(payload: schemas.OrderCreate, db: Session = Depends(get_db)):
+async def create_order(
+    request: Request,
+    payload: schemas.OrderCreate,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    ratelimit.enforce(request, "order", payload.table_id, venue.id)
     if not payload.items:
         raise HTTPException(status_code=400, detail="Order must include at least one item")
 
-    order = models.Order()
+    order = models.Order(venue_id=venue.id)
     user = None
 
     if payload.user_id is not None:
-        user = db.query(models.User).filter(models.User.id == payload.user_id).first()
+        user = (
+            db.query(models.User)
+            .filter(models.User.id == payload.user_id, models.User.venue_id == venue.id)
+            .first()
+        )
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
         order.user_id = user.id
@@ -26,11 +71,11 @@ async def create_order(payload: schemas.OrderCreate, db: Session = Depends(get_d
     if payload.table_id:
         table = (
             db.query(models.Table)
-            .filter(models.Table.code == payload.table_id)
+            .filter(models.Table.venue_id == venue.id, models.Table.code == payload.table_id)
             .first()
         )
         if table is None:
-            table = models.Table(code=payload.table_id)
+            table = models.Table(venue_id=venue.id, code=payload.table_id)
             db.add(table)
             db.flush()
         order.table = table
@@ -39,44 +84,68 @@ async def create_order(payload: schemas.OrderCreate, db: Session = Depends(get_d
             user.table = table
             user.table_code = table.code
 
-    total_quantity = 0
-    total_amount = Decimal("0")
-
-    for item in payload.items:
-        item_price = Decimal(str(item.unit_price))
-        total_quantity += item.quantity
-        total_amount += item_price * item.quantity
-
-        order_item = models.OrderItem(
-            product_id=item.product_id,
-            name=item.name,
-            unit_price=item_price,
-            quantity=item.quantity,
-        )
-        order.items.append(order_item)
-
+    order_items, total_quantity, total_amount = _build_items(payload.items)
+    order.items.extend(order_items)
     order.total_quantity = total_quantity
     order.total_amount = total_amount
+    order.created_at = datetime.utcnow()
+    catalog = venues.catalog_for(db, venue)
+    tasks = prep.build_tasks(order, order_items, order.created_at, catalog.category_by_product)
+    if order.table is not None:
+        tabs.add_order(db, order)
 
     db.add(order)
+    # PrepTask.order is one-way, so the order's cascade does not reach them
+    db.add_all(tasks)
+    db.flush()
+    events.record_event(
+        db,
+        "order.created",
+        order,
+        items=[
+            {
+                "product_id": item.product_id,
+                "name": item.name,
+                "quantity": item.quantity,
+                "unit_price": float(item.unit_price),
+            }
+            for item in order_items
+        ],
+    )
+    # Ids come from the flush above
+    queued = [(task.station, task.due_at, task.id) for task in tasks]
     db.commit()
     db.refresh(order)
+    metrics.ORDERS_CREATED.inc()
+    for station, due_at, task_id in queued:
+        prep.SCHEDULER.push(venue.id, station, due_at, task_id)
 
     return order
 
 
 @router.get("/", response_model=list[schemas.OrderRead])
-async def list_orders(db: Session = Depends(get_db)):
-    orders = db.query(models.Order).order_by(models.Order.created_at.desc()).all()
-    return orders
+async def list_orders(venue: venues.VenueRef = Depends(venues.get_venue), db: Session = Depends(get_read_db)):
+    orders = (
+        db.query(models.Order)
+        .filter(models.Order.venue_id == venue.id)
+        .order_by(models.Order.created_at.desc())
+        .all()
+    )
+    return json_response(schemas.ORDER_LIST, orders)
 
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+async def delete_order(
+    order_id: int,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    order = _venue_order(db, venue, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    events.record_event(db, "order.deleted", order)
+    tabs.remove_order(db, order)
     db.delete(order)
     db.commit()
 
@@ -87,13 +156,24 @@ async def delete_order(order_id: int, db: Session = Depends(get_db)):
 async def update_order_status(
     order_id: int,
     status_payload: schemas.OrderStatusUpdate,
+    venue: venues.VenueRef = Depends(venues.get_venue),
     db: Session = Depends(get_db),
 ):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    order = _venue_order(db, venue, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    # Closing an order pays it and may close its tab; only checkout does that
+    if status_payload.status == "closed":
+        raise HTTPException(
+            status_code=409,
+            detail="Orders are closed by checking out: POST /admin/orders/{order_id}/checkout",
+        )
+    if order.status == "closed":
+        raise HTTPException(status_code=409, detail="Order is already checked out")
 
+    previous_status = order.status
     order.status = status_payload.status
+    events.record_event(db, "order.status_changed", order, previous_status=previous_status)
     db.commit()
     db.refresh(order)
 
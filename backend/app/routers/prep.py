@@ -0,0 +1,129 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from app import models, prep, schemas, security
+from app.database import get_db
+from app.serialization import json_response
+
+router = APIRouter()
+
+
+def _check_station(station: str) -> None:
+    if station not in prep.STATIONS:
+        raise HTTPException(status_code=404, detail="Unknown station")
+
+
+def _tasks_query(db: Session):
+    # table_id on the response comes from the order and its table
+    return db.query(models.PrepTask).options(
+        joinedload(models.PrepTask.order).joinedload(models.Order.table)
+    )
+
+
+def _locked_task(db: Session, admin: models.StaffUser, task_id: int) -> models.PrepTask:
+    task = (
+        db.query(models.PrepTask)
+        .filter(models.PrepTask.id == task_id, models.PrepTask.venue_id == admin.venue_id)
+        .with_for_update()
+        .first()
+    )
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+
+@router.get("/stations")
+def list_stations(
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    rows = (
+        db.query(models.PrepTask.station, models.PrepTask.status, func.count())
+        .filter(models.PrepTask.venue_id == admin.venue_id, models.PrepTask.status.notin_(prep.FINISHED_STATUSES))
+        .group_by(models.PrepTask.station, models.PrepTask.status)
+        .all()
+    )
+    counts = {station: {"station": station, "queued": 0, "in_progress": 0} for station in prep.STATIONS}
+    for station, task_status, count in rows:
+        counts.setdefault(station, {"station": station, "queued": 0, "in_progress": 0})[task_status] = count
+    return {"stations": list(counts.values())}
+
+
+@router.get("/{station}/queue", response_model=list[schemas.PrepTaskRead])
+def station_queue(
+    station: str,
+    limit: int = Query(default=20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    _check_station(station)
+    prep.SCHEDULER.refresh_if_stale(db)
+    ids = prep.SCHEDULER.peek(admin.venue_id, station, limit)
+    if not ids:
+        return json_response(schemas.PREP_TASK_LIST, [])
+    by_id = {
+        task.id: task
+        for task in _tasks_query(db)
+        .filter(models.PrepTask.id.in_(ids), models.PrepTask.status == "queued")
+        .all()
+    }
+    return json_response(schemas.PREP_TASK_LIST, [by_id[task_id] for task_id in ids if task_id in by_id])
+
+
+@router.get("/{station}/in-progress", response_model=list[schemas.PrepTaskRead])
+def station_in_progress(
+    station: str,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    _check_station(station)
+    tasks = (
+        _tasks_query(db)
+        .filter(
+            models.PrepTask.venue_id == admin.venue_id,
+            models.PrepTask.station == station,
+            models.PrepTask.status == "in_progress",
+        )
+        .order_by(models.PrepTask.due_at, models.PrepTask.id)
+        .all()
+    )
+    return json_response(schemas.PREP_TASK_LIST, tasks)
+
+
+@router.post("/{station}/claim", response_model=list[schemas.PrepTaskRead])
+def claim_tasks(
+    station: str,
+    payload: schemas.PrepClaim,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    _check_station(station)
+    tasks = prep.claim(db, admin.venue_id, station, payload.staff, payload.limit)
+    return json_response(schemas.PREP_TASK_LIST, tasks)
+
+
+@router.post("/tasks/{task_id}/complete")
+def complete_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    task = _locked_task(db, admin, task_id)
+    if task.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Task is {task.status}, not in progress")
+    order_ready = prep.complete(db, task)
+    return {"task_id": task_id, "order_id": task.order_id, "order_ready": order_ready}
+
+
+@router.post("/tasks/{task_id}/release", response_model=schemas.PrepTaskRead)
+def release_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    task = _locked_task(db, admin, task_id)
+    if task.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Task is {task.status}, not in progress")
+    prep.release(db, task)
+    return task
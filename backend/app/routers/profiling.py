@@ -0,0 +1,44 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app import models, profiling, security
+from app.database import get_db
+
+router = APIRouter()
+
+
+class ProfilingSettingsRead(BaseModel):
+    slow_query_ms: float
+    server_timing: bool
+
+
+class ProfilingSettingsUpdate(BaseModel):
+    slow_query_ms: float | None = Field(default=None, ge=0, description="Slow-query log threshold; 0 disables")
+    server_timing: bool | None = Field(default=None, description="Add a Server-Timing header with SQL time")
+
+
+@router.get("/", response_model=ProfilingSettingsRead)
+def read_profiling_settings(
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    # The stored values win, whichever worker answers
+    profiling.load_settings(db.connection())
+    return asdict(profiling.SETTINGS)
+
+
+@router.patch("/", response_model=ProfilingSettingsRead)
+def update_profiling_settings(
+    payload: ProfilingSettingsUpdate,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    # Every worker applies the change once it commits; see app.profiling
+    stored = profiling.save_settings(db, payload.model_dump(exclude_none=True))
+    db.commit()
+    # This one too, without waiting for its own notification
+    profiling.apply_settings(stored)
+    return asdict(profiling.SETTINGS)
@@ -1,25 +1,23 @@
 import math
-import random
-import time
-import uuid
-from decimal import Decimal
+import subprocess
+import sys
 from typing import List
 
-from fastapi import APIRouter, BackgroundTasks, Depends, status
+from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel, Field
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app import models, security
-from app.database import SessionLocal, get_db
-from app.routers.menu import CATEGORIES
+from app.database import get_db
+from app.simulation import DEFAULT_TABLES, SimulationPlan, plan_to_argv
 
 router = APIRouter()
 
-MENU_ITEMS = [item for category in CATEGORIES for item in category["items"]]
-DEFAULT_TABLES = [f"table{i}" for i in range(1, 11)]
 ORDER_RATE_PER_HOUR = 15
-SECONDS_PER_ORDER = 3600 / ORDER_RATE_PER_HOUR
+
+# Simulator processes started by this API worker, kept so they can be reaped
+_processes: list[subprocess.Popen] = []
 
 
 class SimulationRequest(BaseModel):
@@ -42,93 +40,86 @@ class SimulationRequest(BaseModel):
     )
 
 
-def _ensure_table(session: Session, code: str) -> models.Table:
-    table = session.query(models.Table).filter(models.Table.code == code).first()
-    if table is None:
-        table = models.Table(code=code)
-        session.add(table)
-        session.flush()
-    return table
-
-
-def _pick_items(max_lines: int) -> list[dict]:
-    total_items = max(1, min(max_lines, len(MENU_ITEMS)))
-    line_count = random.randint(1, total_items)
-    return random.sample(MENU_ITEMS, line_count)
-
-
-def _create_order(session: Session, table: models.Table) -> models.Order:
-    user_name = f"SimUser {uuid.uuid4().hex[:6]}"
-    email = f"{user_name.lower()}@example.com"
-
-    user = models.User(name=user_name, email=email, table=table, table_code=table.code)
-    session.add(user)
-    session.flush()
-
-    order = models.Order(user=user, table=table, table_code=table.code)
-
-    total_quantity = 0
-    total_amount = Decimal("0")
-    for item in _pick_items(max_lines=session.info.get("max_orders_per_user", 3)):
-        quantity = random.randint(1, 3)
-        price = Decimal(str(item["price"]))
-        total_quantity += quantity
-        total_amount += price * quantity
-        order.items.append(
-            models.OrderItem(
-                product_id=item["id"],
-                name=item["name"],
-                unit_price=price,
-                quantity=quantity,
-            )
-        )
-
-    order.total_quantity = total_quantity
-    order.total_amount = total_amount
-    session.add(order)
-    return order
-
-
-def _run_simulation(params: SimulationRequest) -> None:
-    if params.seed is not None:
-        random.seed(params.seed)
-
-    session = SessionLocal()
-    try:
-        session.info["max_orders_per_user"] = params.max_orders_per_user
-
-        tables_source = params.tables or DEFAULT_TABLES
-        available_tables = list(tables_source)
-        if not available_tables:
-            available_tables = DEFAULT_TABLES
-
-        for code in available_tables:
-            _ensure_table(session, code)
-        session.commit()
-
-        total_users = max(1, math.ceil(params.hours * ORDER_RATE_PER_HOUR))
-        sleep_interval = SECONDS_PER_ORDER / params.time_scale
-
-        for _ in range(total_users):
-            table_code = random.choice(available_tables)
-            table = _ensure_table(session, table_code)
-            _create_order(session, table)
-            session.commit()
-
-            if sleep_interval > 0:
-                time.sleep(sleep_interval)
-    finally:
-        session.close()
+class BulkSimulationRequest(BaseModel):
+    orders: int = Field(gt=0, le=50_000_000, description="Orders to generate")
+    workers: int = Field(default=4, ge=1, le=64, description="Worker processes")
+    batch_size: int = Field(default=1000, ge=1, le=50_000, description="Orders per multi-row INSERT batch")
+    rate: float = Field(default=0.0, ge=0, description="Target orders/second; 0 = unthrottled")
+    days: float = Field(default=0.0, ge=0, description="Spread created_at over the last N days")
+    closed_ratio: float = Field(default=0.9, ge=0, le=1, description="Share of orders generated as closed")
+    max_lines: int = Field(default=3, ge=1, le=10)
+    seed: int | None = None
+    tables: List[str] | None = None
+
+
+def _launch(plan: SimulationPlan) -> int:
+    # Run the engine in its own process tree, detached from the API worker
+    _processes[:] = [proc for proc in _processes if proc.poll() is None]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.simulation", *plan_to_argv(plan)],
+        start_new_session=True,
+    )
+    _processes.append(proc)
+    return proc.pid
 
 
 @router.post("/run", status_code=status.HTTP_202_ACCEPTED)
 async def run_simulation(
     request: SimulationRequest,
-    background_tasks: BackgroundTasks,
     admin: models.StaffUser = Depends(security.require_admin_api),
 ):
-    background_tasks.add_task(_run_simulation, request)
-    return {"message": "Simulation started", "total_users": int(request.hours * ORDER_RATE_PER_HOUR)}
+    # Real-time paced run: `hours` of traffic at ORDER_RATE_PER_HOUR, sped up by time_scale
+    total_users = max(1, math.ceil(request.hours * ORDER_RATE_PER_HOUR))
+    plan = SimulationPlan(
+        orders=total_users,
+        workers=1,
+        batch_size=1,
+        rate=ORDER_RATE_PER_HOUR * request.time_scale / 3600,
+        max_lines=request.max_orders_per_user,
+        seed=request.seed,
+        tables=request.tables or list(DEFAULT_TABLES),
+        venue_id=admin.venue_id,
+    )
+    pid = _launch(plan)
+    return {"message": "Simulation started", "total_users": total_users, "pid": pid}
+
+
+@router.post("/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def run_bulk_simulation(
+    request: BulkSimulationRequest,
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    plan = SimulationPlan(
+        orders=request.orders,
+        workers=request.workers,
+        batch_size=request.batch_size,
+        rate=request.rate,
+        days=request.days,
+        closed_ratio=request.closed_ratio,
+        max_lines=request.max_lines,
+        seed=request.seed,
+        tables=request.tables or list(DEFAULT_TABLES),
+        venue_id=admin.venue_id,
+    )
+    pid = _launch(plan)
+    return {"message": "Bulk simulation started", "orders": request.orders, "pid": pid}
+
+
+# Archived rows have no foreign keys; live items and transactions go with
+# their orders through ON DELETE CASCADE
+RESET_STATEMENTS = [
+    "DELETE FROM order_items_archive WHERE order_id IN "
+    "(SELECT id FROM orders_archive WHERE venue_id = :venue_id)",
+    "DELETE FROM transactions_archive WHERE order_id IN "
+    "(SELECT id FROM orders_archive WHERE venue_id = :venue_id)",
+    "DELETE FROM orders_archive WHERE venue_id = :venue_id",
+    "DELETE FROM prep_tasks WHERE venue_id = :venue_id",
+    "DELETE FROM orders WHERE venue_id = :venue_id",
+    # Tabs would otherwise stay open on the table with nothing left on them
+    "DELETE FROM table_sessions WHERE venue_id = :venue_id",
+    "DELETE FROM users WHERE venue_id = :venue_id",
+    "DELETE FROM outbox_events WHERE venue_id = :venue_id",
+]
 
 
 @router.post("/reset", status_code=status.HTTP_204_NO_CONTENT)
@@ -136,7 +127,8 @@ async def reset_simulation(
     db: Session = Depends(get_db),
     admin: models.StaffUser = Depends(security.require_admin_api),
 ):
-    db.execute(
-        text("TRUNCATE TABLE order_items, transactions, orders, users RESTART IDENTITY CASCADE")
-    )
+    # Only the caller's venue: other venues' orders and guests stay put
+    venue = {"venue_id": admin.venue_id}
+    for statement in RESET_STATEMENTS:
+        db.execute(text(statement), venue)
     db.commit()
@@ -1,30 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
-from app.database import get_db
+from app import models, schemas, tabs, venues
+from app.database import get_db, get_read_db
+from app.serialization import json_response
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[schemas.TableRead])
-async def list_tables(db: Session = Depends(get_db)):
-    tables = db.query(models.Table).order_by(models.Table.code.asc()).all()
-    return tables
+async def list_tables(venue: venues.VenueRef = Depends(venues.get_venue), db: Session = Depends(get_read_db)):
+    tables = (
+        db.query(models.Table)
+        .filter(models.Table.venue_id == venue.id)
+        .order_by(models.Table.code.asc())
+        .all()
+    )
+    return json_response(schemas.TABLE_LIST, tables)
 
 
 @router.post("/", response_model=schemas.TableRead, status_code=status.HTTP_201_CREATED)
-async def create_table(payload: schemas.TableCreate, db: Session = Depends(get_db)):
+async def create_table(
+    payload: schemas.TableCreate,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
     existing = (
         db.query(models.Table)
-        .filter(models.Table.code == payload.code)
+        .filter(models.Table.venue_id == venue.id, models.Table.code == payload.code)
         .first()
     )
     if existing:
         raise HTTPException(status_code=400, detail="Table code already exists")
 
-    table = models.Table(code=payload.code, name=payload.name)
+    table = models.Table(venue_id=venue.id, code=payload.code, name=payload.name)
     db.add(table)
     db.commit()
     db.refresh(table)
     return table
+
+
+@router.get("/{table_code}/session", response_model=schemas.TableSessionRead)
+async def get_table_session(
+    table_code: str,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
+    # Read from the primary: a guest checks the tab right after ordering
+    table = (
+        db.query(models.Table)
+        .filter(models.Table.venue_id == venue.id, models.Table.code == table_code)
+        .first()
+    )
+    session = tabs.open_session_for_table(db, table.id) if table else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="No open tab for this table")
+    return session
@@ -1,29 +1,39 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
-from app import models, schemas
-from app.database import get_db
+from app import models, ratelimit, schemas, venues
+from app.database import get_db, get_read_db
+from app.serialization import json_response
 
 router = APIRouter()
 
 
 @router.post("/auto", response_model=schemas.UserRead, status_code=status.HTTP_201_CREATED)
-async def auto_login(table_id: str | None = None, db: Session = Depends(get_db)):
+async def auto_login(
+    request: Request,
+    table_id: str | None = None,
+    venue: venues.VenueRef = Depends(venues.get_venue),
+    db: Session = Depends(get_db),
+):
     """Create a lightweight user row when a guest scans the QR code."""
+    ratelimit.enforce(request, "join", table_id, venue.id)
     try:
         guest_label = table_id or "guest"
-        user = models.User(name=f"Guest {guest_label} {datetime.utcnow().strftime('%H%M%S')}")
+        user = models.User(
+            venue_id=venue.id,
+            name=f"Guest {guest_label} {datetime.utcnow().strftime('%H%M%S')}",
+        )
 
         if table_id:
             table = (
                 db.query(models.Table)
-                .filter(models.Table.code == table_id)
+                .filter(models.Table.venue_id == venue.id, models.Table.code == table_id)
                 .first()
             )
             if table is None:
-                table = models.Table(code=table_id)
+                table = models.Table(venue_id=venue.id, code=table_id)
                 db.add(table)
                 db.flush()
             user.table = table
@@ -40,18 +50,28 @@ async def auto_login(table_id: str | None = None, db: Session = Depends(get_db))
 
 
 @router.get("/", response_model=list[schemas.UserRead])
-async def list_users(db: Session = Depends(get_db)):
-    users = db.query(models.User).order_by(models.User.created_at.desc()).all()
-    return users
+async def list_users(venue: venues.VenueRef = Depends(venues.get_venue), db: Session = Depends(get_read_db)):
+    users = (
+        db.query(models.User)
+        .filter(models.User.venue_id == venue.id)
+        .order_by(models.User.created_at.desc())
+        .all()
+    )
+    return json_response(schemas.USER_LIST, users)
 
 
 @router.put("/{user_id}", response_model=schemas.UserRead)
 async def update_user(
     user_id: int,
     payload: schemas.UserUpdate,
+    venue: venues.VenueRef = Depends(venues.get_venue),
     db: Session = Depends(get_db),
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = (
+        db.query(models.User)
+        .filter(models.User.id == user_id, models.User.venue_id == venue.id)
+        .first()
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
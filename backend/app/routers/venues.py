@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app import heatmaps, models, schemas, security, venues
+from app.database import get_db
+
+router = APIRouter()
+
+
+@router.get("/current", response_model=schemas.VenueRead)
+def current_venue(
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    return venues.staff_venue(db, admin)
+
+
+@router.put("/current/menu", response_model=schemas.VenueRead)
+def replace_menu(
+    payload: schemas.VenueMenuUpdate,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    """Replace the staff member's venue menu."""
+    menu = None
+    if payload.categories is not None:
+        menu = [category.model_dump(exclude_none=True) for category in payload.categories]
+        product_ids = [item["id"] for category in menu for item in category["items"]]
+        if len(product_ids) != len(set(product_ids)):
+            raise HTTPException(status_code=400, detail="Product ids must be unique across the menu")
+
+    venue = db.get(models.Venue, admin.venue_id)
+    venue.menu = menu
+    # A new updated_at is the new catalog version every worker keys its caches by
+    venue.updated_at = datetime.utcnow()
+    db.commit()
+    venues.clear_caches()
+    return venues.VenueRef.from_row(venue)
+
+
+@router.put("/current/timezone", response_model=schemas.VenueRead)
+def set_timezone(
+    payload: schemas.VenueTimezoneUpdate,
+    db: Session = Depends(get_db),
+    admin: models.StaffUser = Depends(security.require_admin_api),
+):
+    """Set the time zone the venue's dashboards bucket orders in."""
+    if not heatmaps.valid_timezone(payload.timezone):
+        raise HTTPException(status_code=400, detail="Unknown time zone")
+    venue = db.get(models.Venue, admin.venue_id)
+    venue.timezone = payload.timezone
+    venue.updated_at = datetime.utcnow()
+    db.commit()
+    venues.clear_caches()
+    return venues.VenueRef.from_row(venue)
@@ -0,0 +1,318 @@
+"""Periodic maintenance jobs, run once per interval across all replicas.
+
+Jobs are registered with ``Scheduler.register`` (see ``app.jobs``) and the
+scheduler is started from the app lifespan, so every worker of every replica
+runs one. A tick every ``SCHEDULER_TICK_SECONDS`` (default 5) starts the jobs
+this worker believes are due, each on its own daemon thread. A run then:
+
+1. takes ``pg_try_advisory_lock`` on a key derived from the job name, on a
+   connection it holds for the whole run; if another worker has it, the job
+   is already running elsewhere and this worker moves on;
+2. under the lock, reads the job's latest run from ``job_runs`` and skips it
+   unless ``interval`` seconds have passed on the database clock, so the job
+   runs once per interval however many workers compete;
+3. records the run, calls the job, and records its duration, outcome, a
+   short summary of its return value or the error.
+
+Sync jobs run on the thread; ``async def`` jobs are awaited on the event
+loop. A run left ``running`` by a worker that died is marked ``abandoned``
+by the next run. Runs older than ``SCHEDULER_RUN_RETENTION_DAYS`` (default
+14) are purged by a built-in job. ``SCHEDULER_ENABLED=false`` turns the
+scheduler off and ``SCHEDULER_DISABLED_JOBS`` (comma-separated names) skips
+single jobs. ``GET /api/jobs/`` shows their status.
+
+Run a job by hand with ``python -m app.scheduler --run NAME`` or list them
+with ``--list``.
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("SCHEDULER_ENABLED", "true").lower() != "false"
+TICK_SECONDS = float(os.environ.get("SCHEDULER_TICK_SECONDS", "5"))
+DISABLED_JOBS = {name.strip() for name in os.environ.get("SCHEDULER_DISABLED_JOBS", "").split(",") if name.strip()}
+RUN_RETENTION_DAYS = int(os.environ.get("SCHEDULER_RUN_RETENTION_DAYS", "14"))
+
+# Two-key locks (namespace, hashtext(job)) do not collide with the single-key ones
+JOB_LOCK_NAMESPACE = 727_004
+WORKER = f"{socket.gethostname()}:{os.getpid()}"[:120]
+
+_DB_NOW = "(clock_timestamp() AT TIME ZONE 'UTC')"
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    func: Callable[[], object]
+    interval: float
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.func)
+
+
+def _summary(result) -> str | None:
+    if result is None:
+        return None
+    return repr(result)[:200]
+
+
+class Scheduler:
+    """Registry of jobs plus the tick loop that starts them."""
+
+    def __init__(self, tick: float = TICK_SECONDS, engine: Engine | None = None):
+        self.tick = tick
+        self.engine = engine
+        self.jobs: dict[str, Job] = {}
+        self._running: set[str] = set()
+        # Monotonic time before which this worker does not try a job again
+        self._next_attempt: dict[str, float] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+
+    def register(self, name: str, func: Callable[[], object], interval: float) -> Job | None:
+        if interval <= 0 or name in DISABLED_JOBS:
+            logger.info("Scheduled job %s is disabled", name)
+            return None
+        job = Job(name, func, interval)
+        self.jobs[name] = job
+        return job
+
+    def running_here(self, name: str) -> bool:
+        return name in self._running
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Runs in flight finish on their daemon threads or die with the process
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            for job in list(self.jobs.values()):
+                if job.name in self._running or self._next_attempt.get(job.name, 0) > now:
+                    continue
+                self._running.add(job.name)
+                threading.Thread(target=self._attempt, args=(job,), name=f"job-{job.name}", daemon=True).start()
+            await asyncio.sleep(self.tick)
+
+    def _attempt(self, job: Job) -> None:
+        wait = job.interval
+        try:
+            wait = self.run_if_due(job)
+        except Exception:
+            logger.exception("Scheduling job %s failed", job.name)
+        finally:
+            self._next_attempt[job.name] = time.monotonic() + wait
+            self._running.discard(job.name)
+
+    def _call(self, job: Job):
+        if job.is_async:
+            if self._loop is None or not self._loop.is_running():
+                return asyncio.run(job.func())
+            return asyncio.run_coroutine_threadsafe(job.func(), self._loop).result()
+        return job.func()
+
+    def run_if_due(self, job: Job, force: bool = False) -> float:
+        """Run ``job`` if no worker ran it within its interval; returns seconds until it is due again."""
+        engine = self.engine or get_engine()
+        lock = {"namespace": JOB_LOCK_NAMESPACE, "name": job.name}
+        with engine.connect() as connection:
+            locked = connection.execute(text("SELECT pg_try_advisory_lock(:namespace, hashtext(:name))"), lock).scalar()
+            connection.commit()
+            if not locked:
+                return job.interval
+            try:
+                last_started, now = connection.execute(
+                    text(f"SELECT (SELECT MAX(started_at) FROM job_runs WHERE job = :name), {_DB_NOW}"),
+                    {"name": job.name},
+                ).one()
+                if not force and last_started is not None:
+                    remaining = job.interval - (now - last_started).total_seconds()
+                    if remaining > 0:
+                        connection.commit()
+                        return remaining
+                # Holding the lock, nobody else can be running it
+                connection.execute(
+                    text("UPDATE job_runs SET status = 'abandoned' WHERE job = :name AND status = 'running'"),
+                    {"name": job.name},
+                )
+                run_id = connection.execute(
+                    text(
+                        f"""
+                        INSERT INTO job_runs (job, status, started_at, worker)
+                        VALUES (:name, 'running', {_DB_NOW}, :worker)
+                        RETURNING id
+                        """
+                    ),
+                    {"name": job.name, "worker": WORKER},
+                ).scalar_one()
+                connection.commit()
+
+                started = time.perf_counter()
+                status, result, error = "ok", None, None
+                try:
+                    result = _summary(self._call(job))
+                except Exception as exc:
+                    status, error = "failed", f"{type(exc).__name__}: {exc}"[:1000]
+                    logger.exception("Scheduled job %s failed", job.name)
+                elapsed = time.perf_counter() - started
+                connection.execute(
+                    text(
+                        f"""
+                        UPDATE job_runs SET status = :status, finished_at = {_DB_NOW},
+                            duration_ms = :duration_ms, result = :result, error = :error
+                        WHERE id = :id
+                        """
+                    ),
+                    {
+                        "id": run_id,
+                        "status": status,
+                        "duration_ms": int(elapsed * 1000),
+                        "result": result,
+                        "error": error,
+                    },
+                )
+                connection.commit()
+                metrics.JOB_RUNS.labels(job.name, status).inc()
+                metrics.JOB_DURATION.labels(job.name).observe(elapsed)
+                logger.info("Scheduled job %s %s in %.2fs", job.name, status, elapsed)
+                return job.interval
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:namespace, hashtext(:name))"), lock)
+                connection.commit()
+
+    def status(self, connection) -> list[dict]:
+        """Registered jobs with their latest run and the last day's counts."""
+        names = sorted(self.jobs)
+        latest = {
+            row["job"]: row
+            for row in connection.execute(
+                text(
+                    """
+                    SELECT DISTINCT ON (job) job, status, started_at, finished_at,
+                           duration_ms, worker, result, error
+                    FROM job_runs
+                    WHERE job = ANY(:names)
+                    ORDER BY job, started_at DESC
+                    """
+                ),
+                {"names": names},
+            ).mappings()
+        }
+        since = datetime.utcnow() - timedelta(days=1)
+        day = {
+            row["job"]: row
+            for row in connection.execute(
+                text(
+                    """
+                    SELECT job,
+                           MAX(started_at) FILTER (WHERE status = 'ok') AS last_success_at,
+                           COUNT(*) AS runs,
+                           COUNT(*) FILTER (WHERE status = 'failed') AS failures,
+                           ROUND(AVG(duration_ms)) AS avg_duration_ms
+                    FROM job_runs
+                    WHERE job = ANY(:names) AND started_at >= :since
+                    GROUP BY job
+                    """
+                ),
+                {"names": names, "since": since},
+            ).mappings()
+        }
+        jobs = []
+        for name in names:
+            job = self.jobs[name]
+            last = latest.get(name)
+            stats = day.get(name)
+            jobs.append(
+                {
+                    "name": name,
+                    "interval_seconds": job.interval,
+                    "running_here": self.running_here(name),
+                    "last_run": dict(last) if last is not None else None,
+                    "next_due_at": last["started_at"] + timedelta(seconds=job.interval) if last is not None else None,
+                    "last_day": {
+                        "runs": stats["runs"] if stats else 0,
+                        "failures": stats["failures"] if stats else 0,
+                        "avg_duration_ms": int(stats["avg_duration_ms"] or 0) if stats else None,
+                        "last_success_at": stats["last_success_at"] if stats else None,
+                    },
+                }
+            )
+        return jobs
+
+    def recent_runs(self, connection, name: str, limit: int) -> list[dict]:
+        rows = connection.execute(
+            text(
+                """
+                SELECT id, status, started_at, finished_at, duration_ms, worker, result, error
+                FROM job_runs
+                WHERE job = :name
+                ORDER BY started_at DESC
+                LIMIT :limit
+                """
+            ),
+            {"name": name, "limit": limit},
+        ).mappings()
+        return [dict(row) for row in rows]
+
+
+def purge_runs(retention_days: int = RUN_RETENTION_DAYS, engine: Engine | None = None) -> int:
+    """Delete job runs started more than ``retention_days`` ago."""
+    engine = engine or get_engine()
+    with engine.begin() as connection:
+        result = connection.execute(
+            text("DELETE FROM job_runs WHERE started_at < :cutoff"),
+            {"cutoff": datetime.utcnow() - timedelta(days=retention_days)},
+        )
+    return result.rowcount
+
+
+SCHEDULER = Scheduler()
+
+
+if __name__ == "__main__":
+    from app import jobs
+
+    parser = argparse.ArgumentParser(description="Run or list scheduled maintenance jobs")
+    parser.add_argument("--list", action="store_true", help="Print the registered jobs")
+    parser.add_argument("--run", metavar="NAME", help="Run one job now, recording it like a scheduled run")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    jobs.register_jobs(SCHEDULER)
+    if args.list:
+        for job in SCHEDULER.jobs.values():
+            print(f"{job.name:30} every {job.interval:g}s")
+    if args.run:
+        if args.run not in SCHEDULER.jobs:
+            parser.error(f"unknown job {args.run!r}")
+        SCHEDULER.run_if_due(SCHEDULER.jobs[args.run], force=True)
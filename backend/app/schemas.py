@@ -1,8 +1,10 @@
 from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel, Field, PositiveInt, ConfigDict, EmailStr
+from typing import Annotated
+from pydantic import BaseModel, Field, PositiveInt, ConfigDict, EmailStr, PlainSerializer, TypeAdapter
 
-DECIMAL_ENCODERS = {Decimal: float}
+# Stored as NUMERIC, sent to clients as JSON numbers
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
 
 
 class TableCreate(BaseModel):
@@ -49,19 +51,19 @@ class OrderItemRead(BaseModel):
     id: int
     product_id: int
     name: str
-    unit_price: Decimal
+    unit_price: Money
     quantity: int
 
-    model_config = ConfigDict(from_attributes=True, json_encoders=DECIMAL_ENCODERS)
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TransactionRead(BaseModel):
     id: int
-    amount: Decimal
+    amount: Money
     method: str
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True, json_encoders=DECIMAL_ENCODERS)
+    model_config = ConfigDict(from_attributes=True)
 
 
 class OrderRead(BaseModel):
@@ -69,20 +71,36 @@ class OrderRead(BaseModel):
     table_code: str | None = Field(default=None, alias="table_id")
     status: str
     total_quantity: int
-    total_amount: Decimal
+    total_amount: Money
     created_at: datetime
     user_id: int | None
+    session_id: int | None = None
     table: TableRead | None = None
     items: list[OrderItemRead]
     transaction: TransactionRead | None = None
 
     model_config = ConfigDict(
         from_attributes=True,
-        json_encoders=DECIMAL_ENCODERS,
         populate_by_name=True,
     )
 
 
+class TableSessionRead(BaseModel):
+    id: int
+    table_id: str
+    status: str
+    order_count: int
+    total_quantity: int
+    total_amount: Money
+    paid_amount: Money
+    outstanding_amount: Money
+    opened_at: datetime
+    closed_at: datetime | None = None
+    payment_method: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class OrderStatusUpdate(BaseModel):
     status: str = Field(pattern="^(pending|processed|closed)$")
 
@@ -92,3 +110,70 @@ class UserUpdate(BaseModel):
     email: EmailStr | None = None
     phone: str | None = None
     age: int | None = Field(default=None, ge=0, le=120)
+
+
+class PrepTaskRead(BaseModel):
+    id: int
+    order_id: int
+    table_id: str | None = None
+    station: str
+    name: str
+    quantity: int
+    prep_seconds: int
+    status: str
+    created_at: datetime
+    due_at: datetime
+    claimed_by: str | None = None
+    claimed_at: datetime | None = None
+    completed_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PrepClaim(BaseModel):
+    staff: str = Field(min_length=1, max_length=120, description="Who is making the items")
+    limit: int = Field(default=1, ge=1, le=20)
+
+
+class MenuItem(BaseModel):
+    id: PositiveInt
+    name: str = Field(min_length=1, max_length=200)
+    price: float = Field(ge=0)
+    description: str | None = None
+    ingredients: list[str] | None = None
+    allergens: list[str] | None = None
+    tags: list[str] | None = None
+
+
+class MenuCategory(BaseModel):
+    name: str = Field(min_length=1, max_length=80)
+    items: list[MenuItem]
+
+
+class VenueMenuUpdate(BaseModel):
+    # None goes back to the default menu
+    categories: list[MenuCategory] | None
+
+
+class VenueTimezoneUpdate(BaseModel):
+    # IANA name such as "Europe/Rome"
+    timezone: str = Field(min_length=1, max_length=64)
+
+
+class VenueRead(BaseModel):
+    id: int
+    slug: str
+    name: str
+    hostname: str | None = None
+    has_menu: bool
+    version: str
+    timezone: str = "UTC"
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# List endpoints serialize through these; an adapter compiles its schema once
+TABLE_LIST = TypeAdapter(list[TableRead])
+USER_LIST = TypeAdapter(list[UserRead])
+ORDER_LIST = TypeAdapter(list[OrderRead])
+PREP_TASK_LIST = TypeAdapter(list[PrepTaskRead])
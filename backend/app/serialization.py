@@ -0,0 +1,42 @@
+"""JSON rendering for API responses.
+
+Two fast paths replace FastAPI's ``jsonable_encoder`` + stdlib ``json``:
+
+* ``json_response`` dumps Pydantic models straight to bytes with a
+  ``TypeAdapter`` (Rust core, no intermediate dicts). List endpoints use it.
+* ``ORJSONResponse`` is the app's default response class, so endpoints that
+  return plain dicts are rendered by orjson.
+
+Both produce the same wire format: money as JSON numbers, datetimes as ISO
+8601 strings exactly as stored (naive UTC, no offset).
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+
+def _default(value: Any) -> Any:
+    # orjson handles datetime/date/UUID natively; Decimal is the only gap here
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(adapter: TypeAdapter, value: Any, status_code: int = 200) -> Response:
+    """Validate ``value`` (ORM objects are fine) and serialize it in one pass."""
+    # by_alias matches FastAPI's response_model output (e.g. OrderRead.table_id)
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True), by_alias=True)
+    return Response(content=body, status_code=status_code, media_type="application/json")
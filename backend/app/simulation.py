@@ -0,0 +1,446 @@
+"""Standalone order simulator.
+
+Generates guest users and orders directly in Postgres from a pool of worker
+processes. Each worker reserves primary keys from the sequences up front and
+writes users, orders, items and transactions with multi-row INSERTs, one
+commit per batch, optionally paced to a target rate. It runs outside the API
+workers so it never competes with real traffic.
+
+Batches write what the order endpoints would: pending orders join their
+table's open tab and queue prep tasks, closed orders come with a settled
+one-order tab, and every order records its outbox events and live
+notifications, so tabs, the prep queue and event consumers see simulated
+traffic like real orders. Closed orders have no prep tasks, as if they had
+been cleared at checkout. Orders go to one venue (``--venue-id``, the
+default venue unless given), its tables and its menu; the API endpoints use
+the calling admin's venue.
+
+    python -m app.simulation --orders 10000000 --workers 8 --days 365
+
+``POST /api/simulator/run`` and ``/api/simulator/bulk`` start the same engine
+as a detached subprocess.
+"""
+
+import argparse
+import logging
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import Connection
+
+from app import events, live, models, prep, tabs
+from app.database import _build_database_url
+from app.routers.menu import CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLES = [f"table{i}" for i in range(1, 11)]
+PAYMENT_METHODS = ["cash", "card", "mobile", "other"]
+# Batches handed to a worker per task; keeps progress reports frequent
+BATCHES_PER_TASK = 10
+
+
+@dataclass
+class SimulationPlan:
+    orders: int
+    workers: int = 1
+    batch_size: int = 1000
+    rate: float = 0.0  # orders per second across all workers; 0 = as fast as possible
+    days: float = 0.0  # spread created_at over the last N days; 0 = real time
+    closed_ratio: float = 0.0  # share of orders generated already paid and closed
+    max_lines: int = 3
+    seed: int | None = None
+    tables: list[str] = field(default_factory=lambda: list(DEFAULT_TABLES))
+    venue_id: int = models.DEFAULT_VENUE_ID
+
+
+def _reserve_ids(connection: Connection, table: str, count: int) -> list[int]:
+    if not count:
+        return []
+    return list(
+        connection.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table": table, "count": count},
+        ).scalars()
+    )
+
+
+def _build_batch(
+    rng: random.Random,
+    plan: SimulationPlan,
+    size: int,
+    table_ids: dict[str, int],
+    menu_items: list[dict],
+    now: datetime,
+) -> tuple[list[dict], list[dict], list[list[dict]], list[dict | None]]:
+    users: list[dict] = []
+    orders: list[dict] = []
+    lines: list[list[dict]] = []
+    payments: list[dict | None] = []
+    span = plan.days * 86400
+    codes = list(table_ids)
+    max_lines = max(1, min(plan.max_lines, len(menu_items)))
+
+    for _ in range(size):
+        code = rng.choice(codes)
+        created_at = now - timedelta(seconds=rng.random() * span) if span else now
+        name = f"SimUser {uuid.UUID(int=rng.getrandbits(128)).hex[:6]}"
+        users.append(
+            {
+                "venue_id": plan.venue_id,
+                "name": name,
+                "email": f"{name.lower().replace(' ', '')}@example.com",
+                "created_at": created_at,
+                "table_ref_id": table_ids[code],
+                "table_code": code,
+            }
+        )
+
+        order_lines = []
+        total_quantity = 0
+        total_amount = Decimal("0")
+        for item in rng.sample(menu_items, rng.randint(1, max_lines)):
+            quantity = rng.randint(1, 3)
+            price = Decimal(str(item["price"]))
+            total_quantity += quantity
+            total_amount += price * quantity
+            order_lines.append(
+                {
+                    "product_id": item["id"],
+                    "name": item["name"],
+                    "unit_price": price,
+                    "quantity": quantity,
+                }
+            )
+        lines.append(order_lines)
+
+        closed = rng.random() < plan.closed_ratio
+        orders.append(
+            {
+                "venue_id": plan.venue_id,
+                "status": "closed" if closed else "pending",
+                "total_quantity": total_quantity,
+                "total_amount": total_amount,
+                "created_at": created_at,
+                "table_ref_id": table_ids[code],
+                "table_code": code,
+            }
+        )
+        payments.append(
+            {
+                "method": rng.choice(PAYMENT_METHODS),
+                "amount": total_amount,
+                "created_at": created_at,
+            }
+            if closed
+            else None
+        )
+    return users, orders, lines, payments
+
+
+def _open_tabs(connection: Connection, orders: list[dict]) -> None:
+    """Put pending orders on their tables' open tabs, one upsert per table."""
+    by_table: dict[int, list[dict]] = {}
+    for order in orders:
+        if order["status"] != "closed":
+            by_table.setdefault(order["table_ref_id"], []).append(order)
+    # Tables in a fixed order, so concurrent workers lock tabs without deadlocking
+    for table_ref_id in sorted(by_table):
+        group = by_table[table_ref_id]
+        session_id = connection.execute(
+            tabs.ADD_ORDERS_SQL,
+            {
+                "venue_id": group[0]["venue_id"],
+                "table_ref_id": table_ref_id,
+                "table_code": group[0]["table_code"],
+                "orders": len(group),
+                "quantity": sum(order["total_quantity"] for order in group),
+                "amount": sum(order["total_amount"] for order in group),
+                "now": min(order["created_at"] for order in group),
+            },
+        ).scalar_one()
+        for order in group:
+            order["session_id"] = session_id
+
+
+def _settled_tabs(connection: Connection, orders: list[dict], payments: list[dict | None]) -> list[dict]:
+    """A closed one-order tab for every closed order."""
+    closed = [(order, payment) for order, payment in zip(orders, payments) if payment is not None]
+    sessions = []
+    for session_id, (order, payment) in zip(_reserve_ids(connection, "table_sessions", len(closed)), closed):
+        order["session_id"] = session_id
+        sessions.append(
+            {
+                "id": session_id,
+                "venue_id": order["venue_id"],
+                "table_ref_id": order["table_ref_id"],
+                "table_code": order["table_code"],
+                "status": "closed",
+                "order_count": 1,
+                "total_quantity": order["total_quantity"],
+                "total_amount": order["total_amount"],
+                "paid_amount": payment["amount"],
+                "opened_at": order["created_at"],
+                "updated_at": payment["created_at"],
+                "closed_at": payment["created_at"],
+                "payment_method": payment["method"],
+            }
+        )
+    return sessions
+
+
+def _prep_tasks(order: dict, items: list[dict], category_by_product: dict[int, str]) -> list[dict]:
+    tasks = []
+    for item in items:
+        seconds = prep.prep_seconds_for(item["product_id"], item["quantity"], category_by_product)
+        tasks.append(
+            {
+                "venue_id": order["venue_id"],
+                "order_id": order["id"],
+                "order_item_id": item["id"],
+                "station": prep.station_for(item["product_id"], category_by_product),
+                "name": item["name"],
+                "quantity": item["quantity"],
+                "prep_seconds": seconds,
+                "status": "queued",
+                "created_at": order["created_at"],
+                "due_at": order["created_at"] + timedelta(seconds=seconds),
+            }
+        )
+    return tasks
+
+
+def _write_batch(connection: Connection, category_by_product: dict[int, str], users, orders, lines, payments) -> None:
+    user_ids = _reserve_ids(connection, "users", len(users))
+    order_ids = _reserve_ids(connection, "orders", len(orders))
+    item_ids = iter(_reserve_ids(connection, "order_items", sum(len(order_lines) for order_lines in lines)))
+    for user, user_id, order, order_id in zip(users, user_ids, orders, order_ids):
+        user["id"] = user_id
+        order["id"] = order_id
+        order["user_id"] = user_id
+
+    items = []
+    tasks = []
+    for order, order_lines in zip(orders, lines):
+        order_items = [{**line, "id": next(item_ids), "order_id": order["id"]} for line in order_lines]
+        items.extend(order_items)
+        if order["status"] != "closed":
+            tasks.extend(_prep_tasks(order, order_items, category_by_product))
+    transactions = [
+        {**payment, "order_id": order_id}
+        for order_id, payment in zip(order_ids, payments)
+        if payment is not None
+    ]
+    sessions = _settled_tabs(connection, orders, payments)
+    _open_tabs(connection, orders)
+
+    # Outbox events and live messages as the endpoints record them: placed,
+    # then checked out for the orders generated as paid
+    created, checked_out = [], []
+    for order, order_lines, payment in zip(orders, lines, payments):
+        instance = models.Order(**{**order, "status": "pending"})
+        instance.items = [models.OrderItem(**line) for line in order_lines]
+        created.append((instance, events.event_row("order.created", instance, items=_event_items(order_lines))))
+        if payment is not None:
+            instance = models.Order(**order)
+            checked_out.append(
+                (
+                    instance,
+                    events.event_row(
+                        "order.checked_out", instance, previous_status="pending", payment_method=payment["method"]
+                    ),
+                )
+            )
+
+    # A list of parameter sets is sent as batched multi-row INSERTs
+    connection.execute(insert(models.User.__table__), users)
+    if sessions:
+        connection.execute(insert(models.TableSession.__table__), sessions)
+    connection.execute(insert(models.Order.__table__), orders)
+    connection.execute(insert(models.OrderItem.__table__), items)
+    if transactions:
+        connection.execute(insert(models.Transaction.__table__), transactions)
+    if tasks:
+        connection.execute(insert(models.PrepTask.__table__), tasks)
+    connection.execute(insert(models.OutboxEvent.__table__), [row for _, row in created + checked_out])
+    live.notify_many(
+        connection,
+        [("order.created", instance) for instance, _ in created]
+        + [("order.checked_out", instance) for instance, _ in checked_out],
+    )
+
+
+def _event_items(order_lines: list[dict]) -> list[dict]:
+    return [
+        {
+            "product_id": line["product_id"],
+            "name": line["name"],
+            "quantity": line["quantity"],
+            "unit_price": float(line["unit_price"]),
+        }
+        for line in order_lines
+    ]
+
+
+def _run_task(
+    plan_data: dict,
+    table_ids: dict[str, int],
+    categories: list[dict],
+    task_index: int,
+    count: int,
+    rate: float,
+) -> int:
+    # Runs in a worker process: own engine, own RNG stream
+    plan = SimulationPlan(**plan_data)
+    menu_items = [item for category in categories for item in category["items"]]
+    category_by_product = {item["id"]: category["name"] for category in categories for item in category["items"]}
+    seed = None if plan.seed is None else plan.seed * 1_000_003 + task_index
+    rng = random.Random(seed)
+    engine = create_engine(_build_database_url(), future=True, pool_size=1, max_overflow=0)
+    started = time.perf_counter()
+    written = 0
+    try:
+        while written < count:
+            size = min(plan.batch_size, count - written)
+            batch = _build_batch(rng, plan, size, table_ids, menu_items, datetime.utcnow())
+            with engine.begin() as connection:
+                _write_batch(connection, category_by_product, *batch)
+            written += size
+            if rate > 0:
+                # Sleep until this worker is back on its share of the target rate
+                ahead = written / rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    finally:
+        engine.dispose()
+    return written
+
+
+def _prepare_venue(venue_id: int, codes: list[str]) -> tuple[dict[str, int], list[dict]]:
+    """Create the venue's missing tables; returns their ids and the venue's menu."""
+    engine = create_engine(_build_database_url(), future=True)
+    try:
+        with engine.begin() as connection:
+            venue = connection.execute(
+                text("SELECT menu FROM venues WHERE id = :venue_id"), {"venue_id": venue_id}
+            ).first()
+            if venue is None:
+                raise SystemExit(f"Unknown venue {venue_id}")
+            connection.execute(
+                text(
+                    "INSERT INTO tables (venue_id, code, created_at) "
+                    "SELECT :venue_id, code, CURRENT_TIMESTAMP FROM unnest(CAST(:codes AS VARCHAR[])) AS code "
+                    "ON CONFLICT (venue_id, code) DO NOTHING"
+                ),
+                {"codes": codes, "venue_id": venue_id},
+            )
+            rows = connection.execute(
+                text("SELECT code, id FROM tables WHERE venue_id = :venue_id AND code = ANY(:codes)"),
+                {"codes": codes, "venue_id": venue_id},
+            ).all()
+    finally:
+        engine.dispose()
+    # Venues without a menu of their own serve the default one
+    return {code: table_id for code, table_id in rows}, venue.menu or CATEGORIES
+
+
+def run(plan: SimulationPlan) -> dict[str, float]:
+    """Generate ``plan.orders`` orders and return throughput statistics."""
+    table_ids, categories = _prepare_venue(plan.venue_id, plan.tables or DEFAULT_TABLES)
+    workers = max(1, plan.workers)
+    task_size = plan.batch_size * BATCHES_PER_TASK
+    tasks = [
+        (index, min(task_size, plan.orders - offset))
+        for index, offset in enumerate(range(0, plan.orders, task_size))
+    ]
+    # At most `workers` tasks run at once, so each paces to an equal share
+    per_task_rate = plan.rate / workers if plan.rate > 0 else 0.0
+
+    started = time.perf_counter()
+    written = 0
+    plan_data = asdict(plan)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_task, plan_data, table_ids, categories, index, count, per_task_rate)
+            for index, count in tasks
+        ]
+        for future in as_completed(futures):
+            written += future.result()
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "%d/%d orders (%.0f%%), %.0f orders/s",
+                written, plan.orders, 100.0 * written / plan.orders, written / elapsed,
+            )
+
+    elapsed = time.perf_counter() - started
+    return {
+        "orders": written,
+        "seconds": round(elapsed, 2),
+        "orders_per_second": round(written / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Seed orders for capacity testing")
+    parser.add_argument("--orders", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0.0, help="Target orders/s; 0 = unthrottled")
+    parser.add_argument("--days", type=float, default=0.0, help="Spread created_at over the last N days")
+    parser.add_argument("--closed-ratio", type=float, default=0.0)
+    parser.add_argument("--max-lines", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--tables", nargs="*", default=None, help="Table codes to target")
+    parser.add_argument("--venue-id", type=int, default=models.DEFAULT_VENUE_ID, help="Venue the orders belong to")
+    return parser
+
+
+def plan_from_args(args: argparse.Namespace) -> SimulationPlan:
+    return SimulationPlan(
+        orders=args.orders,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        rate=args.rate,
+        days=args.days,
+        closed_ratio=args.closed_ratio,
+        max_lines=args.max_lines,
+        seed=args.seed,
+        tables=args.tables or list(DEFAULT_TABLES),
+        venue_id=args.venue_id,
+    )
+
+
+def plan_to_argv(plan: SimulationPlan) -> list[str]:
+    argv = [
+        "--orders", str(plan.orders),
+        "--workers", str(plan.workers),
+        "--batch-size", str(plan.batch_size),
+        "--rate", str(plan.rate),
+        "--days", str(plan.days),
+        "--closed-ratio", str(plan.closed_ratio),
+        "--max-lines", str(plan.max_lines),
+        "--venue-id", str(plan.venue_id),
+    ]
+    if plan.seed is not None:
+        argv += ["--seed", str(plan.seed)]
+    if plan.tables:
+        argv += ["--tables", *plan.tables]
+    return argv
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    stats = run(plan_from_args(build_arg_parser().parse_args()))
+    print(
+        f"Wrote {stats['orders']} orders in {stats['seconds']}s "
+        f"({stats['orders_per_second']} orders/s)"
+    )
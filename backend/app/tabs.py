@@ -0,0 +1,210 @@
+"""Running tabs: a table's orders grouped from seating to payment.
+
+The first order placed at a table opens a ``TableSession``; later orders at
+the same table join it until the whole tab is checked out. The session keeps
+running totals (orders, pieces, amount, and the amount already paid, i.e.
+the sum of its orders' transactions) that are updated incrementally as
+orders are placed, deleted and paid, so the order board
+reads a table's bill from one row instead of re-summing its orders.
+
+Placing an order adds to the tab with a single ``INSERT ... ON CONFLICT``
+against the partial unique index on open sessions: it either opens the tab
+or bumps its totals under the row lock. Checking out a tab locks the session
+row first, so an order placed concurrently either lands in the tab being
+paid or, once it is closed, opens a new one. The same holds when single
+orders are checked out or deleted: once none of its orders is left unpaid
+the tab closes, and the next party at the table starts a fresh one.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import events, models, prep
+
+# Bumps the open tab by :orders orders or opens one; the arbiter is
+# uq_table_sessions_open_table. The simulator adds a batch's orders at once
+ADD_ORDERS_SQL = text(
+    """
+    INSERT INTO table_sessions AS s (
+        venue_id, table_ref_id, table_code, status, order_count,
+        total_quantity, total_amount, paid_amount, opened_at, updated_at
+    )
+    VALUES (:venue_id, :table_ref_id, :table_code, 'open', :orders, :quantity, :amount, 0, :now, :now)
+    ON CONFLICT (table_ref_id) WHERE status = 'open' DO UPDATE SET
+        order_count = s.order_count + EXCLUDED.order_count,
+        total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+        total_amount = s.total_amount + EXCLUDED.total_amount,
+        updated_at = EXCLUDED.updated_at
+    RETURNING id
+    """
+)
+
+_ADJUST_SQL = text(
+    """
+    UPDATE table_sessions SET
+        order_count = order_count + :orders,
+        total_quantity = total_quantity + :quantity,
+        total_amount = total_amount + :amount,
+        paid_amount = paid_amount + :paid,
+        updated_at = :now
+    WHERE id = :session_id
+    """
+)
+
+
+def add_order(db: Session, order: models.Order) -> None:
+    """Put a new order with a flushed table on its table's open tab."""
+    # The order is not flushed yet, so it is inserted with session_id set
+    with db.no_autoflush:
+        order.session_id = db.execute(
+            ADD_ORDERS_SQL,
+            {
+                "venue_id": order.venue_id,
+                "orders": 1,
+                "table_ref_id": order.table.id,
+                "table_code": order.table.code,
+                "quantity": order.total_quantity,
+                "amount": order.total_amount,
+                "now": order.created_at or datetime.utcnow(),
+            },
+        ).scalar_one()
+
+
+def _adjust(db: Session, session_id: int, orders=0, quantity=0, amount=Decimal("0"), paid=Decimal("0")) -> None:
+    db.execute(
+        _ADJUST_SQL,
+        {
+            "session_id": session_id,
+            "orders": orders,
+            "quantity": quantity,
+            "amount": amount,
+            "paid": paid,
+            "now": datetime.utcnow(),
+        },
+    )
+
+
+def _close_if_settled(
+    db: Session,
+    session_id: int,
+    method: str | None = None,
+    ignore_order_id: int | None = None,
+) -> None:
+    # Sessions do not autoflush; the orders query must see this order's change
+    db.flush()
+    # Locked first, like checkout_session, so a concurrent order either is
+    # seen here and keeps the tab open or waits and then opens a new tab
+    session = (
+        db.query(models.TableSession)
+        .filter(models.TableSession.id == session_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+    if session is None or session.status != "open":
+        return
+    unpaid = db.query(models.Order.id).filter(models.Order.session_id == session_id, models.Order.status != "closed")
+    if ignore_order_id is not None:
+        unpaid = unpaid.filter(models.Order.id != ignore_order_id)
+    if unpaid.first() is not None:
+        return
+    now = datetime.utcnow()
+    session.status = "closed"
+    session.payment_method = method or session.payment_method
+    session.closed_at = now
+    session.updated_at = now
+
+
+def remove_order(db: Session, order: models.Order) -> None:
+    """Take an order that is about to be deleted off its tab and the prep queue, closing the tab if nothing is left to pay."""
+    prep.cancel_tasks(db, order.id)
+    if order.session_id is None:
+        return
+    paid = order.transaction.amount if order.transaction is not None else Decimal("0")
+    _adjust(db, order.session_id, orders=-1, quantity=-order.total_quantity, amount=-order.total_amount, paid=-paid)
+    _close_if_settled(db, order.session_id, ignore_order_id=order.id)
+
+
+def _close_order(db: Session, order: models.Order, method: str) -> Decimal:
+    # Returns the amount newly paid: nothing when a transaction already exists
+    previous_status = order.status
+    order.status = "closed"
+    prep.cancel_tasks(db, order.id)
+    newly_paid = Decimal("0")
+    if order.transaction:
+        order.transaction.method = method
+        order.transaction.created_at = datetime.utcnow()
+    else:
+        db.add(models.Transaction(order=order, method=method, amount=order.total_amount))
+        newly_paid = order.total_amount
+    events.record_event(
+        db,
+        "order.checked_out",
+        order,
+        previous_status=previous_status,
+        payment_method=method,
+    )
+    return newly_paid
+
+
+def checkout_order(db: Session, order: models.Order, method: str) -> None:
+    """Close one order with a transaction, counting it as paid on its tab; the last one closes the tab."""
+    newly_paid = _close_order(db, order, method)
+    if order.session_id is None:
+        return
+    if newly_paid:
+        _adjust(db, order.session_id, paid=newly_paid)
+    _close_if_settled(db, order.session_id, method)
+
+
+def open_sessions(db: Session, venue_id: int) -> list[models.TableSession]:
+    return (
+        db.query(models.TableSession)
+        .filter(models.TableSession.venue_id == venue_id, models.TableSession.status == "open")
+        .order_by(models.TableSession.opened_at.asc())
+        .all()
+    )
+
+
+def open_session_for_table(db: Session, table_ref_id: int) -> models.TableSession | None:
+    return (
+        db.query(models.TableSession)
+        .filter(models.TableSession.table_ref_id == table_ref_id, models.TableSession.status == "open")
+        .first()
+    )
+
+
+def checkout_session(db: Session, venue_id: int, session_id: int, method: str) -> models.TableSession | None:
+    """Pay every unpaid order on an open tab at once and close it; the caller commits."""
+    session = (
+        db.query(models.TableSession)
+        .filter(
+            models.TableSession.id == session_id,
+            models.TableSession.venue_id == venue_id,
+            models.TableSession.status == "open",
+        )
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+    if session is None:
+        return None
+    unpaid = (
+        db.query(models.Order)
+        .filter(models.Order.session_id == session.id, models.Order.status != "closed")
+        .all()
+    )
+    paid = Decimal("0")
+    for order in unpaid:
+        paid += _close_order(db, order, method)
+    # The row is locked, so plain assignment cannot lose a concurrent update
+    now = datetime.utcnow()
+    session.paid_amount = session.paid_amount + paid
+    session.status = "closed"
+    session.payment_method = method
+    session.closed_at = now
+    session.updated_at = now
+    return session
@@ -0,0 +1,252 @@
+"""Venues: several bars served by one deployment.
+
+Tables, guests, orders, preparation tasks and staff each belong to a venue.
+A guest request is resolved to its venue in this order:
+
+1. an explicit slug, from the ``X-Venue`` header or the ``?venue=`` parameter
+   the QR code URL carries;
+2. the request host, for venues that have their own hostname;
+3. the default venue, which owns every row created before venues existed.
+
+Staff pages do not resolve anything; they are scoped to the staff user's
+own venue.
+
+Lookups are cached per process for ``VENUE_CACHE_TTL`` seconds (default 30),
+unknown hosts included, so resolution costs no query on the hot path. Each
+venue's menu is held in a ``Catalog``: a menu snapshot, its search index and
+its precompressed menu payloads. Catalogs live in an LRU of
+``VENUE_CATALOG_CACHE_SIZE`` entries (default 32), so memory is bounded
+however many venues exist. They are keyed by the venue's ``updated_at``, so
+a menu change is picked up once the lookup cache expires. Venues without a
+menu of their own share the default menu's index.
+
+Manage venues with ``python -m app.venues --list`` or
+``--add SLUG --name NAME [--host HOST] [--menu menu.json] [--timezone Europe/Rome]``.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from app import models
+from app.compression import PrecompressedPayload
+from app.database import SessionLocal, get_db
+from app.serialization import dumps
+
+VENUE_HEADER = "x-venue"
+VENUE_PARAM = "venue"
+LOOKUP_TTL = float(os.environ.get("VENUE_CACHE_TTL", "30"))
+LOOKUP_CACHE_SIZE = 4096
+CATALOG_CACHE_SIZE = int(os.environ.get("VENUE_CATALOG_CACHE_SIZE", "32"))
+# Distinct tables whose menu payloads one catalog keeps
+MENU_PAYLOADS_PER_CATALOG = 256
+
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+@dataclass(frozen=True)
+class VenueRef:
+    id: int
+    slug: str
+    name: str
+    hostname: str | None
+    has_menu: bool
+    version: str
+    timezone: str
+
+    @property
+    def is_default(self) -> bool:
+        return self.id == models.DEFAULT_VENUE_ID
+
+    @classmethod
+    def from_row(cls, venue: models.Venue) -> "VenueRef":
+        return cls(
+            id=venue.id,
+            slug=venue.slug,
+            name=venue.name,
+            hostname=venue.hostname,
+            has_menu=venue.menu is not None,
+            version=venue.updated_at.isoformat(),
+            timezone=venue.timezone,
+        )
+
+
+_lookups = _LRU(LOOKUP_CACHE_SIZE)
+
+
+def _lookup(db: Session, column, value) -> VenueRef | None:
+    key = (column.key, value)
+    cached = _lookups.get(key)
+    now = time.monotonic()
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    venue = db.query(models.Venue).filter(column == value).first()
+    ref = VenueRef.from_row(venue) if venue is not None else None
+    _lookups.put(key, (now + LOOKUP_TTL, ref))
+    return ref
+
+
+def venue_by_id(db: Session, venue_id: int) -> VenueRef:
+    ref = _lookup(db, models.Venue.id, venue_id)
+    if ref is None:
+        raise HTTPException(status_code=404, detail="Unknown venue")
+    return ref
+
+
+def resolve_venue(request: Request, db: Session) -> VenueRef:
+    slug = request.headers.get(VENUE_HEADER) or request.query_params.get(VENUE_PARAM)
+    if slug:
+        ref = _lookup(db, models.Venue.slug, slug.strip().lower())
+        if ref is None:
+            raise HTTPException(status_code=404, detail="Unknown venue")
+        return ref
+    host = request.url.hostname
+    if host:
+        ref = _lookup(db, models.Venue.hostname, host.lower())
+        if ref is not None:
+            return ref
+    return venue_by_id(db, models.DEFAULT_VENUE_ID)
+
+
+def get_venue(request: Request, db: Session = Depends(get_db)) -> VenueRef:
+    return resolve_venue(request, db)
+
+
+def staff_venue(db: Session, admin: models.StaffUser) -> VenueRef:
+    return venue_by_id(db, admin.venue_id)
+
+
+@dataclass(eq=False)
+class Catalog:
+    """One venue's menu snapshot with its search index and encoded payloads."""
+
+    venue: VenueRef
+    categories: list
+    search: object  # app.ai.search.MenuSearch
+    category_by_product: dict[int, str]
+    _payloads: _LRU = field(default_factory=lambda: _LRU(MENU_PAYLOADS_PER_CATALOG))
+    docs_by_id: dict = field(init=False)
+
+    def __post_init__(self):
+        self.docs_by_id = {doc.id: doc for doc in self.search.docs}
+
+    def menu_payload(self, table_code: str, table_name: str | None) -> PrecompressedPayload:
+        key = (table_code, table_name)
+        payload = self._payloads.get(key)
+        if payload is None:
+            # The menu is fixed per version; only the table header differs
+            body = dumps({"table_id": table_code, "table_name": table_name, "categories": self.categories})
+            payload = PrecompressedPayload.build(body)
+            self._payloads.put(key, payload)
+        return payload
+
+    def tags_payload(self) -> PrecompressedPayload:
+        payload = self._payloads.get("tags")
+        if payload is None:
+            items = [
+                {
+                    "id": doc.id,
+                    "name": doc.name,
+                    "description": doc.description,
+                    "ingredients": doc.ingredients,
+                    "allergens": doc.allergens,
+                    "tags": doc.tags,
+                }
+                for doc in self.search.docs
+            ]
+            payload = PrecompressedPayload.build(dumps({"items": items}))
+            self._payloads.put("tags", payload)
+        return payload
+
+
+_catalogs = _LRU(CATALOG_CACHE_SIZE)
+
+
+def _category_map(categories: list) -> dict[int, str]:
+    return {int(item["id"]): category["name"] for category in categories for item in category["items"]}
+
+
+def _build_catalog(db: Session, ref: VenueRef) -> Catalog:
+    # Imported here: both modules import app.routers.menu, which imports this one
+    from app.ai.search import DEFAULT_SEARCH, MenuSearch
+    from app.routers.menu import CATEGORIES
+
+    if not ref.has_menu:
+        return Catalog(ref, CATEGORIES, DEFAULT_SEARCH, _category_map(CATEGORIES))
+    venue = db.get(models.Venue, ref.id)
+    categories = venue.menu
+    return Catalog(ref, categories, MenuSearch(categories, key=(ref.id, ref.version)), _category_map(categories))
+
+
+def catalog_for(db: Session, ref: VenueRef) -> Catalog:
+    catalog = _catalogs.get(ref.id)
+    if catalog is None or catalog.venue.version != ref.version:
+        catalog = _build_catalog(db, ref)
+        _catalogs.put(ref.id, catalog)
+    return catalog
+
+
+def clear_caches() -> None:
+    _lookups.clear()
+    _catalogs.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or add venues")
+    parser.add_argument("--list", action="store_true", help="Print every venue")
+    parser.add_argument("--add", metavar="SLUG", help="Create a venue with this slug")
+    parser.add_argument("--name", help="Display name for --add")
+    parser.add_argument("--host", help="Hostname that resolves to the new venue")
+    parser.add_argument("--menu", help="JSON file with the venue's menu categories")
+    parser.add_argument("--timezone", default="UTC", help="IANA time zone for the new venue's dashboards")
+    args = parser.parse_args()
+    with SessionLocal() as session:
+        if args.add:
+            menu = None
+            if args.menu:
+                with open(args.menu, encoding="utf-8") as fh:
+                    menu = json.load(fh)
+            venue = models.Venue(
+                slug=args.add.lower(),
+                name=args.name or args.add,
+                hostname=args.host.lower() if args.host else None,
+                menu=menu,
+                timezone=args.timezone,
+            )
+            session.add(venue)
+            session.commit()
+            print(f"Created venue {venue.id} ({venue.slug})")
+        if args.list:
+            for venue in session.query(models.Venue).order_by(models.Venue.id):
+                menu = "own menu" if venue.menu is not None else "default menu"
+                print(f"{venue.id:5d}  {venue.slug:20} {venue.hostname or '-':30} {venue.timezone:20} {menu}")
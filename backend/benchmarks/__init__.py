@@ -0,0 +1,5 @@
+"""Benchmarks and capacity tools for the backend.
+
+Run from the ``backend`` directory, e.g. ``python -m benchmarks.startup``.
+They are not part of the container image.
+"""
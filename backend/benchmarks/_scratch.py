@@ -0,0 +1,27 @@
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+
+@contextmanager
+def scratch_schema(url: str, prefix: str = "bench") -> Iterator[Engine]:
+    """Yield an engine whose search_path is a fresh schema, dropped on exit."""
+    schema = f"{prefix}_{uuid.uuid4().hex[:8]}"
+    admin_engine = create_engine(url, future=True)
+    with admin_engine.begin() as connection:
+        connection.execute(text(f'CREATE SCHEMA "{schema}"'))
+    engine = create_engine(
+        url,
+        future=True,
+        connect_args={"options": f"-csearch_path={schema}"},
+    )
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin_engine.begin() as connection:
+            connection.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        admin_engine.dispose()
@@ -0,0 +1,320 @@
+"""HTTP load generator replaying the guest journey against a running backend.
+
+Guests arrive as a (non-homogeneous) Poisson process whose rate follows an
+arrival curve. Each guest walks the same path as the frontend after a QR
+scan:
+
+    POST /api/users/auto -> GET /api/menu -> GET /api/ai/search -> POST /api/orders/
+
+with think time between steps. In parallel, admin pollers log in and refresh
+``/admin/orders`` and ``/api/dashboard/summary`` like an open staff tab.
+
+Per-endpoint throughput and latency percentiles are printed and written as
+JSON (``--output``), so runs can be diffed or plotted:
+
+    python -m benchmarks.loadtest --base-url https://orders.local --insecure \\
+        --duration 120 --rate 20 --curve ramp --admin-pollers 2 --output load.json
+
+Under overload, admission control answers low-priority requests with 503;
+those are counted per endpoint as ``shed``.
+
+All simulated guests share the load generator's IP, so run the backend with
+RATE_LIMIT_ENABLED=false (or raised RATE_LIMITS) unless the guest rate
+limits are what is being measured.
+
+Admin sessions need a cookie the client will send back: use an https URL
+or run the backend with ADMIN_COOKIE_SECURE=false.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import httpx
+
+SEARCH_QUERIES = [
+    "rinfrescante",
+    "caffe",
+    "senza alcol",
+    "agrumato",
+    "frizzante",
+    "dolce",
+    "amaro",
+    "birra",
+    "vino rosso",
+    "menta",
+]
+
+
+def arrival_rate(curve: str, peak: float, elapsed: float, duration: float) -> float:
+    """Guest arrivals per second at ``elapsed`` seconds into the run."""
+    progress = min(1.0, elapsed / duration) if duration else 1.0
+    if curve == "constant":
+        return peak
+    if curve == "ramp":
+        return peak * progress
+    if curve == "step":
+        # Four equal plateaus at 25/50/75/100% of peak
+        return peak * (min(3, int(progress * 4)) + 1) / 4
+    if curve == "spike":
+        # Quarter-load baseline with a full-load burst in the middle tenth
+        return peak if 0.45 <= progress < 0.55 else peak / 4
+    if curve == "sine":
+        # Two full waves between 10% and 100% of peak
+        return peak * (0.55 + 0.45 * math.sin(progress * 4 * math.pi - math.pi / 2))
+    raise ValueError(f"Unknown arrival curve: {curve}")
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    guests_started: int = 0
+    guests_completed: int = 0
+    guests_dropped: int = 0
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.latencies[label].append((time.perf_counter() - started) * 1000)
+            self.statuses[label][type(exc).__name__] += 1
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append((time.perf_counter() - started) * 1000)
+        self.statuses[label][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(recorder: Recorder, elapsed: float, config: dict) -> dict:
+    endpoints = {}
+    for label, values in sorted(recorder.latencies.items()):
+        ordered = sorted(values)
+        endpoints[label] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(label, 0),
+            # 503s are requests turned away by admission control
+            "shed": recorder.statuses[label].get("503", 0),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(sum(ordered) / len(ordered), 2),
+                "p50": round(_percentile(ordered, 50), 2),
+                "p90": round(_percentile(ordered, 90), 2),
+                "p95": round(_percentile(ordered, 95), 2),
+                "p99": round(_percentile(ordered, 99), 2),
+                "max": round(ordered[-1], 2),
+            },
+            "status_codes": dict(recorder.statuses[label]),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "config": config,
+        "elapsed_s": round(elapsed, 2),
+        "guests": {
+            "started": recorder.guests_started,
+            "completed": recorder.guests_completed,
+            "dropped": recorder.guests_dropped,
+        },
+        "total_requests": total,
+        "total_throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def guest_journey(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    rng: random.Random,
+    tables: list[str],
+    think_time: float,
+) -> None:
+    async def think() -> None:
+        if think_time > 0:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    table = rng.choice(tables)
+    recorder.guests_started += 1
+
+    response = await recorder.request(client, "POST /api/users/auto", "POST", "/api/users/auto", params={"table_id": table})
+    if response is None or response.status_code >= 400:
+        return
+    user_id = response.json().get("id")
+
+    response = await recorder.request(client, "GET /api/menu", "GET", "/api/menu", params={"table_id": table})
+    if response is None or response.status_code >= 400:
+        return
+    menu_items = [item for category in response.json().get("categories", []) for item in category["items"]]
+    await think()
+
+    await recorder.request(
+        client,
+        "GET /api/ai/search",
+        "GET",
+        "/api/ai/search",
+        params={"q": rng.choice(SEARCH_QUERIES), "limit": 5},
+    )
+    await think()
+
+    if not menu_items:
+        return
+    picks = rng.sample(menu_items, rng.randint(1, min(3, len(menu_items))))
+    payload = {
+        "table_id": table,
+        "user_id": user_id,
+        "items": [
+            {
+                "product_id": item["id"],
+                "name": item["name"],
+                "unit_price": item["price"],
+                "quantity": rng.randint(1, 3),
+            }
+            for item in picks
+        ],
+    }
+    response = await recorder.request(client, "POST /api/orders/", "POST", "/api/orders/", json=payload)
+    if response is not None and response.status_code < 400:
+        recorder.guests_completed += 1
+
+
+async def admin_poller(
+    client_options: dict,
+    recorder: Recorder,
+    username: str,
+    password: str,
+    interval: float,
+    deadline: float,
+) -> None:
+    # Own client per poller so each holds its own session cookie
+    async with httpx.AsyncClient(**client_options) as client:
+        await recorder.request(
+            client,
+            "POST /admin/login",
+            "POST",
+            "/admin/login",
+            data={"username": username, "password": password},
+        )
+        while time.perf_counter() < deadline:
+            await recorder.request(client, "GET /admin/orders", "GET", "/admin/orders")
+            await recorder.request(client, "GET /api/dashboard/summary", "GET", "/api/dashboard/summary")
+            await asyncio.sleep(interval)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    tables = [f"table{i}" for i in range(1, args.tables + 1)]
+    client_options = {
+        "base_url": args.base_url,
+        "verify": not args.insecure,
+        "timeout": httpx.Timeout(args.timeout),
+    }
+    limits = httpx.Limits(max_connections=args.max_concurrency, max_keepalive_connections=args.max_concurrency)
+    in_flight = asyncio.Semaphore(args.max_concurrency)
+    tasks: set[asyncio.Task] = set()
+
+    async with httpx.AsyncClient(limits=limits, **client_options) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+
+        pollers = [
+            asyncio.create_task(
+                admin_poller(
+                    client_options,
+                    recorder,
+                    args.admin_user,
+                    args.admin_password,
+                    args.admin_interval,
+                    deadline,
+                )
+            )
+            for _ in range(args.admin_pollers)
+        ]
+
+        async def guarded_journey() -> None:
+            try:
+                await guest_journey(client, recorder, rng, tables, args.think_time)
+            finally:
+                in_flight.release()
+
+        # Thinning: draw candidates at the peak rate, keep each with p = rate(t) / peak
+        while True:
+            await asyncio.sleep(rng.expovariate(args.rate))
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if rng.random() > arrival_rate(args.curve, args.rate, now - started, args.duration) / args.rate:
+                continue
+            if in_flight.locked():
+                # Open-loop arrivals: a guest that cannot start is counted, not queued
+                recorder.guests_dropped += 1
+                continue
+            await in_flight.acquire()
+            task = asyncio.create_task(guarded_journey())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks, timeout=args.timeout)
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+    config = {
+        key: getattr(args, key)
+        for key in ("base_url", "duration", "rate", "curve", "max_concurrency", "tables", "think_time", "admin_pollers", "admin_interval", "seed")
+    }
+    return summarize(recorder, elapsed, config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals")
+    parser.add_argument("--rate", type=float, default=10.0, help="Peak guest arrivals per second")
+    parser.add_argument("--curve", choices=["constant", "ramp", "step", "spike", "sine"], default="constant")
+    parser.add_argument("--max-concurrency", type=int, default=200, help="Max guests in flight")
+    parser.add_argument("--tables", type=int, default=10, help="Number of table codes to spread guests over")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between guest steps")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--admin-pollers", type=int, default=1)
+    parser.add_argument("--admin-interval", type=float, default=10.0, help="Seconds between admin refreshes")
+    parser.add_argument("--admin-user", default="admin")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed ingress)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for label, stats in results["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"{label:32} {stats['requests']:7d} req {stats['throughput_rps']:8.2f} rps "
+            f"{stats['errors']:5d} err {stats['shed']:5d} shed  p50 {latency['p50']:8.1f}  p95 {latency['p95']:8.1f}  "
+            f"p99 {latency['p99']:8.1f} ms"
+        )
+    print(f"total {results['total_requests']} requests, {results['total_throughput_rps']} rps")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Microbenchmarks for hot backend code paths.
+
+Each benchmark is timed in rounds; a round repeats the operation enough times
+to last at least ``--min-time`` seconds, and the per-operation median across
+rounds is the reported figure. No database is needed.
+
+    python -m benchmarks.micro                         # run and print
+    python -m benchmarks.micro --save                  # store as the baseline
+    python -m benchmarks.micro --compare --threshold 0.15
+    python -m benchmarks.micro -k search               # only names containing "search"
+
+``--compare`` exits with status 1 when any benchmark is slower than the
+stored baseline by more than the threshold (15% by default), comparing the
+fastest round unless ``--stat`` says otherwise.
+Baselines are machine-specific: regenerate them on the machine that runs
+the comparison.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+# name -> setup function returning the zero-argument callable to time
+BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def bench(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _large_order(lines: int):
+    from app import models
+
+    order = models.Order(
+        id=1,
+        status="pending",
+        total_quantity=lines,
+        total_amount=Decimal("0"),
+        created_at=datetime(2024, 1, 1, 12, 0),
+        table_code="table1",
+    )
+    order.items = [
+        models.OrderItem(
+            id=i,
+            product_id=i % 20 + 1,
+            name=f"Item {i}",
+            unit_price=Decimal("4.50"),
+            quantity=2,
+        )
+        for i in range(lines)
+    ]
+    return order
+
+
+def _order_listing(count: int, lines: int):
+    from app import models
+
+    table = models.Table(id=1, code="table1", name="Tavolo 1", created_at=datetime(2024, 1, 1, 8, 0))
+    orders = []
+    for order_id in range(1, count + 1):
+        order = _large_order(lines)
+        order.id = order_id
+        order.status = "closed"
+        order.total_amount = Decimal("13.50")
+        order.created_at = datetime(2024, 1, 1, 12, 0) + timedelta(seconds=order_id)
+        order.user_id = order_id
+        order.table = table
+        order.transaction = models.Transaction(
+            id=order_id, method="card", amount=Decimal("13.50"), created_at=order.created_at
+        )
+        orders.append(order)
+    return orders
+
+
+@bench("search.normalize")
+def _bench_normalize():
+    from app.ai.search import _normalize
+
+    text = "Caffè Americano: espresso allungato, profilo più lungo e delicato!"
+    return lambda: _normalize(text)
+
+
+@bench("search.tokenize")
+def _bench_tokenize():
+    from app.ai.search import _tokenize
+
+    text = "Spremuta fresca di arance, agrumata e rinfrescante, ricca di vitamina C."
+    return lambda: _tokenize(text)
+
+
+@bench("search.index_build")
+def _bench_index_build():
+    from app.ai.search import TfidfIndex, _ITEM_DOCS
+
+    return lambda: TfidfIndex(_ITEM_DOCS)
+
+
+@bench("search.query")
+def _bench_query():
+    from app.ai.search import INDEX
+
+    return lambda: INDEX.query("qualcosa di rinfrescante e agrumato senza alcol", top_k=5)
+
+
+@bench("orders.read_serialize_500_lines")
+def _bench_order_read():
+    from app import schemas
+
+    order = _large_order(500)
+    return lambda: json.dumps(schemas.OrderRead.model_validate(order).model_dump(mode="json"))
+
+
+@bench("orders.list_1k_jsonable_encoder")
+def _bench_order_list_legacy():
+    # Reference: FastAPI's generic path (jsonable_encoder + stdlib json)
+    from fastapi.encoders import jsonable_encoder
+
+    from app import schemas
+
+    orders = _order_listing(1000, 3)
+    return lambda: json.dumps(
+        jsonable_encoder(schemas.ORDER_LIST.validate_python(orders, from_attributes=True))
+    ).encode()
+
+
+@bench("orders.list_1k_json_response")
+def _bench_order_list():
+    from app import schemas
+    from app.serialization import json_response
+
+    orders = _order_listing(1000, 3)
+    return lambda: json_response(schemas.ORDER_LIST, orders)
+
+
+@bench("serialization.dict_1k_stdlib")
+def _bench_dict_stdlib():
+    from fastapi.encoders import jsonable_encoder
+
+    payload = _dict_payload(1000)
+    return lambda: json.dumps(jsonable_encoder(payload)).encode()
+
+
+@bench("serialization.dict_1k_orjson")
+def _bench_dict_orjson():
+    from app.serialization import ORJSONResponse
+
+    payload = _dict_payload(1000)
+    return lambda: ORJSONResponse(payload)
+
+
+def _dict_payload(rows: int) -> dict:
+    # Shaped like the dashboard/closed-orders payloads: dicts of Decimal and datetime
+    started = datetime(2024, 1, 1, 12, 0)
+    return {
+        "generated_at": started,
+        "rows": [
+            {"id": i, "name": f"Item {i}", "amount": Decimal("4.50") * i, "created_at": started + timedelta(minutes=i)}
+            for i in range(rows)
+        ],
+    }
+
+
+@bench("orders.build_items_50_lines")
+def _bench_build_items():
+    from app import schemas
+    from app.routers.orders import _build_items
+
+    items = [
+        schemas.OrderItemCreate(product_id=i + 1, name=f"Item {i}", unit_price=1.2 + i, quantity=2)
+        for i in range(50)
+    ]
+    return lambda: _build_items(items)
+
+
+@bench("qrcode.render")
+def _bench_qrcode():
+    from app.main import _render_qr_base64
+
+    # Time the render itself, not the cache in front of it
+    return lambda: _render_qr_base64.__wrapped__("https://orders.local/table/table1")
+
+
+@bench("heatmaps.shape_year_15min")
+def _bench_heatmaps():
+    import numpy as np
+
+    from app.heatmaps import Grid, shape
+
+    # A full year at the finest bucket: what the SQL side hands back, laid out
+    grid = Grid.plan("day", date(2024, 12, 31), start=date(2024, 1, 1), bucket_minutes=15)
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 30, size=2 * grid.rows * grid.columns).astype(np.float64)
+    return lambda: shape(grid, values, "Europe/Rome")
+
+
+@bench("ratelimit.memory_take_10k_keys")
+def _bench_ratelimit_take():
+    from app.ratelimit import Limit, MemoryBackend
+
+    backend = MemoryBackend()
+    limit = Limit(per_minute=600, burst=100)
+    keys = [f"order.ip:10.0.{i // 250}.{i % 250}" for i in range(10_000)]
+    for key in keys:
+        backend.take(key, limit)
+
+    def run():
+        for key in keys[:1000]:
+            backend.take(key, limit)
+
+    return run
+
+
+@bench("recommend.cart_10k_orders")
+def _bench_recommend():
+    import random
+
+    from app.ai.recommend import CooccurrenceModel
+
+    rng = random.Random(7)
+    products = list(range(1, 41))
+    model = CooccurrenceModel.from_baskets(rng.sample(products, rng.randint(1, 4)) for _ in range(10_000))
+    carts = [rng.sample(products, 3) for _ in range(100)]
+
+    def run():
+        for cart in carts:
+            model.recommend(cart, 5)
+
+    return run
+
+
+@bench("forecast.fit_year_200_items")
+def _bench_forecast():
+    import random
+
+    from app.forecast import History, _hour_index, forecast
+
+    # A year of a venue open 16 hours a day, every product selling most open hours
+    rng = random.Random(11)
+    now = datetime(2025, 6, 1, 12, 30)
+    first = _hour_index(now) - 365 * 24
+    hours = [hour for hour in range(first, first + 365 * 24) if hour % 24 >= 8]
+    order_rows = [(hour, rng.randint(1, 40)) for hour in hours]
+    item_rows = [
+        (hour, product_id, rng.randint(1, 6))
+        for hour in hours
+        for product_id in range(1, 201)
+        if rng.random() < 0.7
+    ]
+
+    def run():
+        forecast(History.from_rows(order_rows, item_rows), now, 168, 52)
+
+    return run
+
+
+@bench("security.verify_password")
+def _bench_verify_password():
+    from app import security
+
+    password_hash = security.hash_password("admin123")
+    return lambda: security.verify_password("admin123", password_hash)
+
+
+def _time(fn: Callable[[], object], rounds: int, min_time: float) -> dict[str, float]:
+    fn()  # warm-up: lazy imports and caches stay out of the timings
+    # Calibrate the loop count so one round lasts at least min_time
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    per_op = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_op.append((time.perf_counter() - started) / loops)
+    return {
+        "median_s": statistics.median(per_op),
+        "min_s": min(per_op),
+        "mean_s": statistics.fmean(per_op),
+        "stdev_s": statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def _format_seconds(value: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if value >= scale:
+            return f"{value / scale:8.2f} {unit}"
+    return f"{value / 1e-9:8.2f} ns"
+
+
+def compare(results: dict, baseline: dict, threshold: float, stat: str) -> list[str]:
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = stats[stat] / base[stat]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:36} {_format_seconds(base[stat])} -> {_format_seconds(stats[stat])}  {ratio:5.2f}x {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per round")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Store results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown ratio before failing")
+    parser.add_argument(
+        "--stat",
+        choices=["min_s", "median_s", "mean_s"],
+        default="min_s",
+        help="Statistic compared against the baseline; min is the least noisy",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        stats = _time(setup(), args.rounds, args.min_time)
+        results[name] = stats
+        print(f"{name:36} {_format_seconds(stats['median_s'])}  (min {_format_seconds(stats['min_s']).strip()}, {stats['loops']} loops x {stats['rounds']})")
+
+    document = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "benchmarks": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(document, fh, indent=2)
+
+    status = 0
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)["benchmarks"]
+        print()
+        regressions = compare(results, baseline, args.threshold, args.stat)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}", file=sys.stderr)
+            status = 1
+    if args.save:
+        # Merge so a filtered run only refreshes the benchmarks it ran
+        existing = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as fh:
+                existing = json.load(fh).get("benchmarks", {})
+        existing.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump({**document, "benchmarks": existing}, fh, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Gunicorn settings for the production image.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Everything is tunable from the environment. The app is preloaded in the
+master: migrations, the admin bootstrap and the search index run once there,
+and workers fork with them already done (copy-on-write). Each worker then
+drops the inherited connection pool and opens its own.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+# Async workers: one per core is enough, each multiplexes many requests
+workers = _int("WEB_CONCURRENCY", multiprocessing.cpu_count())
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() != "false"
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = _int("GUNICORN_MAX_REQUESTS", 5000)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", 500)
+
+# On SIGTERM workers stop accepting and get graceful_timeout to drain in-flight
+# requests; keep the pod's terminationGracePeriodSeconds above it
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+timeout = _int("GUNICORN_TIMEOUT", 60)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+# Behind the ingress: trust X-Forwarded-* from the same peers as the app's
+# ProxyHeadersMiddleware, the ingress and proxy IPs or CIDRs
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# prometheus_client picks its multiprocess mode at import, so the directory
+# must be ready before the app is preloaded (this file loads first). Files
+# left by a previous master would be summed into the metrics.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def on_starting(server):
+    if preload_app:
+        from app.database import get_engine
+        from app.main import run_startup_tasks
+
+        run_startup_tasks()
+        # Connections must not be shared across fork
+        get_engine().dispose()
+
+
+def post_fork(server, worker):
+    from app.database import get_engine
+
+    # close=False: leave the parent's sockets alone, just forget them here
+    get_engine().dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
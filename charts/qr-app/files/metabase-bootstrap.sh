@@ -5,6 +5,10 @@ MB_HOST="${MB_HOST:-$METABASE_HOST}"
 MB_PORT="${MB_PORT:-$METABASE_PORT}"
 TARGET_DB_PORT="${TARGET_DB_PORT:-5432}"
 BASE="http://${MB_HOST}:${MB_PORT}"
+DB_NAME="QR App DB"
+# Materialized rollups maintained by the backend (app/rollups.py); questions
+# read these instead of scanning orders next to guest traffic
+ANALYTICS_SCHEMA="analytics"
 
 echo "Waiting for Metabase at ${BASE}..."
 for _ in $(seq 1 120); do
@@ -19,18 +23,96 @@ if ! curl -sf "${BASE}/api/health" >/dev/null; then
   exit 1
 fi
 
-# If already setup, exit gracefully
+# Only the analytics schema is synced, so ad-hoc questions browse the rollups
 if curl -s "${BASE}/api/session/properties" | grep -q '"has-user-setup":true'; then
-  echo "Metabase already set up. Exiting."
+  echo "Metabase already set up."
+else
+  payload=$(printf '{"token":"%s","user":{"first_name":"%s","last_name":"%s","email":"%s","password":"%s"},"prefs":{"site_name":"QR Metabase","site_locale":"it","allow_tracking":false},"database":{"engine":"postgres","name":"%s","details":{"host":"%s","port":%s,"dbname":"%s","user":"%s","password":"%s","ssl":false,"schema-filters-type":"inclusion","schema-filters-patterns":"%s"}}}' \
+    "$MB_SETUP_TOKEN" "$MB_ADMIN_FIRST_NAME" "$MB_ADMIN_LAST_NAME" "$MB_ADMIN_EMAIL" "$MB_ADMIN_PASSWORD" \
+    "$DB_NAME" "$TARGET_DB_HOST" "$TARGET_DB_PORT" "$TARGET_DB_NAME" "$POSTGRES_USER" "$POSTGRES_PASSWORD" \
+    "$ANALYTICS_SCHEMA")
+
+  curl -sS -X POST "${BASE}/api/setup" \
+    -H 'Content-Type: application/json' \
+    -d "$payload"
+  echo
+  echo "Setup completed."
+fi
+
+session=$(curl -sf -X POST "${BASE}/api/session" \
+  -H 'Content-Type: application/json' \
+  -d "$(printf '{"username":"%s","password":"%s"}' "$MB_ADMIN_EMAIL" "$MB_ADMIN_PASSWORD")" \
+  | sed -n 's/.*"id":"\([^"]*\)".*/\1/p')
+if [ -z "$session" ]; then
+  echo "Could not log in to Metabase; skipping questions" >&2
   exit 0
 fi
 
-payload=$(printf '{"token":"%s","user":{"first_name":"%s","last_name":"%s","email":"%s","password":"%s"},"prefs":{"site_name":"QR Metabase","site_locale":"it","allow_tracking":false},"database":{"engine":"postgres","name":"QR App DB","details":{"host":"%s","port":%s,"dbname":"%s","user":"%s","password":"%s","ssl":false}}}' \
-  "$MB_SETUP_TOKEN" "$MB_ADMIN_FIRST_NAME" "$MB_ADMIN_LAST_NAME" "$MB_ADMIN_EMAIL" "$MB_ADMIN_PASSWORD" \
-  "$TARGET_DB_HOST" "$TARGET_DB_PORT" "$TARGET_DB_NAME" "$POSTGRES_USER" "$POSTGRES_PASSWORD")
+api() {
+  method="$1"
+  path="$2"
+  shift 2
+  curl -sf -X "$method" "${BASE}${path}" \
+    -H 'Content-Type: application/json' \
+    -H "X-Metabase-Session: ${session}" \
+    "$@"
+}
 
-curl -sS -X POST "${BASE}/api/setup" \
-  -H 'Content-Type: application/json' \
-  -d "$payload"
+# Id of $DB_NAME in GET /api/database (the curl image has no jq):
+# reads "id" and "name" of each top-level entry of "data", skipping nested objects
+db_id=$(api GET /api/database | awk -v want="$DB_NAME" '
+  { json = json $0 }
+  END {
+    n = length(json); depth = 0; key = ""; id = ""; name = ""
+    for (i = 1; i <= n; i++) {
+      c = substr(json, i, 1)
+      if (c == "\"") {
+        j = i + 1; s = ""
+        while (j <= n && substr(json, j, 1) != "\"") {
+          if (substr(json, j, 1) == "\\") { s = s substr(json, j, 2); j += 2; continue }
+          s = s substr(json, j, 1); j++
+        }
+        i = j
+        if (depth == 2) {
+          if (key == "name") name = s
+          key = s
+        }
+        continue
+      }
+      if (c == "{") { depth++; if (depth == 2) { id = ""; name = "" }; key = ""; continue }
+      if (c == "}") { if (depth == 2 && name == want) { print id; exit } depth--; continue }
+      if (depth == 2 && key == "id" && c ~ /[0-9]/) id = id c
+      if (c == ",") key = ""
+    }
+  }')
+if [ -z "$db_id" ]; then
+  echo "Database \"${DB_NAME}\" not found in Metabase; skipping questions" >&2
+  exit 0
+fi
+
+# Pick up views created since the database was added
+api POST "/api/database/${db_id}/sync_schema" >/dev/null || true
+
+existing=$(api GET /api/card || true)
+
+# create_card NAME DISPLAY SQL: native question on the rollups, once per name
+create_card() {
+  if printf '%s' "$existing" | grep -qF "\"name\":\"$1\""; then
+    echo "Question \"$1\" exists."
+    return
+  fi
+  api POST /api/card -d "$(printf '{"name":"%s","display":"%s","visualization_settings":{},"dataset_query":{"type":"native","database":%s,"native":{"query":"%s"}}}' \
+    "$1" "$2" "$db_id" "$3")" >/dev/null
+  echo "Created question \"$1\"."
+}
+
+create_card "Incasso giornaliero (90 giorni)" line \
+  "SELECT day, SUM(revenue) AS incasso, SUM(closed_orders) AS ordini, ROUND(SUM(revenue) / NULLIF(SUM(closed_orders), 0), 2) AS scontrino_medio FROM ${ANALYTICS_SCHEMA}.daily_revenue WHERE day >= CURRENT_DATE - 90 GROUP BY day ORDER BY day"
+create_card "Vendite per articolo (30 giorni)" bar \
+  "SELECT name AS articolo, SUM(quantity) AS pezzi, SUM(revenue) AS incasso FROM ${ANALYTICS_SCHEMA}.item_sales WHERE day >= CURRENT_DATE - 30 GROUP BY name ORDER BY incasso DESC LIMIT 20"
+create_card "Metodi di pagamento (30 giorni)" pie \
+  "SELECT method AS metodo, SUM(payments) AS pagamenti, SUM(amount) AS importo FROM ${ANALYTICS_SCHEMA}.payment_mix WHERE day >= CURRENT_DATE - 30 GROUP BY method ORDER BY importo DESC"
+create_card "Rotazione tavoli (30 giorni)" table \
+  "SELECT table_code AS tavolo, SUM(tabs) AS conti, SUM(orders) AS ordini, SUM(revenue) AS incasso, ROUND(SUM(avg_minutes_seated * tabs) / SUM(tabs), 1) AS minuti_medi FROM ${ANALYTICS_SCHEMA}.table_turnover WHERE day >= CURRENT_DATE - 30 GROUP BY table_code ORDER BY conti DESC"
 
-echo "Setup completed."
+echo "Questions ready."
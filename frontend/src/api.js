@@ -17,6 +17,17 @@ const portSegment = isDefaultPort ? "" : `:${API_PORT}`;
 
 const API_BASE = `${API_PROTOCOL}//${API_HOST}${portSegment}/api`;
 
+// QR codes of venues without their own hostname carry ?venue=<slug>
+export const VENUE =
+  typeof window !== "undefined" ? new URLSearchParams(window.location.search).get("venue") : null;
+export const venueHeaders = VENUE ? { "X-Venue": VENUE } : {};
+
+// EventSource cannot send headers, so the venue travels as a query parameter
+export function liveTableUrl(tableId) {
+  const search = VENUE ? `?venue=${encodeURIComponent(VENUE)}` : "";
+  return `${API_BASE}/live/tables/${encodeURIComponent(tableId)}${search}`;
+}
+
 async function handleResponse(response) {
   if (!response.ok) {
     const message = await response.text();
@@ -41,6 +52,7 @@ export async function submitOrder({ tableId, items, userId }) {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
+      ...venueHeaders,
     },
     body: JSON.stringify(payload),
   });
@@ -52,6 +64,7 @@ export async function autoLogin(tableId) {
   const search = tableId ? `?table_id=${encodeURIComponent(tableId)}` : "";
   const response = await fetch(`${API_BASE}/users/auto${search}`, {
     method: "POST",
+    headers: venueHeaders,
   });
 
   return handleResponse(response);
@@ -62,6 +75,7 @@ export async function updateUser(userId, payload) {
     method: "PUT",
     headers: {
       "Content-Type": "application/json",
+      ...venueHeaders,
     },
     body: JSON.stringify(payload),
   });
@@ -71,11 +85,11 @@ export async function updateUser(userId, payload) {
 
 export async function searchMenu(query, limit = 5) {
   const search = new URLSearchParams({ q: query, limit: String(limit) });
-  const response = await fetch(`${API_BASE}/ai/search?${search.toString()}`);
+  const response = await fetch(`${API_BASE}/ai/search?${search.toString()}`, { headers: venueHeaders });
   return handleResponse(response);
 }
 
 export async function fetchItemTags() {
-  const response = await fetch(`${API_BASE}/ai/tags`);
+  const response = await fetch(`${API_BASE}/ai/tags`, { headers: venueHeaders });
   return handleResponse(response);
 }
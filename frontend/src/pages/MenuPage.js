@@ -1,7 +1,14 @@
 import React, { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import { useCart } from "../context/CartContext";
-import { autoLogin, submitOrder, updateUser, searchMenu as searchMenuApi, fetchItemTags } from "../api";
+import { autoLogin, submitOrder, updateUser, searchMenu as searchMenuApi, fetchItemTags, liveTableUrl, VENUE } from "../api";
+
+const STATUS_MESSAGES = {
+  pending: "è in attesa del barista",
+  processed: "è pronto!",
+  closed: "è stato pagato. Grazie!",
+  deleted: "è stato annullato dal bar",
+};
 
 function MenuPage() {
   const { tableId } = useParams();
@@ -18,6 +25,7 @@ function MenuPage() {
   } = useCart();
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [orderFeedback, setOrderFeedback] = useState(null);
+  const [trackedOrderId, setTrackedOrderId] = useState(null);
   const [userId, setUserId] = useState(null);
   const [userInfo, setUserInfo] = useState({ name: "", email: "", phone: "", age: "" });
   const [isSavingInfo, setIsSavingInfo] = useState(false);
@@ -56,7 +64,8 @@ function MenuPage() {
     (apiProtocol.startsWith("https") && apiPort === "443") ||
     (apiProtocol.startsWith("http") && apiPort === "80");
   const portSegment = isDefaultPort ? "" : `:${apiPort}`;
-  const menuUrl = `${apiProtocol}//${apiHost}${portSegment}/api/menu?table_id=${tableId}`;
+  const venueParam = VENUE ? `&venue=${encodeURIComponent(VENUE)}` : "";
+  const menuUrl = `${apiProtocol}//${apiHost}${portSegment}/api/menu?table_id=${tableId}${venueParam}`;
 
   useEffect(() => {
     setError(null);
@@ -73,6 +82,33 @@ function MenuPage() {
       .catch(err => setError(err.message));
   }, [menuUrl, tableId]);
 
+  // Follow the last order's status over the table's live stream
+  useEffect(() => {
+    if (!trackedOrderId || !menu || typeof EventSource === "undefined") {
+      return undefined;
+    }
+    const source = new EventSource(liveTableUrl(menu.table_id));
+    const showStatus = status => {
+      const text = STATUS_MESSAGES[status];
+      if (text) {
+        setOrderFeedback({ type: "success", message: `Ordine #${trackedOrderId} ${text}` });
+      }
+      if (status === "closed" || status === "deleted") {
+        source.close();
+      }
+    };
+    source.addEventListener("snapshot", event => {
+      const { orders } = JSON.parse(event.data);
+      const order = orders.find(o => o.order_id === trackedOrderId);
+      if (order) showStatus(order.status);
+    });
+    source.addEventListener("status", event => {
+      const message = JSON.parse(event.data);
+      if (message.order_id === trackedOrderId) showStatus(message.status);
+    });
+    return () => source.close();
+  }, [trackedOrderId, menu]);
+
   // Fetch item metadata (tags/allergens/ingredients) once
   useEffect(() => {
     let mounted = true;
@@ -293,6 +329,7 @@ function MenuPage() {
         message: `Ordine #${order.id} ricevuto (utente ${order.user_id ?? "ospite"}). Il barista è stato avvisato!`,
       });
       clearCart();
+      setTrackedOrderId(order.id);
     } catch (error) {
       setOrderFeedback({
         type: "error",